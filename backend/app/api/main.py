@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -7,6 +8,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.routes import router
+from app.outbox.store import outbox_store
+from app.outbox.worker import OutboxWorker
+from app.utils.compression import ContentEncodingMiddleware
+from app.utils.config import get_env_bool, get_env_float, get_env_int
+from app.utils.database import client_manager
+from app.utils.llm import close_openai_client, init_openai_client
+from app.utils.metrics import MetricsMiddleware
+from app.utils.server_timing import ServerTimingMiddleware
+from app.utils.trace import TraceMiddleware, trace_recorder
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,12 +32,39 @@ async def lifespan(app: FastAPI):
     """Entry point lifecycle event. Runs before the server starts"""
     try:
         log.info("Starting up server...")
-        yield
+        try:
+            init_openai_client()
+        except Exception as e:
+            # Topic descriptions fall back to a generic label until a key is configured
+            log.warning(f"OpenAI client not initialized: {e}")
+
+        # For single-process deployments and local development the outbox can be
+        # drained inside the API process instead of by `python -m app.outbox`
+        worker_stop = asyncio.Event()
+        worker_task = None
+        if get_env_bool("OUTBOX_EMBEDDED_WORKER", False):
+            worker_task = asyncio.create_task(
+                OutboxWorker.from_env(outbox_store).run(
+                    worker_stop,
+                    shutdown_grace_seconds=get_env_float(
+                        "OUTBOX_SHUTDOWN_GRACE_SECONDS", 30
+                    ),
+                )
+            )
+        try:
+            yield
+        finally:
+            if worker_task is not None:
+                worker_stop.set()
+                await worker_task
     except Exception as e:
         log.exception("Failed to initialize Raise and Rage server: %s", e)
         raise e
     finally:
         log.info("Shutting down server...")
+        await client_manager.close()
+        await close_openai_client()
+        trace_recorder.close()
 
 
 def create_app() -> FastAPI:
@@ -35,6 +72,9 @@ def create_app() -> FastAPI:
     try:
         app = FastAPI(lifespan=lifespan, debug=True)
 
+        # Added first so that it runs closest to the router and sees the matched route
+        app.add_middleware(MetricsMiddleware)
+
         # TODO: This is a quick fix to bypass CORS error. We need to ensure that the origin is shared in production / whitelist specific origins explicitly.
         app.add_middleware(
             CORSMiddleware,
@@ -42,7 +82,26 @@ def create_app() -> FastAPI:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            # Response headers the frontend reads on cross-origin requests
+            expose_headers=[
+                "Retry-After",
+                "Server-Timing",
+                "X-Deadline-Exceeded",
+                "X-Text-Response",
+            ],
+        )
+        # Accept gzip/zstd request bodies and compress responses
+        app.add_middleware(
+            ContentEncodingMiddleware,
+            minimum_size=get_env_int("COMPRESSION_MIN_BYTES", 1024),
+            max_request_bytes=get_env_int("MAX_REQUEST_BODY_BYTES", 64 * 1024 * 1024),
         )
+        # Opt-in request traces (TRACE_FILE) for benchmarks.replay; inside the
+        # Server-Timing middleware, whose stage durations it records
+        if trace_recorder.enabled:
+            app.add_middleware(TraceMiddleware, recorder=trace_recorder)
+        # Added last so that its total includes body (de)compression
+        app.add_middleware(ServerTimingMiddleware)
         app.include_router(router)
 
         @app.exception_handler(RequestValidationError)
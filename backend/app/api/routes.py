@@ -1,13 +1,23 @@
+import asyncio
 import logging
 
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 
 from app.controllers.image import ImageController
 from app.controllers.image_pair import ImagePairController
 from app.controllers.project import ProjectController
+from app.outbox.store import outbox_store, update_outbox_metrics
 from app.services.image import ImageService
 from app.services.image_pair import ImagePairService
 from app.services.project import ProjectService
+from app.utils.database import client_manager
+from app.utils.deadline import deadline_stats
+from app.utils.etag import etag_stats
+from app.utils.metrics import METRICS_CONTENT_TYPE, render_metrics
+from app.utils.snapshot_store import snapshot_storage_stats
+from app.utils.storage import storage_stats
+from app.utils.trace import trace_recorder
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +32,33 @@ async def status():
     return {"status": "ok"}
 
 
+@router.get("/stats")
+async def stats():
+    return {
+        "db_clients": client_manager.stats(),
+        "image_generation": image_service.stats(),
+        "generation_sessions": image_service.sessions.stats(),
+        "expired_requests": deadline_stats(),
+        "generation_cache": image_service.cache.stats(),
+        "canvas_preprocessing": image_service.canvas.stats(),
+        "topic_descriptions": ProjectService.topic_description_stats(),
+        "project_icons": ProjectService.icon_stats(),
+        "snapshot_patches": ProjectService.snapshot_patch_stats(),
+        "snapshot_storage": snapshot_storage_stats(),
+        "outbox": await asyncio.to_thread(outbox_store.stats),
+        "storage_uploads": storage_stats(),
+        "conditional_gets": etag_stats(),
+        "request_traces": trace_recorder.stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms, in-flight gauges and error counters for Prometheus."""
+    await update_outbox_metrics(outbox_store)
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 ### Projects
 
 
@@ -55,9 +92,11 @@ router.include_router(
 ### Image Generation
 
 
+image_service = ImageService()
+
+
 def get_image_controller_router():
-    service = ImageService()
-    return ImageController(service=service).router
+    return ImageController(service=image_service).router
 
 
 router.include_router(
@@ -1,151 +1,188 @@
+import asyncio
+import hashlib
+import json
 import logging
+from typing import Any, AsyncIterator, Awaitable, Dict, Literal, Optional, Tuple
+from urllib.parse import quote
 
-from fastapi import APIRouter, BackgroundTasks, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 
-from app.models.image import ImageGenerationRequest, ImageGenerationResponse
-from app.models.project import IconGenerationRequest, ProjectUpdateRequest
-from app.services.image import ImageService
+from app.models.image import (
+    GeneratedImage,
+    ImageGenerationRequest,
+    ImageGenerationResponse,
+)
+from app.outbox.jobs import enqueue_image_pair, enqueue_project_icon
+from app.outbox.store import outbox_store
+from app.services.image import ImageService, decode_image_data
 from app.services.project import ProjectService
+from app.utils.concurrency import (
+    ClientDisconnectedError,
+    SupersededError,
+    cancel_on_disconnect,
+)
 from app.utils.database import db_client
-from app.utils.storage import (
-    download_and_upload_image_from_url,
-    save_image_pair_to_db,
-    upload_image_to_storage,
+from app.utils.deadline import (
+    DeadlineExceededError,
+    check_deadline,
+    is_expired,
+    parse_deadline,
+    record_expired,
+    within_deadline,
 )
+from app.utils.image_payload import ImagePayload
+from app.utils.metrics import timed
+from app.utils.scheduler import AdmissionRejectedError
+from app.utils.trace import annotate_trace, is_tracing, trace_hash
 
 log = logging.getLogger(__name__)
 
 
-async def generate_and_save_project_icon(
-    authorization: str,
-    project_id: str,
-):
+def start_owner_lookup(authorization: Optional[str], project_id: str) -> asyncio.Task:
     """
-    Background task to generate and save a 3D icon for the project if it doesn't have one.
+    Start reading who owns the project, with the caller's own client.
+
+    Outbox jobs run with the service role and never hold the caller's token, so they are
+    only queued for projects the caller can read. The lookup is started alongside the
+    generation so that it never delays the response.
     """
-    try:
-        log.info(f"Starting background task to generate icon for project {project_id}")
 
-        # Extract token from authorization header
+    async def lookup() -> str:
         token = authorization.replace("Bearer ", "") if authorization else ""
-
-        # Get database client
-        supabase_client = await db_client(token=token)
-
-        # Initialize project service
-        project_service = ProjectService()
-
-        # Get project details
-        project = await project_service.get_project_by_id(
-            supabase_client=supabase_client,
+        return await ProjectService().get_project_owner(
+            supabase_client=await db_client(token=token),
+            token=token,
             project_id=project_id,
         )
 
-        # Skip if project already has an icon
-        if project.icon_url:
-            log.info(f"Project {project_id} already has an icon, skipping generation")
-            return
-
-        # Generate icon prompt from project name
-        icon_prompt = project.name if project.name else "abstract 3D icon"
-        log.info(f"Generating 3D icon for project with prompt: {icon_prompt}")
-
-        # Generate the 3D icon
-        icon_request = IconGenerationRequest(
-            prompt=icon_prompt,
-            project_id=project_id,
-            user_id=project.user_id,
-            style="3D render, isometric, clean background, modern, professional graphic",
-        )
-        icon_response = await project_service.generate_3d_icon(
-            supabase_client=supabase_client, request=icon_request
-        )
-
-        # Download and upload the icon to Supabase storage
-        icon_url = await download_and_upload_image_from_url(
-            supabase_client=supabase_client,
-            image_url=icon_response.image_url,
-            folder="project_icons",
-        )
-
-        # Update the project with the icon URL
-        update_request = ProjectUpdateRequest(icon_url=icon_url)
-        await project_service.update_project(
-            supabase_client=supabase_client,
-            project_id=project_id,
-            user_id=project.user_id,
-            project_data=update_request,
-        )
+    task = asyncio.create_task(lookup())
+    # A failed lookup is reported by enqueue_persistence, or not at all if the
+    # generation failed first
+    task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return task
 
-        log.info(f"Successfully generated and saved icon for project {project_id}")
 
-    except Exception as e:
-        log.error(f"Error in background task generate_and_save_project_icon: {e}")
-        # Don't raise - background tasks should not affect the response
-
-
-async def save_images_to_database(
-    authorization: str,
-    project_id: str,
-    input_image_data: str,
-    output_image_data: str,
-    prompt_text: str,
+async def enqueue_persistence(
+    owner: Awaitable[str],
+    input: ImageGenerationRequest,
+    input_image: Optional[ImagePayload],
+    output_image: ImagePayload,
+    deadline: Optional[float] = None,
 ):
     """
-    Background task to upload images to storage and save the pair to database.
+    Queue the persistence work that follows a successful generation in the outbox.
+
+    Runs once the response has been sent. The outbox worker uploads the images and
+    generates the project icon, so this only writes the jobs to local disk. Failing to
+    enqueue is logged, as the generated image has already been delivered. The image pair
+    carries the request's deadline and is dropped once that has passed.
+
+    Args:
+        owner: The owner lookup started with start_owner_lookup
     """
     try:
-        log.info(f"Starting background task to save images for project {project_id}")
+        user_id = await owner
+
+        # Generate and save the project icon (on first generation)
+        if ProjectService.should_request_icon(input.project_id):
+            await asyncio.to_thread(
+                enqueue_project_icon,
+                store=outbox_store,
+                user_id=user_id,
+                project_id=input.project_id,
+            )
 
         # Skip if no input image data (required for image pairs)
-        if not input_image_data:
+        if not input_image:
             log.warning("No input image data provided, skipping database save")
             return
 
-        # Extract token from authorization header
-        token = authorization.replace("Bearer ", "") if authorization else ""
-
-        # Get database client
-        supabase_client = await db_client(token=token)
-
-        # Upload input image to storage
-        input_url, input_mime_type, input_width, input_height = (
-            await upload_image_to_storage(
-                supabase_client=supabase_client,
-                image_data=input_image_data,
-                folder="image_pairs/input",
-            )
-        )
+        if is_expired(deadline):
+            record_expired("persistence")
+            log.info(f"Deadline passed, not saving image pair for {input.project_id}")
+            return
 
-        # Upload output image to storage
-        output_url, output_mime_type, output_width, output_height = (
-            await upload_image_to_storage(
-                supabase_client=supabase_client,
-                image_data=output_image_data,
-                folder="image_pairs/output",
-            )
+        await asyncio.to_thread(
+            enqueue_image_pair,
+            store=outbox_store,
+            user_id=user_id,
+            project_id=input.project_id,
+            prompt_text=input.prompt,
+            input_image=input_image,
+            output_image=output_image,
+            deadline=deadline,
         )
+    except Exception as e:
+        log.error(f"Error enqueueing persistence for project {input.project_id}: {e}")
 
-        # Save image pair to database
-        await save_image_pair_to_db(
-            supabase_client=supabase_client,
-            project_id=project_id,
-            input_url=input_url,
-            input_mime_type=input_mime_type,
-            input_width=input_width,
-            input_height=input_height,
-            output_url=output_url,
-            output_mime_type=output_mime_type,
-            output_width=output_width,
-            output_height=output_height,
-            prompt_text=prompt_text,
-        )
 
-        log.info(f"Successfully saved image pair for project {project_id}")
+def client_id(input: ImageGenerationRequest, authorization: Optional[str]) -> str:
+    """
+    The identity a generation is queued and rate limited under.
 
-    except Exception as e:
-        log.error(f"Error in background task save_images_to_database: {e}")
-        # Don't raise - background tasks should not affect the response
+    Signed-in callers are told apart by their token; anonymous ones share their
+    project's allowance.
+    """
+    token = authorization.replace("Bearer ", "") if authorization else ""
+    if token:
+        return f"token:{hashlib.sha256(token.encode()).hexdigest()[:16]}"
+    return f"project:{input.project_id}"
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def wants_binary(request: Request) -> bool:
+    """Whether the client asked for the raw image instead of base64 JSON."""
+    accept = request.headers.get("accept", "")
+    return accept.startswith("image/") or accept.startswith("application/octet-stream")
+
+
+def binary_response(generated_image: GeneratedImage) -> Response:
+    """Return the generated image bytes as-is, with the model's text in a header."""
+    headers = {}
+    if generated_image.text_response:
+        # Header values must be latin-1, so the text is percent-encoded
+        headers["X-Text-Response"] = quote(generated_image.text_response)
+    return Response(
+        content=generated_image.image_bytes,
+        media_type=generated_image.mime_type,
+        headers=headers,
+    )
+
+
+def trace_generation(
+    input: ImageGenerationRequest, image: Optional[ImagePayload]
+) -> None:
+    """Describe a generation in the request trace by its shape, never its content."""
+    if not is_tracing():
+        return
+    annotate_trace(
+        generation={
+            "type": input.type,
+            "use_cache": input.use_cache,
+            "project": trace_hash(input.project_id),
+            "prompt": trace_hash(input.prompt),
+            "prompt_length": len(input.prompt),
+            "image": trace_hash(image.digest) if image else None,
+            "image_bytes": len(image) if image else 0,
+            "image_width": image.width if image else None,
+            "image_height": image.height if image else None,
+            "session": trace_hash(input.session_id),
+            "sequence": input.sequence,
+        }
+    )
+
+
+def json_response(generated_image: GeneratedImage) -> Response:
+    """Return the generated image as base64 JSON, timing the encoding."""
+    with timed("serialize"):
+        content = generated_image.to_response().model_dump_json()
+    return Response(content=content, media_type="application/json")
 
 
 class ImageController:
@@ -154,6 +191,106 @@ class ImageController:
         self.service = service
         self.setup_routes()
 
+    async def _generate(
+        self,
+        input: ImageGenerationRequest,
+        image: Optional[ImagePayload],
+        request: Request,
+        authorization: str,
+        deadline: Optional[float],
+    ) -> Tuple[GeneratedImage, BackgroundTask]:
+        """
+        Run a generation for either transport.
+
+        Returns:
+            The generated image, and the task that queues its persistence, to be run
+            once the response has been sent
+        """
+        owner = start_owner_lookup(authorization, input.project_id)
+        try:
+            generated_image = await self._run_generation(
+                input, image, request, authorization, deadline
+            )
+        except BaseException:
+            owner.cancel()
+            raise
+        return generated_image, BackgroundTask(
+            enqueue_persistence,
+            owner=owner,
+            input=input,
+            input_image=image,
+            output_image=ImagePayload(
+                generated_image.image_bytes, mime_type=generated_image.mime_type
+            ),
+            deadline=deadline,
+        )
+
+    async def _run_generation(
+        self,
+        input: ImageGenerationRequest,
+        image: Optional[ImagePayload],
+        request: Request,
+        authorization: str,
+        deadline: Optional[float],
+    ) -> GeneratedImage:
+        sessions = self.service.sessions
+        trace_generation(input, image)
+
+        async def generate() -> GeneratedImage:
+            # Queueing and the Gemini call are abandoned once the deadline passes
+            async with within_deadline(deadline, "generation"):
+                return await self.service.generate(
+                    input=input,
+                    image=image,
+                    client_id=client_id(input, authorization),
+                )
+
+        try:
+            check_deadline(deadline, "admission")
+            # The Gemini call is cancelled if the client goes away mid-generation, or
+            # once a newer request from the same session arrives
+            generated_image: GeneratedImage = await cancel_on_disconnect(
+                request, sessions.run(input.session_id, input.sequence, generate)
+            )
+            log.info("Image generation completed successfully")
+
+            # A result that was overtaken while finishing is not worth keeping
+            sessions.check(input.session_id, input.sequence)
+            return generated_image
+        except ValueError as e:
+            log.error(f"Validation error: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except TimeoutError as e:
+            log.error(f"Timeout error: {e}")
+            raise HTTPException(status_code=504, detail=str(e))
+        except ClientDisconnectedError as e:
+            log.info(f"Image generation abandoned: {e}")
+            # Nobody is listening any more; 499 mirrors nginx's "client closed request"
+            raise HTTPException(status_code=499, detail=str(e))
+        except SupersededError as e:
+            log.info(f"Image generation superseded: {e}")
+            raise HTTPException(status_code=409, detail=str(e))
+        except DeadlineExceededError as e:
+            log.info(f"Image generation dropped: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"X-Deadline-Exceeded": e.stage},
+            )
+        except AdmissionRejectedError as e:
+            log.warning(f"Image generation rejected: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": e.retry_after_header},
+            )
+        except RuntimeError as e:
+            log.error(f"Service error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            log.error(f"Unexpected error: {e}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
     def setup_routes(self):
         router = self.router
 
@@ -163,9 +300,18 @@ class ImageController:
         )
         async def generate_image(
             input: ImageGenerationRequest,
-            background_tasks: BackgroundTasks,
+            request: Request,
             authorization: str = Header(None),
+            x_request_deadline: Optional[str] = Header(None),
+            x_request_max_age: Optional[str] = Header(None),
         ) -> ImageGenerationResponse:
+            """
+            Generate an image from a JSON request with base64 encoded image data.
+
+            Responds with base64 JSON, or with the raw image bytes when the Accept header
+            asks for an image. Requests past their X-Request-Deadline (Unix time) or
+            X-Request-Max-Age (seconds) are dropped with a 503.
+            """
             log.info(f"Generating image with prompt: {input.prompt}")
             log.info(f"Request type: {input.type}")
             log.info(f"Input image data present: {bool(input.image_data)}")
@@ -173,37 +319,210 @@ class ImageController:
                 log.info(f"Input image data length: {len(input.image_data)}")
 
             try:
-                response: ImageGenerationResponse = await self.service.generate_image(
-                    input=input
-                )
-                log.info("Image generation completed successfully")
+                deadline = parse_deadline(x_request_deadline, x_request_max_age)
+                image = decode_image_data(input.image_data)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
-                # Add background task to generate and save project icon (on first generation)
-                background_tasks.add_task(
-                    generate_and_save_project_icon,
-                    authorization=authorization,
-                    project_id=input.project_id,
-                )
+            generated_image, persist = await self._generate(
+                input=input,
+                image=image,
+                request=request,
+                authorization=authorization,
+                deadline=deadline,
+            )
+            if wants_binary(request):
+                response = binary_response(generated_image)
+            else:
+                response = json_response(generated_image)
+            response.background = persist
+            return response
 
-                # Add background task to save images to database
-                background_tasks.add_task(
-                    save_images_to_database,
-                    authorization=authorization,
-                    project_id=input.project_id,
-                    input_image_data=input.image_data,
-                    output_image_data=response.image_data,
-                    prompt_text=input.prompt,
-                )
+        @router.post(
+            "/binary",
+            response_class=Response,
+            responses={200: {"content": {"image/png": {}}}},
+        )
+        async def generate_image_binary(
+            request: Request,
+            prompt: str = Query(description="The text prompt describing the image."),
+            project_id: str = Query(description="The project ID for the image pair."),
+            type: Literal["generate", "edit"] = Query(default="generate"),
+            use_cache: bool = Query(default=True),
+            session_id: Optional[str] = Query(default=None),
+            sequence: Optional[int] = Query(default=None),
+            authorization: str = Header(None),
+            x_request_deadline: Optional[str] = Header(None),
+            x_request_max_age: Optional[str] = Header(None),
+        ) -> Response:
+            """
+            Generate an image from a raw request body (e.g. Content-Type: image/png).
+
+            The canvas bytes are passed to the model and to storage without base64
+            encoding. Responds with the raw generated image and the model's text in the
+            percent-encoded X-Text-Response header, unless Accept is application/json.
+            """
+            log.info(f"Generating image (binary) with prompt: {prompt}")
+            try:
+                deadline = parse_deadline(x_request_deadline, x_request_max_age)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            body = await request.body()
+            image = ImagePayload(body) if body else None
+            log.info(f"Input image size: {len(body)} bytes")
+
+            input = ImageGenerationRequest(
+                prompt=prompt,
+                project_id=project_id,
+                type=type,
+                use_cache=use_cache,
+                session_id=session_id,
+                sequence=sequence,
+            )
+            generated_image, persist = await self._generate(
+                input=input,
+                image=image,
+                request=request,
+                authorization=authorization,
+                deadline=deadline,
+            )
+            if request.headers.get("accept", "").startswith("application/json"):
+                response = json_response(generated_image)
+            else:
+                response = binary_response(generated_image)
+            response.background = persist
+            return response
+
+        @router.post("/stream")
+        async def stream_image(
+            input: ImageGenerationRequest,
+            authorization: str = Header(None),
+            x_request_deadline: Optional[str] = Header(None),
+            x_request_max_age: Optional[str] = Header(None),
+        ) -> StreamingResponse:
+            """
+            Generate an image, streaming progress as server-sent events.
+
+            Emits "queued", "started", "text" and finally "image" (the same payload as the
+            non-streaming endpoint). Failures after the stream has started are reported as an
+            "error" event carrying a status_code and detail; a stream superseded by a newer
+            request from the same session ends with a 409 "error" event, and one whose
+            deadline passes with a 503 "error" event.
+            """
+            log.info(f"Streaming image with prompt: {input.prompt}")
+            log.info(f"Request type: {input.type}")
+            sessions = self.service.sessions
+
+            async def step() -> Dict[str, Any]:
+                async with within_deadline(deadline, "generation"):
+                    return await anext(events)
+
+            def next_event() -> Awaitable[Dict[str, Any]]:
+                # Each step runs as the session's work, so a newer request cancels it
+                return sessions.run(input.session_id, input.sequence, step)
 
-                return response
+            try:
+                deadline = parse_deadline(x_request_deadline, x_request_max_age)
+                check_deadline(deadline, "admission")
+                image = decode_image_data(input.image_data)
+                trace_generation(input, image)
+                events = self.service.stream_image(
+                    input=input,
+                    image=image,
+                    client_id=client_id(input, authorization),
+                )
+                # Pull the first event eagerly so that invalid requests still get a 400
+                first_event = await next_event()
             except ValueError as e:
                 log.error(f"Validation error: {e}")
                 raise HTTPException(status_code=400, detail=str(e))
-            except RuntimeError as e:
-                log.error(f"Service error: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
-            except Exception as e:
-                log.error(f"Unexpected error: {e}")
+            except SupersededError as e:
+                log.info(f"Image generation superseded: {e}")
+                raise HTTPException(status_code=409, detail=str(e))
+            except DeadlineExceededError as e:
+                log.info(f"Image generation dropped: {e}")
                 raise HTTPException(
-                    status_code=500, detail="An unexpected error occurred"
+                    status_code=503,
+                    detail=str(e),
+                    headers={"X-Deadline-Exceeded": e.stage},
                 )
+
+            # Overlaps the rest of the generation; only needed once it has succeeded
+            owner = start_owner_lookup(authorization, input.project_id)
+            output_image: Optional[ImagePayload] = None
+
+            async def persist() -> None:
+                # Runs after the last event has been sent
+                if output_image is None:
+                    owner.cancel()
+                    return
+                await enqueue_persistence(
+                    owner=owner,
+                    input=input,
+                    input_image=image,
+                    output_image=output_image,
+                    deadline=deadline,
+                )
+
+            async def event_stream() -> AsyncIterator[str]:
+                nonlocal output_image
+                event = first_event
+                try:
+                    while True:
+                        data = event["data"]
+                        if event["event"] == "image":
+                            sessions.check(input.session_id, input.sequence)
+                            output_image = ImagePayload(
+                                data.image_bytes, mime_type=data.mime_type
+                            )
+                            log.info("Image generation completed successfully")
+                            data = data.to_response().model_dump()
+                        yield format_sse(event["event"], data)
+                        try:
+                            event = await next_event()
+                        except StopAsyncIteration:
+                            break
+                except SupersededError as e:
+                    log.info(f"Image generation superseded: {e}")
+                    yield format_sse("error", {"status_code": 409, "detail": str(e)})
+                except DeadlineExceededError as e:
+                    log.info(f"Image generation dropped: {e}")
+                    yield format_sse(
+                        "error",
+                        {"status_code": 503, "detail": str(e), "stage": e.stage},
+                    )
+                except AdmissionRejectedError as e:
+                    log.warning(f"Image generation rejected: {e}")
+                    yield format_sse(
+                        "error",
+                        {
+                            "status_code": 429,
+                            "detail": str(e),
+                            "retry_after": int(e.retry_after_header),
+                        },
+                    )
+                except TimeoutError as e:
+                    log.error(f"Timeout error: {e}")
+                    yield format_sse("error", {"status_code": 504, "detail": str(e)})
+                except RuntimeError as e:
+                    log.error(f"Service error: {e}")
+                    yield format_sse("error", {"status_code": 500, "detail": str(e)})
+                except Exception as e:
+                    log.error(f"Unexpected error: {e}")
+                    yield format_sse(
+                        "error",
+                        {"status_code": 500, "detail": "An unexpected error occurred"},
+                    )
+                finally:
+                    await events.aclose()
+
+            return StreamingResponse(
+                event_stream(),
+                background=BackgroundTask(persist),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    # Stop reverse proxies from buffering the events
+                    "X-Accel-Buffering": "no",
+                },
+            )
@@ -1,10 +1,13 @@
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 
 from app.models.image_pair import ImagePairListResponse
 from app.services.image_pair import ImagePairService
 from app.utils.database import db_client
+from app.utils.etag import etag_matches, make_etag, record_conditional_get
+from app.utils.pagination import page_size
 
 log = logging.getLogger(__name__)
 
@@ -21,13 +24,24 @@ class ImagePairController:
         @router.get(
             "/{project_id}",
             response_model=ImagePairListResponse,
+            # Fields left out of a ?fields= selection are omitted rather than null
+            response_model_exclude_unset=True,
         )
         async def get_image_pairs(
             project_id: str,
+            response: Response,
+            limit: Optional[int] = Query(default=None, ge=1),
+            cursor: Optional[str] = Query(default=None),
+            fields: Optional[str] = Query(default=None),
             authorization: str = Header(None),
+            if_none_match: Optional[str] = Header(None),
         ) -> ImagePairListResponse:
             """
-            Fetch all image pairs for a given project ID.
+            Fetch a page of image pairs for a given project ID, newest first.
+
+            Pass the returned next_cursor as ?cursor= to fetch the following page.
+            Responses carry an ETag; send it back as If-None-Match to get a 304 when
+            nothing has changed.
             """
             log.info(f"Fetching image pairs for project_id: {project_id}")
             try:
@@ -37,14 +51,41 @@ class ImagePairController:
                 # Get database client
                 supabase_client = await db_client(token=token)
 
-                # Fetch image pairs
-                image_pairs = await self.service.get_image_pairs_by_project_id(
+                # Read the version before the page, so the ETag is never newer than
+                # the body it is sent with
+                version = await self.service.get_image_pairs_version(
                     supabase_client=supabase_client, project_id=project_id
                 )
+                etag = make_etag(
+                    "image_pairs", project_id, version, page_size(limit), cursor, fields
+                )
+                headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+                not_modified = etag_matches(if_none_match, etag)
+                record_conditional_get("image_pairs", bool(if_none_match), not_modified)
+                if not_modified:
+                    log.info(f"Image pairs for project_id {project_id} not modified")
+                    return Response(status_code=304, headers=headers)
+                response.headers.update(headers)
+
+                # Fetch image pairs
+                image_pairs, next_cursor = (
+                    await self.service.get_image_pairs_by_project_id(
+                        supabase_client=supabase_client,
+                        project_id=project_id,
+                        limit=limit,
+                        cursor=cursor,
+                        fields=fields,
+                    )
+                )
 
                 log.info(f"Successfully retrieved {len(image_pairs)} image pairs")
-                return ImagePairListResponse(image_pairs=image_pairs)
+                return ImagePairListResponse(
+                    image_pairs=image_pairs, next_cursor=next_cursor
+                )
 
+            except ValueError as e:
+                log.error(f"Validation error: {e}")
+                raise HTTPException(status_code=400, detail=str(e))
             except RuntimeError as e:
                 log.error(f"Service error: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,7 @@
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 
 from app.models.project import (
     IconGenerationRequest,
@@ -8,10 +9,15 @@ from app.models.project import (
     Project,
     ProjectCreateRequest,
     ProjectListResponse,
+    ProjectSnapshotResponse,
     ProjectUpdateRequest,
+    SnapshotPatchRequest,
+    SnapshotPatchResponse,
 )
-from app.services.project import ProjectService
+from app.services.project import ProjectService, SnapshotConflictError
 from app.utils.database import db_client
+from app.utils.etag import etag_matches, make_etag, record_conditional_get
+from app.utils.pagination import page_size
 
 log = logging.getLogger(__name__)
 
@@ -28,13 +34,25 @@ class ProjectController:
         @router.get(
             "/{user_id}",
             response_model=ProjectListResponse,
+            # Fields left out of a ?fields= selection are omitted rather than null
+            response_model_exclude_unset=True,
         )
         async def get_projects(
             user_id: str,
+            response: Response,
+            limit: Optional[int] = Query(default=None, ge=1),
+            cursor: Optional[str] = Query(default=None),
+            fields: Optional[str] = Query(default=None),
             authorization: str = Header(None),
+            if_none_match: Optional[str] = Header(None),
         ) -> ProjectListResponse:
             """
-            Fetch all projects for a given user ID.
+            Fetch a page of projects for a given user ID, most recently updated first.
+
+            Projects are listed without their snapshots; fetch those one at a time from
+            /{project_id}/snapshot. Pass the returned next_cursor as ?cursor= to fetch the
+            following page. Responses carry an ETag; send it back as If-None-Match to
+            get a 304 when nothing has changed.
             """
             log.info(f"Fetching projects for user_id: {user_id}")
             try:
@@ -44,16 +62,73 @@ class ProjectController:
                 # Get database client
                 supabase_client = await db_client(token=token)
 
-                # Fetch projects
-                projects = await self.service.get_projects_by_user_id(
+                # Read the version before the page, so the ETag is never newer than
+                # the body it is sent with
+                version = await self.service.get_projects_version(
                     supabase_client=supabase_client, user_id=user_id
                 )
+                etag = make_etag(
+                    "projects", user_id, version, page_size(limit), cursor, fields
+                )
+                headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+                not_modified = etag_matches(if_none_match, etag)
+                record_conditional_get("projects", bool(if_none_match), not_modified)
+                if not_modified:
+                    log.info(f"Projects for user_id {user_id} not modified")
+                    return Response(status_code=304, headers=headers)
+                response.headers.update(headers)
+
+                # Fetch projects
+                projects, next_cursor = await self.service.get_projects_by_user_id(
+                    supabase_client=supabase_client,
+                    user_id=user_id,
+                    limit=limit,
+                    cursor=cursor,
+                    fields=fields,
+                )
 
                 log.info(f"Successfully retrieved {len(projects)} projects")
-                return ProjectListResponse(projects=projects)
+                return ProjectListResponse(projects=projects, next_cursor=next_cursor)
+
+            except ValueError as e:
+                log.error(f"Validation error: {e}")
+                raise HTTPException(status_code=400, detail=str(e))
+            except RuntimeError as e:
+                log.error(f"Service error: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+            except Exception as e:
+                log.error(f"Unexpected error: {e}")
+                raise HTTPException(
+                    status_code=500, detail="An unexpected error occurred"
+                )
+
+        @router.get(
+            "/{project_id}/snapshot",
+            response_model=ProjectSnapshotResponse,
+        )
+        async def get_project_snapshot(
+            project_id: str,
+            authorization: str = Header(None),
+        ) -> ProjectSnapshotResponse:
+            """
+            Fetch the tldraw snapshot of a single project.
+            """
+            log.info(f"Fetching snapshot for project: {project_id}")
+            try:
+                # Extract token from authorization header
+                token = authorization.replace("Bearer ", "") if authorization else ""
+
+                # Get database client
+                supabase_client = await db_client(token=token)
+
+                return await self.service.get_project_snapshot(
+                    supabase_client=supabase_client, project_id=project_id
+                )
 
             except RuntimeError as e:
                 log.error(f"Service error: {e}")
+                if "not found" in str(e).lower():
+                    raise HTTPException(status_code=404, detail=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
             except Exception as e:
                 log.error(f"Unexpected error: {e}")
@@ -142,6 +217,59 @@ class ProjectController:
                     status_code=500, detail="An unexpected error occurred"
                 )
 
+        @router.patch(
+            "/{project_id}/snapshot",
+            response_model=SnapshotPatchResponse,
+        )
+        async def patch_project_snapshot(
+            project_id: str,
+            patch: SnapshotPatchRequest,
+            user_id: str,
+            authorization: str = Header(None),
+        ) -> SnapshotPatchResponse:
+            """
+            Apply the tldraw records changed since base_version to a project's snapshot.
+
+            Returns 409 with the current snapshot_version when the patch conflicts with
+            newer changes; the client should then save its whole document with PUT.
+            """
+            log.info(
+                f"Patching snapshot of project {project_id} for user_id: {user_id}"
+            )
+            try:
+                # Extract token from authorization header
+                token = authorization.replace("Bearer ", "") if authorization else ""
+
+                # Get database client
+                supabase_client = await db_client(token=token)
+
+                return await self.service.patch_snapshot(
+                    supabase_client=supabase_client,
+                    project_id=project_id,
+                    user_id=user_id,
+                    patch=patch,
+                )
+
+            except SnapshotConflictError as e:
+                log.warning(f"Snapshot conflict: {e}")
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "message": str(e),
+                        "snapshot_version": e.current_version,
+                    },
+                )
+            except RuntimeError as e:
+                log.error(f"Service error: {e}")
+                if "unauthorized" in str(e).lower() or "not found" in str(e).lower():
+                    raise HTTPException(status_code=404, detail=str(e))
+                raise HTTPException(status_code=500, detail=str(e))
+            except Exception as e:
+                log.error(f"Unexpected error: {e}")
+                raise HTTPException(
+                    status_code=500, detail="An unexpected error occurred"
+                )
+
         @router.post(
             "/generate-icon",
             response_model=IconGenerationResponse,
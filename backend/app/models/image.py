@@ -1,3 +1,4 @@
+import base64
 from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
@@ -16,6 +17,18 @@ class ImageGenerationRequest(BaseModel):
         default="generate",
         description="The type of operation: 'generate' for new images or 'edit' for modifying existing images.",
     )
+    use_cache: bool = Field(
+        default=True,
+        description="Whether an identical earlier result may be returned. Set to false to always generate a new variation.",
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Identifies the canvas session making the request. A newer request from the same session supersedes this one.",
+    )
+    sequence: Optional[int] = Field(
+        default=None,
+        description="Increases with every request a session makes. Only the highest sequence seen for a session is generated and persisted.",
+    )
 
 
 class ImageGenerationResponse(BaseModel):
@@ -23,3 +36,20 @@ class ImageGenerationResponse(BaseModel):
     text_response: Optional[str] = Field(
         default=None, description="Any text response from the model."
     )
+
+
+class GeneratedImage(BaseModel):
+    image_bytes: bytes = Field(description="Raw bytes of the generated image.")
+    mime_type: str = Field(
+        default="image/png", description="MIME type of the generated image."
+    )
+    text_response: Optional[str] = Field(
+        default=None, description="Any text response from the model."
+    )
+
+    def to_response(self) -> ImageGenerationResponse:
+        """Convert to the base64 JSON representation used by the JSON endpoints."""
+        return ImageGenerationResponse(
+            image_data=base64.b64encode(self.image_bytes).decode("utf-8"),
+            text_response=self.text_response,
+        )
@@ -47,3 +47,7 @@ class ImagePairListResponse(BaseModel):
     image_pairs: List[ImagePair] = Field(
         description="List of image pairs for the project."
     )
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor for the next page of image pairs, or null on the last page.",
+    )
@@ -0,0 +1,19 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class OutboxJob(BaseModel):
+    id: int = Field(description="Row id of the job in the outbox database.")
+    kind: str = Field(description="Job type, used to look up its handler.")
+    idempotency_key: str = Field(
+        description="Key that identifies the job; enqueueing it twice is a no-op."
+    )
+    payload: Dict[str, Any] = Field(description="JSON arguments for the handler.")
+    attempts: int = Field(
+        default=0, description="Number of times the job has been claimed so far."
+    )
+    created_at: float = Field(description="Unix time at which the job was enqueued.")
+    last_error: Optional[str] = Field(
+        default=None, description="Error from the most recent failed attempt."
+    )
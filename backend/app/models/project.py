@@ -4,16 +4,13 @@ from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
-class Project(BaseModel):
+class ProjectSummary(BaseModel):
     id: str = Field(description="The unique identifier for the project.")
     user_id: str = Field(description="The user ID who owns the project.")
     name: Optional[str] = Field(default=None, description="The name of the project.")
     description: Optional[str] = Field(
         default=None, description="The description of the project."
     )
-    snapshot: Optional[Dict[str, Any]] = Field(
-        default=None, description="The snapshot data for the project."
-    )
     icon_url: Optional[str] = Field(
         default=None, description="The URL of the project's 3D icon."
     )
@@ -25,8 +22,75 @@ class Project(BaseModel):
     )
 
 
+class Project(ProjectSummary):
+    snapshot: Optional[Dict[str, Any]] = Field(
+        default=None, description="The snapshot data for the project."
+    )
+    snapshot_version: Optional[int] = Field(
+        default=None,
+        description="Version of the snapshot, incremented on every snapshot write.",
+    )
+    snapshot_ref: Optional[str] = Field(
+        default=None,
+        description="Storage path of the compressed snapshot when it is not kept inline.",
+    )
+    snapshot_size: Optional[int] = Field(
+        default=None, description="Size of the snapshot's JSON in bytes."
+    )
+
+
 class ProjectListResponse(BaseModel):
-    projects: List[Project] = Field(description="List of projects for the user.")
+    projects: List[ProjectSummary] = Field(
+        description="List of projects for the user, without their snapshots."
+    )
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor for the next page of projects, or null on the last page.",
+    )
+
+
+class ProjectSnapshotResponse(BaseModel):
+    project_id: str = Field(description="The ID of the project.")
+    snapshot: Optional[Dict[str, Any]] = Field(
+        default=None, description="The snapshot data for the project."
+    )
+    snapshot_version: int = Field(
+        default=0, description="Version to send as base_version with the next patch."
+    )
+    updated_at: datetime = Field(
+        description="The timestamp when the project was last updated."
+    )
+
+
+class SnapshotPatchRequest(BaseModel):
+    base_version: int = Field(
+        description="The snapshot_version the patch was computed against."
+    )
+    put: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="tldraw records added or changed since base_version, keyed by id.",
+    )
+    remove: List[str] = Field(
+        default_factory=list,
+        description="IDs of tldraw records removed since base_version.",
+    )
+    document_schema: Optional[Dict[str, Any]] = Field(
+        default=None,
+        alias="schema",
+        description="The tldraw schema, only when it changed since base_version.",
+    )
+
+
+class SnapshotPatchResponse(BaseModel):
+    project_id: str = Field(description="The ID of the project.")
+    snapshot_version: int = Field(description="The snapshot version after the patch.")
+    updated_at: datetime = Field(
+        description="The timestamp when the project was last updated."
+    )
+    rebased: bool = Field(
+        default=False,
+        description="Whether the patch was applied on top of newer, unrelated changes.",
+    )
 
 
 class ProjectCreateRequest(BaseModel):
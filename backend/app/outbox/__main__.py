@@ -0,0 +1,73 @@
+"""
+Run the outbox worker as its own process:
+
+    poetry run python -m app.outbox --env-file .env
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(name)s - %(message)s",
+)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+log = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    # Imported here so that module-level configuration sees the loaded .env file
+    from app.outbox.store import outbox_store, update_outbox_metrics
+    from app.outbox.worker import OutboxWorker
+    from app.utils.config import get_env_float, get_env_int
+    from app.utils.database import client_manager
+    from app.utils.llm import close_openai_client, init_openai_client
+    from app.utils.metrics import serve_metrics
+
+    try:
+        init_openai_client()
+    except Exception as e:
+        # Topic descriptions fall back to a generic label until a key is configured
+        log.warning(f"OpenAI client not initialized: {e}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    # The worker's stages (uploads, Fal, OpenAI) are only measured in this process
+    metrics_server = None
+    metrics_port = get_env_int("OUTBOX_METRICS_PORT", 9101)
+    if metrics_port:
+        metrics_server = await serve_metrics(
+            host=os.environ.get("OUTBOX_METRICS_HOST") or "0.0.0.0",
+            port=metrics_port,
+            refresh=lambda: update_outbox_metrics(outbox_store),
+        )
+
+    worker = OutboxWorker.from_env(outbox_store)
+    try:
+        await worker.run(
+            stop,
+            shutdown_grace_seconds=get_env_float("OUTBOX_SHUTDOWN_GRACE_SECONDS", 30),
+        )
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+        await client_manager.close()
+        await close_openai_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process the persistence outbox.")
+    parser.add_argument("--env-file", help="Load environment variables from this file")
+    args = parser.parse_args()
+    if args.env_file:
+        load_dotenv(args.env_file)
+    asyncio.run(main())
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.models.outbox import OutboxJob
+from app.models.project import IconGenerationRequest, ProjectUpdateRequest
+from app.outbox.store import OutboxStore
+from app.services.project import ProjectService
+from app.utils.config import get_env_float
+from app.utils.database import service_db_client
+from app.utils.image_payload import ImagePayload
+from app.utils.storage import (
+    download_and_upload_image_from_url,
+    save_image_pair_to_db,
+    upload_image_to_storage,
+)
+from app.utils.timing import StageTimer
+
+log = logging.getLogger(__name__)
+
+SAVE_IMAGE_PAIR = "save_image_pair"
+GENERATE_PROJECT_ICON = "generate_project_icon"
+
+ICON_UPLOAD_TIMEOUT_SECONDS = get_env_float("ICON_UPLOAD_TIMEOUT_SECONDS", 30)
+
+JobHandler = Callable[[OutboxJob, OutboxStore], Awaitable[None]]
+
+
+async def generate_and_save_project_icon(
+    user_id: Optional[str],
+    project_id: str,
+):
+    """
+    Generate and save a 3D icon for the project if it doesn't have one.
+
+    Free for projects already known to have an icon, and concurrent calls for the same
+    project share one run. Raises on failure so that the outbox worker can retry.
+    """
+    await ProjectService.ensure_icon(
+        project_id,
+        lambda: _generate_and_save_project_icon(user_id=user_id, project_id=project_id),
+    )
+
+
+async def _generate_and_save_project_icon(
+    user_id: Optional[str],
+    project_id: str,
+):
+    log.info(f"Starting job to generate icon for project {project_id}")
+
+    # Jobs run with the service role; ownership was checked when they were queued
+    supabase_client = await service_db_client()
+
+    # Initialize project service
+    project_service = ProjectService()
+
+    # Get project details
+    project = await project_service.get_project_by_id(
+        supabase_client=supabase_client,
+        project_id=project_id,
+    )
+
+    # Skip if the project changed hands since the job was queued
+    if user_id is not None and project.user_id != user_id:
+        log.warning(f"Project {project_id} is no longer owned by {user_id}, skipping")
+        return
+
+    # Skip if project already has an icon
+    if project.icon_url:
+        log.info(f"Project {project_id} already has an icon, skipping generation")
+        return
+
+    # Generate icon prompt from project name
+    icon_prompt = project.name if project.name else "abstract 3D icon"
+    log.info(f"Generating 3D icon for project with prompt: {icon_prompt}")
+
+    # Generate the 3D icon
+    icon_request = IconGenerationRequest(
+        prompt=icon_prompt,
+        project_id=project_id,
+        user_id=project.user_id,
+        style="3D render, isometric, clean background, modern, professional graphic",
+    )
+    timer = StageTimer()
+    icon_response = await project_service.generate_3d_icon(
+        supabase_client=supabase_client, request=icon_request, timer=timer
+    )
+
+    # Download and upload the icon to Supabase storage
+    with timer.stage("upload"):
+        async with asyncio.timeout(ICON_UPLOAD_TIMEOUT_SECONDS):
+            icon_url = await download_and_upload_image_from_url(
+                supabase_client=supabase_client,
+                image_url=icon_response.image_url,
+                folder="project_icons",
+            )
+
+    # Update the project with the icon URL
+    update_request = ProjectUpdateRequest(icon_url=icon_url)
+    await project_service.update_project(
+        supabase_client=supabase_client,
+        project_id=project_id,
+        user_id=project.user_id,
+        project_data=update_request,
+    )
+
+    log.info(
+        f"Successfully generated and saved icon for project {project_id} ({timer.summary()})"
+    )
+
+
+async def save_images_to_database(
+    project_id: str,
+    input_image: ImagePayload,
+    output_image: ImagePayload,
+    prompt_text: str,
+):
+    """
+    Upload images to storage and save the pair to database.
+
+    Raises on failure so that the outbox worker can retry.
+    """
+    log.info(f"Starting job to save images for project {project_id}")
+
+    # Jobs run with the service role; ownership was checked when they were queued
+    supabase_client = await service_db_client()
+
+    # Upload both images concurrently
+    (
+        (input_url, input_mime_type, input_width, input_height),
+        (output_url, output_mime_type, output_width, output_height),
+    ) = await asyncio.gather(
+        upload_image_to_storage(
+            supabase_client=supabase_client,
+            image=input_image,
+            folder="image_pairs/input",
+        ),
+        upload_image_to_storage(
+            supabase_client=supabase_client,
+            image=output_image,
+            folder="image_pairs/output",
+        ),
+    )
+
+    # Save image pair to database
+    await save_image_pair_to_db(
+        supabase_client=supabase_client,
+        project_id=project_id,
+        input_url=input_url,
+        input_mime_type=input_mime_type,
+        input_width=input_width,
+        input_height=input_height,
+        output_url=output_url,
+        output_mime_type=output_mime_type,
+        output_width=output_width,
+        output_height=output_height,
+        prompt_text=prompt_text,
+    )
+
+    # A new prompt changes the context the topic description is generated from
+    ProjectService.invalidate_topic_description(project_id)
+
+    log.info(f"Successfully saved image pair for project {project_id}")
+
+
+async def run_save_image_pair(job: OutboxJob, store: OutboxStore) -> None:
+    payload = job.payload
+    blobs = payload["blobs"]
+    input_data, output_data = await asyncio.gather(
+        asyncio.to_thread(store.read_blob, blobs["input"]),
+        asyncio.to_thread(store.read_blob, blobs["output"]),
+    )
+    await save_images_to_database(
+        project_id=payload["project_id"],
+        input_image=ImagePayload(input_data),
+        output_image=ImagePayload(
+            output_data, mime_type=payload.get("output_mime_type")
+        ),
+        prompt_text=payload["prompt_text"],
+    )
+
+
+async def run_generate_project_icon(job: OutboxJob, store: OutboxStore) -> None:
+    await generate_and_save_project_icon(
+        # Absent from jobs queued before the payload stopped carrying a token
+        user_id=job.payload.get("user_id"),
+        project_id=job.payload["project_id"],
+    )
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    SAVE_IMAGE_PAIR: run_save_image_pair,
+    GENERATE_PROJECT_ICON: run_generate_project_icon,
+}
+
+
+def enqueue_image_pair(
+    store: OutboxStore,
+    user_id: str,
+    project_id: str,
+    prompt_text: str,
+    input_image: ImagePayload,
+    output_image: ImagePayload,
+    deadline: Optional[float] = None,
+) -> bool:
+    """
+    Queue the upload of an input/output image pair. Blocking; see OutboxStore.
+
+    The caller must have checked that user_id owns the project, since the job runs
+    with the service role. A pair with a deadline (Unix time) is expired instead of
+    saved once it has passed.
+    """
+    # The same pair for the same prompt is only ever saved once
+    pair_digest = hashlib.sha256(
+        "\0".join((input_image.digest, output_image.digest, prompt_text)).encode()
+    ).hexdigest()
+    payload = {
+        "user_id": user_id,
+        "project_id": project_id,
+        "prompt_text": prompt_text,
+        "output_mime_type": output_image.mime_type,
+    }
+    if deadline is not None:
+        payload["deadline"] = deadline
+    return store.enqueue(
+        kind=SAVE_IMAGE_PAIR,
+        idempotency_key=f"{SAVE_IMAGE_PAIR}:{project_id}:{pair_digest}",
+        payload=payload,
+        blobs={"input": input_image.data, "output": output_image.data},
+    )
+
+
+def enqueue_project_icon(store: OutboxStore, user_id: str, project_id: str) -> bool:
+    """
+    Queue icon generation for a project. Blocking; see OutboxStore.
+
+    The caller must have checked that user_id owns the project.
+    """
+    # One icon job per project; the job itself skips projects that already have one
+    return store.enqueue(
+        kind=GENERATE_PROJECT_ICON,
+        idempotency_key=f"icon:{project_id}",
+        payload={"user_id": user_id, "project_id": project_id},
+    )
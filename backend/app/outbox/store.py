@@ -0,0 +1,407 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.models.outbox import OutboxJob
+from app.utils.config import get_env_float
+from app.utils.metrics import Gauge
+
+log = logging.getLogger(__name__)
+
+# Unreferenced blobs younger than this are kept, because an enqueue may have written the
+# blob but not yet inserted the job that references it
+BLOB_GRACE_SECONDS = 600
+# Number of recently finished jobs used for the latency metrics
+LATENCY_WINDOW = 500
+
+OUTBOX_JOBS = Gauge("drawdash_outbox_jobs", "Outbox jobs by status.", ("status",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_available ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS job_blobs (
+    job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (job_id, digest)
+);
+CREATE INDEX IF NOT EXISTS job_blobs_digest ON job_blobs (digest);
+"""
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class OutboxStore:
+    """
+    Durable queue of persistence jobs, shared by the API and the outbox worker.
+
+    Jobs live in a SQLite database in WAL mode, so API processes can enqueue while a
+    separate worker process drains the queue. Large binary arguments (the image bytes)
+    are written to a content-addressed blob directory next to the database instead of
+    being kept in memory or stored in the database itself.
+
+    Every job has an idempotency key: enqueueing a key that is already pending, running
+    or done is a no-op, while a key whose job has permanently failed or expired is
+    re-armed.
+
+    All methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, directory: str, busy_timeout_seconds: float = 30):
+        self.directory = directory
+        self.db_path = os.path.join(directory, "outbox.sqlite3")
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(self.blob_dir, exist_ok=True)
+            connection = sqlite3.connect(
+                self.db_path, timeout=self.busy_timeout_seconds
+            )
+            try:
+                # WAL lets readers and one writer work concurrently across processes
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+            finally:
+                connection.close()
+            self._initialized = True
+
+    @contextmanager
+    def _connect(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection; the block runs in one transaction."""
+        self._initialize()
+        # isolation_level=None so that transactions are controlled explicitly below
+        connection = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout_seconds, isolation_level=None
+        )
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # Writers take the lock up front so concurrent claims never interleave
+            connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def put_blob(self, data: bytes) -> str:
+        """Store bytes in the blob directory and return their SHA-256 digest."""
+        self._initialize()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            # Refresh the modification time so a concurrent prune keeps it
+            os.utime(path)
+            return digest
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return digest
+
+    def read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    def enqueue(
+        self,
+        kind: str,
+        idempotency_key: str,
+        payload: Dict[str, Any],
+        blobs: Optional[Dict[str, bytes]] = None,
+    ) -> bool:
+        """
+        Add a job to the outbox.
+
+        Args:
+            kind: Job type, used by the worker to pick a handler
+            idempotency_key: Key that identifies the job across retries and duplicates
+            payload: JSON-serialisable handler arguments
+            blobs: Binary arguments by name; the handler receives their digests in
+                payload["blobs"] and reads them with read_blob
+
+        Returns:
+            True if a job was queued, False if the key was already pending or done
+        """
+        payload = dict(payload)
+        if blobs:
+            payload["blobs"] = {
+                name: self.put_blob(data) for name, data in blobs.items()
+            }
+        now = time.time()
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                """
+                INSERT INTO jobs (kind, idempotency_key, payload, available_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (idempotency_key) DO UPDATE SET
+                    kind = excluded.kind,
+                    payload = excluded.payload,
+                    status = 'pending',
+                    attempts = 0,
+                    available_at = excluded.available_at,
+                    lease_expires_at = NULL,
+                    created_at = excluded.created_at,
+                    started_at = NULL,
+                    finished_at = NULL,
+                    last_error = NULL
+                WHERE jobs.status IN ('failed', 'expired')
+                """,
+                (kind, idempotency_key, json.dumps(payload), now, now),
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            (job_id,) = connection.execute(
+                "SELECT id FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+            connection.execute("DELETE FROM job_blobs WHERE job_id = ?", (job_id,))
+            connection.executemany(
+                "INSERT OR IGNORE INTO job_blobs (job_id, digest) VALUES (?, ?)",
+                [(job_id, digest) for digest in payload.get("blobs", {}).values()],
+            )
+        return True
+
+    def claim(self, limit: int, lease_seconds: float) -> List[OutboxJob]:
+        """
+        Lease up to limit jobs that are due, oldest first.
+
+        Running jobs whose lease has expired (because their worker died) are claimed
+        again, so no job is lost when a worker restarts.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            rows = connection.execute(
+                """
+                SELECT * FROM jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'running' AND lease_expires_at <= ?)
+                ORDER BY available_at, id
+                LIMIT ?
+                """,
+                (now, now, limit),
+            ).fetchall()
+            connection.executemany(
+                """
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1,
+                    started_at = ?, lease_expires_at = ?
+                WHERE id = ?
+                """,
+                [(now, now + lease_seconds, row["id"]) for row in rows],
+            )
+
+        return [
+            OutboxJob(
+                id=row["id"],
+                kind=row["kind"],
+                idempotency_key=row["idempotency_key"],
+                payload=json.loads(row["payload"]),
+                attempts=row["attempts"] + 1,
+                created_at=row["created_at"],
+                last_error=row["last_error"],
+            )
+            for row in rows
+        ]
+
+    def complete(self, job_id: int) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                """
+                UPDATE jobs
+                SET status = 'done', finished_at = ?, lease_expires_at = NULL
+                WHERE id = ?
+                """,
+                (time.time(), job_id),
+            )
+            # The blobs are no longer needed; prune() deletes unreferenced files
+            connection.execute("DELETE FROM job_blobs WHERE job_id = ?", (job_id,))
+
+    def fail(self, job_id: int, error: str, retry_at: Optional[float]) -> None:
+        """Record a failed attempt, scheduling a retry or failing the job for good."""
+        with self._connect() as connection:
+            if retry_at is None:
+                connection.execute(
+                    """
+                    UPDATE jobs
+                    SET status = 'failed', finished_at = ?, lease_expires_at = NULL,
+                        last_error = ?
+                    WHERE id = ?
+                    """,
+                    (time.time(), error, job_id),
+                )
+            else:
+                connection.execute(
+                    """
+                    UPDATE jobs
+                    SET status = 'pending', available_at = ?, lease_expires_at = NULL,
+                        last_error = ?
+                    WHERE id = ?
+                    """,
+                    (retry_at, error, job_id),
+                )
+
+    def expire(self, job_id: int) -> None:
+        """Record a job that was dropped unrun because its deadline had passed."""
+        with self._connect() as connection:
+            connection.execute(
+                """
+                UPDATE jobs
+                SET status = 'expired', finished_at = ?, lease_expires_at = NULL
+                WHERE id = ?
+                """,
+                (time.time(), job_id),
+            )
+            connection.execute("DELETE FROM job_blobs WHERE job_id = ?", (job_id,))
+
+    def release(self, job_id: int) -> None:
+        """Hand a claimed job back without counting the attempt, e.g. on shutdown."""
+        with self._connect() as connection:
+            connection.execute(
+                """
+                UPDATE jobs
+                SET status = 'pending', attempts = MAX(attempts - 1, 0),
+                    lease_expires_at = NULL
+                WHERE id = ? AND status = 'running'
+                """,
+                (job_id,),
+            )
+
+    def prune(self, retention_seconds: float) -> int:
+        """
+        Delete finished jobs older than the retention period and unreferenced blobs.
+
+        Returns:
+            The number of jobs deleted
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                """
+                DELETE FROM jobs
+                WHERE status IN ('done', 'failed', 'expired') AND finished_at < ?
+                """,
+                (time.time() - retention_seconds,),
+            )
+            deleted = cursor.rowcount
+            referenced = {
+                row[0]
+                for row in connection.execute("SELECT DISTINCT digest FROM job_blobs")
+            }
+
+        cutoff = time.time() - BLOB_GRACE_SECONDS
+        with os.scandir(self.blob_dir) as it:
+            for entry in it:
+                if entry.name in referenced or not entry.is_file():
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per status and latency of recently finished jobs."""
+        now = time.time()
+        with self._connect(write=False) as connection:
+            counts = {
+                row["status"]: row["count"]
+                for row in connection.execute(
+                    "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+                )
+            }
+            (oldest_pending,) = connection.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()
+            recent = connection.execute(
+                """
+                SELECT finished_at - created_at AS latency,
+                       finished_at - started_at AS duration,
+                       attempts
+                FROM jobs
+                WHERE status = 'done'
+                ORDER BY finished_at DESC
+                LIMIT ?
+                """,
+                (LATENCY_WINDOW,),
+            ).fetchall()
+
+        stats: Dict[str, Any] = {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "expired": counts.get("expired", 0),
+            "oldest_pending_age_seconds": (
+                round(now - oldest_pending, 3) if oldest_pending else 0.0
+            ),
+        }
+        if recent:
+            latencies = sorted(row["latency"] for row in recent)
+            durations = sorted(row["duration"] for row in recent)
+            stats["recent_jobs"] = len(recent)
+            stats["latency_seconds"] = {
+                "p50": round(_percentile(latencies, 0.5), 3),
+                "p95": round(_percentile(latencies, 0.95), 3),
+                "max": round(latencies[-1], 3),
+            }
+            stats["run_seconds"] = {
+                "p50": round(_percentile(durations, 0.5), 3),
+                "p95": round(_percentile(durations, 0.95), 3),
+                "max": round(durations[-1], 3),
+            }
+            stats["retried_jobs"] = sum(1 for row in recent if row["attempts"] > 1)
+        return stats
+
+
+outbox_store = OutboxStore(
+    directory=os.environ.get("OUTBOX_DIR") or ".outbox",
+    busy_timeout_seconds=get_env_float("OUTBOX_BUSY_TIMEOUT_SECONDS", 30),
+)
+
+
+async def update_outbox_metrics(store: OutboxStore) -> None:
+    """Refresh the job gauges from the store before the metrics are rendered."""
+    stats = await asyncio.to_thread(store.stats)
+    for job_status in ("pending", "running", "done", "failed", "expired"):
+        OUTBOX_JOBS.set(stats[job_status], job_status)
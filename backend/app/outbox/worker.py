@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+from app.models.outbox import OutboxJob
+from app.outbox.jobs import JOB_HANDLERS, JobHandler
+from app.outbox.store import OutboxStore
+from app.utils.config import get_env_float, get_env_int
+from app.utils.deadline import is_expired, record_expired
+
+log = logging.getLogger(__name__)
+
+# How often finished jobs and unreferenced blobs are cleaned up
+PRUNE_INTERVAL_SECONDS = 300
+
+
+class OutboxWorker:
+    """
+    Drains the outbox: claims due jobs, runs their handlers and records the outcome.
+
+    Up to concurrency jobs run at once. A failed job is retried with exponential backoff
+    and jitter until max_attempts is reached, after which it is marked failed. Each job
+    holds a lease while it runs, so if this process dies the job is picked up again once
+    the lease expires. Jobs whose payload carries a deadline (Unix time) that has passed
+    by the time they are claimed are marked expired without running.
+    """
+
+    def __init__(
+        self,
+        store: OutboxStore,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2,
+        retry_max_seconds: float = 300,
+        lease_seconds: float = 600,
+        poll_interval_seconds: float = 1,
+        retention_seconds: float = 86400,
+        handlers: Optional[Dict[str, JobHandler]] = None,
+    ):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retention_seconds = retention_seconds
+        self.handlers = handlers if handlers is not None else JOB_HANDLERS
+        self._tasks: Dict[asyncio.Task, OutboxJob] = {}
+        self._last_prune = 0.0
+
+    @classmethod
+    def from_env(cls, store: OutboxStore) -> "OutboxWorker":
+        return cls(
+            store=store,
+            concurrency=get_env_int("OUTBOX_CONCURRENCY", 4),
+            max_attempts=get_env_int("OUTBOX_MAX_ATTEMPTS", 5),
+            retry_base_seconds=get_env_float("OUTBOX_RETRY_BASE_SECONDS", 2),
+            retry_max_seconds=get_env_float("OUTBOX_RETRY_MAX_SECONDS", 300),
+            lease_seconds=get_env_float("OUTBOX_LEASE_SECONDS", 600),
+            poll_interval_seconds=get_env_float("OUTBOX_POLL_SECONDS", 1),
+            retention_seconds=get_env_float("OUTBOX_RETENTION_SECONDS", 86400),
+        )
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(
+            self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds
+        )
+        # Jitter spreads out retries of jobs that failed together, e.g. during an outage
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run_job(self, job: OutboxJob) -> None:
+        deadline = job.payload.get("deadline")
+        if is_expired(deadline):
+            record_expired("outbox")
+            log.info(
+                f"Job {job.idempotency_key} expired "
+                f"{time.time() - deadline:.2f}s past its deadline"
+            )
+            await asyncio.to_thread(self.store.expire, job.id)
+            return
+
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job.kind}'")
+            # Never outlive the lease, or another worker could pick the job up as well
+            async with asyncio.timeout(self.lease_seconds):
+                await handler(job, self.store)
+        except asyncio.CancelledError:
+            # Shutting down: give the job back instead of waiting for its lease to expire
+            await asyncio.to_thread(self.store.release, job.id)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts >= self.max_attempts or handler is None:
+                log.error(
+                    f"Job {job.idempotency_key} failed permanently after "
+                    f"{job.attempts} attempts: {error}"
+                )
+                await asyncio.to_thread(self.store.fail, job.id, error, None)
+            else:
+                delay = self._retry_delay(job.attempts)
+                log.warning(
+                    f"Job {job.idempotency_key} failed (attempt {job.attempts}), "
+                    f"retrying in {delay:.1f}s: {error}"
+                )
+                await asyncio.to_thread(
+                    self.store.fail, job.id, error, time.time() + delay
+                )
+            return
+
+        await asyncio.to_thread(self.store.complete, job.id)
+        log.info(
+            f"Job {job.idempotency_key} done in "
+            f"{time.time() - job.created_at:.2f}s since enqueue"
+        )
+
+    async def _prune(self) -> None:
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            deleted = await asyncio.to_thread(self.store.prune, self.retention_seconds)
+            if deleted:
+                log.info(f"Pruned {deleted} finished outbox jobs")
+        except Exception as e:
+            log.error(f"Error pruning outbox: {e}")
+
+    async def run(
+        self, stop: asyncio.Event, shutdown_grace_seconds: float = 30
+    ) -> None:
+        """
+        Process jobs until stop is set, then wait for running jobs to finish.
+
+        Jobs still running after shutdown_grace_seconds are cancelled and released back
+        to the queue.
+        """
+        log.info(f"Outbox worker started with concurrency {self.concurrency}")
+        try:
+            while not stop.is_set():
+                await self._prune()
+
+                free_slots = self.concurrency - len(self._tasks)
+                claimed = []
+                if free_slots > 0:
+                    try:
+                        claimed = await asyncio.to_thread(
+                            self.store.claim, free_slots, self.lease_seconds
+                        )
+                    except Exception as e:
+                        log.error(f"Error claiming outbox jobs: {e}")
+                for job in claimed:
+                    self._tasks[asyncio.create_task(self._run_job(job))] = job
+
+                if claimed and len(self._tasks) < self.concurrency:
+                    # There may be more due jobs; claim again straight away
+                    continue
+
+                # Wake up when a slot frees up, on shutdown, or to poll for new jobs
+                stop_task = asyncio.create_task(stop.wait())
+                await asyncio.wait(
+                    [stop_task, *self._tasks],
+                    timeout=self.poll_interval_seconds,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                stop_task.cancel()
+                self._reap()
+        finally:
+            await self._drain(shutdown_grace_seconds)
+            log.info("Outbox worker stopped")
+
+    def _reap(self) -> None:
+        for task in [task for task in self._tasks if task.done()]:
+            job = self._tasks.pop(task)
+            if not task.cancelled() and task.exception() is not None:
+                log.error(
+                    f"Error recording outcome of job {job.idempotency_key}: "
+                    f"{task.exception()}"
+                )
+
+    async def _drain(self, shutdown_grace_seconds: float) -> None:
+        if not self._tasks:
+            return
+        log.info(f"Waiting for {len(self._tasks)} running outbox jobs")
+        _, pending = await asyncio.wait(self._tasks, timeout=shutdown_grace_seconds)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        self._reap()
@@ -1,69 +1,230 @@
-import base64
+import asyncio
 import logging
-from io import BytesIO
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from google import genai
-from PIL import Image
+from google.genai import errors as genai_errors
+from google.genai import types
 
-from app.models.image import ImageGenerationRequest, ImageGenerationResponse
+from app.models.image import GeneratedImage, ImageGenerationRequest
+from app.utils.canvas import CanvasPreprocessor
+from app.utils.concurrency import SingleFlight, Supersession
+from app.utils.config import get_env_bool, get_env_float, get_env_int
+from app.utils.generation_cache import GenerationCache
+from app.utils.image_payload import ImagePayload
+from app.utils.metrics import record_upstream_error, timed
 from app.utils.prompts import EDIT_PROMPT, GENERATE_PROMPT
+from app.utils.scheduler import AdmissionRejectedError, FairScheduler
 
 log = logging.getLogger(__name__)
 
 
+def decode_image_data(image_data: Optional[str]) -> Optional[ImagePayload]:
+    """Decode optional base64 image data from a JSON request, once per request."""
+    if not image_data:
+        return None
+    try:
+        with timed("image_decode"):
+            return ImagePayload.from_base64(image_data)
+    except ValueError as e:
+        log.error(f"Error decoding input image: {e}")
+        raise
+
+
 class ImageService:
     def __init__(self):
         self.client = genai.Client()
         self.model = "gemini-2.5-flash-image"
+        self.timeout_seconds = get_env_float("GEMINI_TIMEOUT_SECONDS", 120)
+        # Upper bound on concurrent Gemini calls per worker; extra calls queue fairly
+        # across clients, and each client is rate limited on its own
+        self.scheduler = FairScheduler(
+            max_concurrency=get_env_int("GEMINI_MAX_CONCURRENCY", 32),
+            rate_per_minute=get_env_float("GENERATION_RATE_PER_MINUTE", 30),
+            burst=get_env_int("GENERATION_BURST", 10),
+            max_queued=get_env_int("GENERATION_MAX_QUEUED", 256),
+            max_queued_per_client=get_env_int("GENERATION_MAX_QUEUED_PER_CLIENT", 16),
+            name="model",
+        )
+        # Latest request per canvas session; older in-flight generations are cancelled
+        self.sessions = Supersession(
+            max_sessions=get_env_int("GENERATION_SESSIONS_MAX", 10000)
+        )
+        # Identical generations in flight at the same time share one Gemini call
+        self._flights: SingleFlight[str, GeneratedImage] = SingleFlight(
+            cancel_abandoned=True
+        )
+        self.cache = GenerationCache(
+            max_bytes=get_env_int("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024),
+            max_entries=get_env_int("IMAGE_CACHE_MAX_ENTRIES", 1024),
+            disk_dir=os.environ.get("IMAGE_CACHE_DIR") or None,
+            disk_max_bytes=get_env_int("IMAGE_CACHE_DISK_MAX_BYTES", 0) or None,
+        )
+        self.canvas = CanvasPreprocessor(
+            enabled=get_env_bool("CANVAS_PREPROCESS", True),
+            max_edge=get_env_int("CANVAS_MAX_EDGE", 1024),
+            padding=get_env_int("CANVAS_CROP_PADDING", 16),
+            palette_colors=get_env_int("CANVAS_PALETTE_COLORS", 16),
+            output_format=os.environ.get("CANVAS_OUTPUT_FORMAT", "png").lower(),
+        )
 
-    async def generate_image(
-        self, input: ImageGenerationRequest
-    ) -> ImageGenerationResponse:
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.scheduler.max_concurrency,
+            "in_flight": self.scheduler.running,
+            "waiting": self.scheduler.queued,
+            "scheduler": self.scheduler.stats(),
+            "coalescing": self._flights.stats(),
+        }
+
+    def _upstream_error(self, e: Exception) -> Exception:
+        """The error to raise for a failed Gemini call."""
+        if isinstance(e, genai_errors.APIError) and e.code == 429:
+            # Over the shared upstream quota: ask the client to back off, don't fail
+            return AdmissionRejectedError(
+                "Image generation is over its upstream quota",
+                self.scheduler.record_upstream_throttled(),
+            )
+        return RuntimeError(f"Failed to generate image: {e}")
+
+    async def _generate_content(self, contents: list, client_id: Optional[str]):
+        """
+        Call the async Gemini API, bounded by the scheduler and the per-call timeout.
+
+        Cancelling the caller (e.g. because the client disconnected) cancels the upstream call.
+
+        Raises:
+            AdmissionRejectedError: If the client is over its rate or the queue is full
         """
-        Generate an image using Google's Imagen API.
+        async with self.scheduler.slot(client_id):
+            with timed("model_call"):
+                try:
+                    async with asyncio.timeout(self.timeout_seconds):
+                        return await self.client.aio.models.generate_content(
+                            model=self.model, contents=contents
+                        )
+                except Exception as e:
+                    record_upstream_error("gemini", e)
+                    raise
+
+    def _prepare_request(
+        self, input: ImageGenerationRequest, image: Optional[ImagePayload]
+    ) -> Tuple[str, str]:
+        """
+        Validate a request and build its prompt along with its result cache key.
+
+        The cache key uses the digest of the canvas as uploaded, so cache hits skip
+        pre-processing entirely.
+
+        Returns:
+            Tuple of (prompt, cache_key)
+        """
+        # Select prompt template based on operation type
+        prompt_template = GENERATE_PROMPT if input.type == "generate" else EDIT_PROMPT
+        prompt = prompt_template.format(user_prompt=input.prompt)
+
+        if image and image.format is None:
+            log.error("Error decoding input image: unsupported image format")
+            raise ValueError("Invalid image data: unsupported image format")
+
+        cache_key = GenerationCache.make_key(
+            model=self.model,
+            prompt=prompt,
+            request_type=input.type,
+            image_digest=image.digest if image else None,
+        )
+        return prompt, cache_key
+
+    async def _build_contents(
+        self, prompt: str, image: Optional[ImagePayload]
+    ) -> List[Any]:
+        """Build the Gemini contents, pre-processing the canvas off the event loop."""
+        # Build the contents list - prompt is required, reference image is optional
+        contents: List[Any] = [prompt]
+        if image:
+            with timed("canvas_preprocess"):
+                image = await asyncio.to_thread(self.canvas.process, image)
+            contents.append(
+                types.Part.from_bytes(data=image.data, mime_type=image.mime_type)
+            )
+            log.info("Added reference image to request")
+        return contents
+
+    async def _get_cached(
+        self, input: ImageGenerationRequest, cache_key: str
+    ) -> Optional[GeneratedImage]:
+        # Identical requests produce interchangeable results, so serve them from the cache
+        if not input.use_cache:
+            self.cache.record_bypass()
+            return None
+
+        cached_image = await self.cache.get(cache_key)
+        if cached_image is not None:
+            log.info(f"Returning cached image generation result {cache_key[:12]}")
+        return cached_image
+
+    async def generate(
+        self,
+        input: ImageGenerationRequest,
+        image: Optional[ImagePayload],
+        client_id: Optional[str] = None,
+    ) -> GeneratedImage:
+        """
+        Generate an image using Google's Imagen API, working on raw image bytes.
 
         Args:
-            input: The image generation request containing prompt and optional input image
+            input: The image generation request; its image_data field is ignored
+            image: Optional input image, decoded once per request
+            client_id: Who the Gemini call is queued and rate limited for
 
         Returns:
-            ImageGenerationResponse containing the generated image data
+            GeneratedImage containing the raw generated image bytes
+
+        Raises:
+            AdmissionRejectedError: If the client is over its rate, the queue is full or
+                Gemini itself is rate limiting
         """
         log.info(
             f"Generating image with type '{input.type}' and prompt: {input.prompt}"
         )
 
-        # Select prompt template based on operation type
-        prompt_template = GENERATE_PROMPT if input.type == "generate" else EDIT_PROMPT
-        prompt = prompt_template.format(user_prompt=input.prompt)
+        prompt, cache_key = self._prepare_request(input, image)
+        cached_image = await self._get_cached(input, cache_key)
+        if cached_image is not None:
+            return cached_image
+
+        if not input.use_cache:
+            # The caller wants a fresh variation, not one shared with another request
+            return await self._generate_uncached(prompt, image, cache_key, client_id)
+
+        # Requests identical to one already in flight (retries, double submits) attach
+        # to its Gemini call instead of making their own
+        return await self._flights.run(
+            cache_key,
+            lambda: self._generate_uncached(prompt, image, cache_key, client_id),
+        )
 
-        # Prepare reference image if provided
-        reference_image = None
-        if input.image_data:
-            try:
-                image_bytes = base64.b64decode(input.image_data)
-                reference_image = Image.open(BytesIO(image_bytes))
-                log.info("Added reference image to request")
-            except Exception as e:
-                log.error(f"Error decoding input image: {e}")
-                raise ValueError(f"Invalid image data: {e}")
+    async def _generate_uncached(
+        self,
+        prompt: str,
+        image: Optional[ImagePayload],
+        cache_key: str,
+        client_id: Optional[str],
+    ) -> GeneratedImage:
+        """Call Gemini for a request that missed the cache and cache its result."""
+        contents = await self._build_contents(prompt, image)
 
         # Call Gemini API with image generation model
         try:
-            # Build the contents list - prompt is required, reference image is optional
-            contents = [prompt]
-            if reference_image:
-                contents.append(reference_image)
-
-            response = self.client.models.generate_content(
-                model=self.model, contents=contents
-            )
+            response = await self._generate_content(contents, client_id)
 
             # Parse the response - can contain text and/or image parts
             if not response.candidates or len(response.candidates) == 0:
                 log.error("No candidates received from Gemini API")
                 raise ValueError("No response generated by the model")
 
-            generated_image_data = None
+            generated_image = None
             text_response = None
 
             # Iterate through response parts to extract text and image
@@ -72,21 +233,156 @@ class ImageService:
                     text_response = part.text
                     log.info(f"Received text response: {text_response[:100]}...")
                 elif part.inline_data is not None:
-                    # Convert inline data to base64
-                    generated_image_data = base64.b64encode(
-                        part.inline_data.data
-                    ).decode("utf-8")
-                    log.info("Generated image received and encoded")
+                    generated_image = part.inline_data
+                    log.info("Generated image received")
 
             # Ensure we got at least an image
-            if not generated_image_data:
+            if not generated_image or not generated_image.data:
                 log.error("No image data received from Gemini API")
                 raise ValueError("No image generated by the model")
 
-            return ImageGenerationResponse(
-                image_data=generated_image_data, text_response=text_response
+            result = GeneratedImage(
+                image_bytes=generated_image.data,
+                mime_type=generated_image.mime_type or "image/png",
+                text_response=text_response,
             )
+            await self.cache.set(cache_key, result)
+            return result
 
+        except TimeoutError:
+            log.error(f"Gemini API call timed out after {self.timeout_seconds}s")
+            raise TimeoutError(
+                f"Image generation timed out after {self.timeout_seconds} seconds"
+            )
+        except AdmissionRejectedError:
+            raise
         except Exception as e:
             log.error(f"Error calling Gemini API: {e}")
-            raise RuntimeError(f"Failed to generate image: {e}")
+            raise self._upstream_error(e)
+
+    async def _stream_model(
+        self,
+        contents: list,
+        client_id: Optional[str],
+        events: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    ) -> Tuple[Optional[types.Blob], List[str]]:
+        """
+        Make a streaming Gemini call, bounded by the scheduler and the per-call timeout.
+
+        Puts a "started" event on the queue once a slot is free and a "text" event for
+        each piece of model text, then None when the call ends, however it ends.
+
+        Returns:
+            The generated image, if any, and the model's text parts
+        """
+        generated_image = None
+        text_parts: List[str] = []
+        try:
+            async with self.scheduler.slot(client_id):
+                events.put_nowait({"event": "started", "data": {}})
+                with timed("model_call"):
+                    async with asyncio.timeout(self.timeout_seconds):
+                        stream = await self.client.aio.models.generate_content_stream(
+                            model=self.model, contents=contents
+                        )
+                        try:
+                            async for chunk in stream:
+                                if (
+                                    not chunk.candidates
+                                    or not chunk.candidates[0].content
+                                ):
+                                    continue
+                                for part in chunk.candidates[0].content.parts or []:
+                                    if part.text is not None:
+                                        text_parts.append(part.text)
+                                        events.put_nowait(
+                                            {
+                                                "event": "text",
+                                                "data": {"text": part.text},
+                                            }
+                                        )
+                                    elif part.inline_data is not None:
+                                        generated_image = part.inline_data
+                                        log.info("Generated image received")
+                        finally:
+                            # Closes the upstream HTTP stream if we are cancelled
+                            await stream.aclose()
+        finally:
+            events.put_nowait(None)
+        return generated_image, text_parts
+
+    async def stream_image(
+        self,
+        input: ImageGenerationRequest,
+        image: Optional[ImagePayload],
+        client_id: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate an image while streaming progress events as they happen.
+
+        Yields dictionaries with an "event" name and a "data" payload, in order:
+        "queued", "started" (once a Gemini slot is free), zero or more "text" deltas,
+        and finally "image" with the GeneratedImage. Request validation errors are raised
+        before the first event is yielded.
+
+        Args:
+            input: The image generation request; its image_data field is ignored
+            image: Optional input image, decoded once per request
+            client_id: Who the Gemini call is queued and rate limited for
+        """
+        log.info(f"Streaming image with type '{input.type}' and prompt: {input.prompt}")
+
+        prompt, cache_key = self._prepare_request(input, image)
+        cached_image = await self._get_cached(input, cache_key)
+        if cached_image is not None:
+            yield {"event": "image", "data": cached_image}
+            return
+
+        contents = await self._build_contents(prompt, image)
+
+        yield {"event": "queued", "data": {"waiting": self.scheduler.queued}}
+
+        # The Gemini call runs in its own task and hands events over through a queue,
+        # so the slot and the model_call timing cover only the upstream call, not the
+        # time the consumer takes to write each event to a slow client
+        events: asyncio.Queue[Optional[Dict[str, Any]]] = asyncio.Queue()
+        model_call = asyncio.create_task(
+            self._stream_model(contents, client_id, events)
+        )
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            generated_image, text_parts = await model_call
+        except TimeoutError as e:
+            record_upstream_error("gemini", e)
+            log.error(f"Gemini API stream timed out after {self.timeout_seconds}s")
+            raise TimeoutError(
+                f"Image generation timed out after {self.timeout_seconds} seconds"
+            )
+        except AdmissionRejectedError:
+            raise
+        except Exception as e:
+            record_upstream_error("gemini", e)
+            log.error(f"Error streaming from Gemini API: {e}")
+            raise self._upstream_error(e)
+        finally:
+            # Stops the Gemini call if the consumer goes away or stops early
+            if not model_call.done():
+                model_call.cancel()
+                await asyncio.gather(model_call, return_exceptions=True)
+
+        # Outside the try above, so that only failed Gemini calls count as upstream
+        # errors; the error is the same one /api/generate-image reports
+        if not generated_image or not generated_image.data:
+            log.error("No image data received from Gemini API")
+            raise RuntimeError(
+                "Failed to generate image: No image generated by the model"
+            )
+
+        result = GeneratedImage(
+            image_bytes=generated_image.data,
+            mime_type=generated_image.mime_type or "image/png",
+            text_response="".join(text_parts) or None,
+        )
+        await self.cache.set(cache_key, result)
+        yield {"event": "image", "data": result}
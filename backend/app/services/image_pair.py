@@ -1,51 +1,83 @@
 import logging
-from typing import List
+from typing import List, Optional, Tuple
 
 from supabase._async.client import AsyncClient as Client
 
 from app.models.image_pair import ImagePair
+from app.utils.etag import collection_version
+from app.utils.pagination import keyset_page, page_size, select_columns, split_page
 
 log = logging.getLogger(__name__)
 
 
 class ImagePairService:
-    async def get_image_pairs_by_project_id(
+    async def get_image_pairs_version(
         self, supabase_client: Client, project_id: str
-    ) -> List[ImagePair]:
+    ) -> str:
+        """
+        A version token for a project's image pairs, for conditional requests.
+
+        Changes whenever an image pair is added, removed or updated.
+        """
+        try:
+            return await collection_version(
+                supabase_client.table("image_pairs")
+                .select("updated_at", count="exact")
+                .eq("project_id", project_id)
+            )
+        except Exception as e:
+            log.error(f"Error fetching image pair version for {project_id}: {e}")
+            raise RuntimeError(f"Failed to fetch image pairs: {e}")
+
+    async def get_image_pairs_by_project_id(
+        self,
+        supabase_client: Client,
+        project_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> Tuple[List[ImagePair], Optional[str]]:
         """
-        Fetch all image pairs for a given project ID.
+        Fetch one page of image pairs for a given project ID, newest first.
 
         Args:
             supabase_client: The Supabase client instance
             project_id: The project ID to fetch image pairs for
+            limit: Page size; defaults to LIST_PAGE_SIZE
+            cursor: next_cursor from the previous page, or None for the first page
+            fields: Comma-separated fields to return; required fields are always included
 
         Returns:
-            List of ImagePair objects for the project
+            The image pairs on this page and the cursor for the next page, if any
+
+        Raises:
+            ValueError: If the cursor or a field name is invalid
         """
         log.info(f"Fetching image pairs for project_id: {project_id}")
 
-        try:
-            # Query the image_pairs table (uses the project_id index)
-            response = (
-                await supabase_client.table("image_pairs")
-                .select("*")
-                .eq("project_id", project_id)
-                .order("created_at", desc=True)
-                .execute()
-            )
-
-            if not response.data:
-                log.info(f"No image pairs found for project_id: {project_id}")
-                return []
+        limit = page_size(limit)
+        columns = select_columns(ImagePair, fields)
 
-            # Convert to ImagePair models
-            image_pairs = [ImagePair(**pair_data) for pair_data in response.data]
-            log.info(
-                f"Found {len(image_pairs)} image pairs for project_id: {project_id}"
-            )
-
-            return image_pairs
+        # Query the image_pairs table (uses the project_id index)
+        query = keyset_page(
+            supabase_client.table("image_pairs")
+            .select(columns)
+            .eq("project_id", project_id),
+            "created_at",
+            cursor,
+            limit,
+        )
 
+        try:
+            response = await query.execute()
         except Exception as e:
             log.error(f"Error fetching image pairs for project_id {project_id}: {e}")
             raise RuntimeError(f"Failed to fetch image pairs: {e}")
+
+        rows, next_cursor = split_page(response.data or [], "created_at", limit)
+
+        # Convert to ImagePair models
+        image_pairs = [ImagePair(**pair_data) for pair_data in rows]
+        log.info(f"Found {len(image_pairs)} image pairs for project_id: {project_id}")
+
+        return image_pairs, next_cursor
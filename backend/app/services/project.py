@@ -1,9 +1,11 @@
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
 from uuid import uuid4
 
 import fal_client
-from openai import OpenAI
 from supabase._async.client import AsyncClient as Client
 
 from app.models.project import (
@@ -11,13 +13,269 @@ from app.models.project import (
     IconGenerationResponse,
     Project,
     ProjectCreateRequest,
+    ProjectSnapshotResponse,
+    ProjectSummary,
     ProjectUpdateRequest,
+    SnapshotPatchRequest,
+    SnapshotPatchResponse,
 )
+from app.utils.cache import LRUCache
+from app.utils.concurrency import SingleFlight
+from app.utils.config import get_env_float, get_env_int
+from app.utils.etag import collection_version
+from app.utils.llm import get_openai_client
+from app.utils.metrics import record_upstream_error, timed
+from app.utils.pagination import keyset_page, page_size, select_columns, split_page
+from app.utils.snapshot_store import (
+    SNAPSHOT_OFFLOAD_BYTES,
+    encode_snapshot,
+    load_snapshot,
+    offload_snapshot,
+)
+from app.utils.timing import StageTimer
 
 log = logging.getLogger(__name__)
 
+TOPIC_DESCRIPTION_MODEL = "gpt-4.1"
+
+# Topic descriptions keyed on a digest of the context they were generated from, so
+# regenerating with an unchanged context skips the OpenAI round trip entirely
+_topic_descriptions: LRUCache[str, str] = LRUCache(
+    max_entries=get_env_int("TOPIC_DESCRIPTION_CACHE_SIZE", 1024),
+    ttl_seconds=get_env_float("TOPIC_DESCRIPTION_CACHE_TTL_SECONDS", 24 * 60 * 60),
+)
+# Last context digest per project, used to invalidate a project's cached description
+_topic_description_keys: LRUCache[str, str] = LRUCache(
+    max_entries=get_env_int("TOPIC_DESCRIPTION_CACHE_SIZE", 1024)
+)
+
+# Projects known to have an icon. Icons are never removed, so once a project is in here
+# icon generation for it can be skipped without reading the project again.
+_projects_with_icons: LRUCache[str, bool] = LRUCache(
+    max_entries=get_env_int("PROJECT_ICON_CACHE_SIZE", 10000)
+)
+# Projects whose icon job was requested recently; the request is repeated after the TTL
+# so that a job which failed for good gets another chance
+_icon_requests: LRUCache[str, bool] = LRUCache(
+    max_entries=get_env_int("PROJECT_ICON_CACHE_SIZE", 10000),
+    ttl_seconds=get_env_float("ICON_REQUEST_TTL_SECONDS", 600),
+)
+# Owners of projects recently read with a caller's token, keyed on a digest of the
+# token and the project ID. Outbox jobs run with the service role, so a generation only
+# queues them once the caller's own client has been able to read the project.
+_project_owners: LRUCache[str, str] = LRUCache(
+    max_entries=get_env_int("PROJECT_OWNER_CACHE_SIZE", 10000),
+    ttl_seconds=get_env_float("PROJECT_OWNER_CACHE_TTL_SECONDS", 600),
+)
+# One icon pipeline per project at a time; concurrent callers share its result
+_icon_flights: SingleFlight[str, None] = SingleFlight()
+_icon_counters = {
+    "requests_skipped": 0,
+    "jobs_skipped": 0,
+    "pipelines_started": 0,
+}
+
+# Record IDs touched by each recent snapshot version, per project, so that a patch
+# computed against an older version can be rebased when it touches other records.
+# None marks a full snapshot write, which nothing can be rebased across.
+_snapshot_history: LRUCache[str, OrderedDict[int, Optional[FrozenSet[str]]]] = LRUCache(
+    max_entries=get_env_int("SNAPSHOT_HISTORY_PROJECTS", 1024)
+)
+SNAPSHOT_HISTORY_VERSIONS = get_env_int("SNAPSHOT_HISTORY_VERSIONS", 64)
+# A busy project can move on again between the conflict check and the retry
+SNAPSHOT_PATCH_MAX_REBASES = 3
+_snapshot_counters = {
+    "patches": 0,
+    "rebased": 0,
+    "conflicts": 0,
+    "full_writes": 0,
+    "unchanged_skipped": 0,
+    "offloaded_after_patch": 0,
+    "records_written": 0,
+}
+
+
+_SNAPSHOT_COLUMNS = {"snapshot", "snapshot_ref", "snapshot_size"}
+
+
+class SnapshotConflictError(Exception):
+    """Raised when a snapshot patch overlaps with changes made since its base version."""
+
+    def __init__(self, project_id: str, current_version: Optional[int]):
+        super().__init__(
+            f"Snapshot of project {project_id} has changed since the patch's base "
+            f"version (now at version {current_version})"
+        )
+        self.current_version = current_version
+
+
+def _record_snapshot_write(
+    project_id: str, version: int, changed: Optional[FrozenSet[str]]
+) -> None:
+    history = _snapshot_history.peek(project_id)
+    if history is None:
+        history = OrderedDict()
+    history[version] = changed
+    while len(history) > SNAPSHOT_HISTORY_VERSIONS:
+        history.popitem(last=False)
+    _snapshot_history.set(project_id, history)
+
+
+def _can_rebase(
+    project_id: str, base_version: int, current_version: int, changed: FrozenSet[str]
+) -> bool:
+    """Whether every version after base_version is known and left changed untouched."""
+    if current_version <= base_version:
+        return False
+    history = _snapshot_history.get(project_id) or {}
+    for version in range(base_version + 1, current_version + 1):
+        touched = history.get(version)
+        if touched is None or touched & changed:
+            return False
+    return True
+
+
+def _on_fal_queue_update(update):
+    """Log queue updates from Fal AI."""
+    if isinstance(update, fal_client.InProgress):
+        for log_entry in update.logs:
+            log.info(f"Fal AI: {log_entry['message']}")
+
 
 class ProjectService:
+    def __init__(self):
+        self.icon_generate_timeout_seconds = get_env_float(
+            "ICON_GENERATE_TIMEOUT_SECONDS", 90
+        )
+        self.icon_rembg_timeout_seconds = get_env_float(
+            "ICON_REMBG_TIMEOUT_SECONDS", 60
+        )
+        self.icon_description_timeout_seconds = get_env_float(
+            "ICON_DESCRIPTION_TIMEOUT_SECONDS", 30
+        )
+
+    @staticmethod
+    def invalidate_topic_description(project_id: str) -> None:
+        """Drop the cached topic description of a project whose context has changed."""
+        context_key = _topic_description_keys.pop(project_id)
+        if context_key is not None:
+            _topic_descriptions.pop(context_key)
+
+    @staticmethod
+    def topic_description_stats() -> dict:
+        return _topic_descriptions.stats()
+
+    @staticmethod
+    def remember_icon(project: ProjectSummary) -> None:
+        """Record that a project has an icon, if it does."""
+        if project.icon_url:
+            _projects_with_icons.set(project.id, True)
+
+    @staticmethod
+    def should_request_icon(project_id: str) -> bool:
+        """
+        Whether a generation for this project still needs to queue an icon job.
+
+        False once the project is known to have an icon or a job was queued recently,
+        which saves the enqueue as well as the job's project read.
+        """
+        if project_id in _projects_with_icons or project_id in _icon_requests:
+            _icon_counters["requests_skipped"] += 1
+            return False
+        _icon_requests.set(project_id, True)
+        return True
+
+    @staticmethod
+    async def ensure_icon(project_id: str, generate: Callable[[], Awaitable[None]]):
+        """
+        Run an icon pipeline for a project unless it is known to have an icon already.
+
+        Concurrent calls for the same project share a single run of generate.
+        """
+        if project_id in _projects_with_icons:
+            _icon_counters["jobs_skipped"] += 1
+            return
+        await _icon_flights.run(project_id, generate)
+
+    @staticmethod
+    def snapshot_patch_stats() -> dict:
+        return {**_snapshot_counters, "tracked_projects": len(_snapshot_history)}
+
+    @staticmethod
+    def icon_stats() -> dict:
+        # Every skipped request, skipped job or shared run would otherwise have read the
+        # project; shared runs would also have called Fal for generation and rembg
+        db_reads_avoided = (
+            _icon_counters["requests_skipped"]
+            + _icon_counters["jobs_skipped"]
+            + _icon_flights.followers
+        )
+        return {
+            **_icon_counters,
+            "shared_runs": _icon_flights.followers,
+            "in_flight": len(_icon_flights),
+            "known_icons": len(_projects_with_icons),
+            "db_reads_avoided": db_reads_avoided,
+            "fal_calls_avoided": 2 * _icon_flights.followers,
+        }
+
+    async def _run_fal(
+        self,
+        application: str,
+        arguments: Dict[str, Any],
+        timeout_seconds: float,
+        stage: str,
+    ) -> Any:
+        """
+        Run a Fal AI application without blocking the event loop.
+
+        If the call times out or is cancelled, the queued Fal request is cancelled as well
+        so that it does not keep consuming upstream capacity. The call's duration is
+        recorded under the given stage name.
+        """
+        request_ids: List[str] = []
+        try:
+            with timed(stage):
+                async with asyncio.timeout(timeout_seconds):
+                    return await fal_client.subscribe_async(
+                        application,
+                        arguments=arguments,
+                        with_logs=True,
+                        on_enqueue=request_ids.append,
+                        on_queue_update=_on_fal_queue_update,
+                    )
+        except TimeoutError as e:
+            record_upstream_error("fal", e)
+            await self._cancel_fal_requests(application, request_ids)
+            raise TimeoutError(f"{application} timed out after {timeout_seconds}s")
+        except asyncio.CancelledError:
+            await self._cancel_fal_requests(application, request_ids)
+            raise
+        except Exception as e:
+            record_upstream_error("fal", e)
+            raise
+
+    async def _cancel_fal_requests(self, application: str, request_ids: List[str]):
+        for request_id in request_ids:
+            log.warning(f"Cancelling Fal AI request {request_id} ({application})")
+            try:
+                await fal_client.cancel_async(application, request_id)
+            except Exception as e:
+                log.error(f"Failed to cancel Fal AI request {request_id}: {e}")
+
+    async def _generate_timed_description(
+        self, supabase_client: Client, project_id: str, timer: StageTimer
+    ) -> str:
+        with timer.stage("description"):
+            try:
+                async with asyncio.timeout(self.icon_description_timeout_seconds):
+                    return await self.generate_topic_description(
+                        supabase_client=supabase_client, project_id=project_id
+                    )
+            except TimeoutError:
+                log.error(f"Topic description timed out for project: {project_id}")
+                return "Project Topic"
+
     async def get_project_by_id(
         self, supabase_client: Client, project_id: str
     ) -> Project:
@@ -48,6 +306,7 @@ class ProjectService:
 
             project = Project(**response.data)
             log.info(f"Found project: {project.id}")
+            ProjectService.remember_icon(project)
 
             return project
 
@@ -55,6 +314,332 @@ class ProjectService:
             log.error(f"Error fetching project {project_id}: {e}")
             raise RuntimeError(f"Failed to fetch project: {e}")
 
+    async def get_project_owner(
+        self, supabase_client: Client, token: str, project_id: str
+    ) -> str:
+        """
+        Fetch the ID of the user who owns a project, as seen by the caller.
+
+        The project is read with the caller's client, so row level security only lets
+        its owner through. Results are cached per token for a while.
+
+        Args:
+            supabase_client: The caller's Supabase client
+            token: The caller's access token, which the client was created with
+            project_id: The project ID
+
+        Returns:
+            The owner's user ID
+
+        Raises:
+            RuntimeError: If the project does not exist or the caller may not read it
+        """
+        cache_key = f"{hashlib.sha256(token.encode()).hexdigest()}:{project_id}"
+        user_id = _project_owners.get(cache_key)
+        if user_id is not None:
+            return user_id
+
+        try:
+            response = (
+                await supabase_client.table("projects")
+                .select("id,user_id")
+                .eq("id", project_id)
+                .limit(1)
+                .execute()
+            )
+        except Exception as e:
+            log.error(f"Error fetching owner of project {project_id}: {e}")
+            raise RuntimeError(f"Failed to fetch project: {e}")
+
+        if not response.data:
+            raise RuntimeError(f"Project not found: {project_id}")
+        user_id = response.data[0]["user_id"]
+        _project_owners.set(cache_key, user_id)
+        return user_id
+
+    async def get_project_snapshot(
+        self, supabase_client: Client, project_id: str
+    ) -> ProjectSnapshotResponse:
+        """
+        Fetch the tldraw snapshot of a single project.
+
+        Args:
+            supabase_client: The Supabase client instance
+            project_id: The project ID to fetch the snapshot for
+
+        Returns:
+            ProjectSnapshotResponse with the snapshot and when it was last updated
+        """
+        log.info(f"Fetching snapshot for project: {project_id}")
+
+        try:
+            response = (
+                await supabase_client.table("projects")
+                .select("id,snapshot,snapshot_ref,snapshot_version,updated_at")
+                .eq("id", project_id)
+                .limit(1)
+                .execute()
+            )
+        except Exception as e:
+            log.error(f"Error fetching snapshot for project {project_id}: {e}")
+            raise RuntimeError(f"Failed to fetch project snapshot: {e}")
+
+        if not response.data:
+            raise RuntimeError(f"Project not found: {project_id}")
+
+        row = response.data[0]
+        snapshot = row["snapshot"]
+        if row["snapshot_ref"]:
+            try:
+                snapshot = await load_snapshot(supabase_client, row["snapshot_ref"])
+            except Exception as e:
+                log.error(f"Error loading snapshot {row['snapshot_ref']}: {e}")
+                raise RuntimeError(f"Failed to load project snapshot: {e}")
+
+        return ProjectSnapshotResponse(
+            project_id=row["id"],
+            snapshot=snapshot,
+            snapshot_version=row["snapshot_version"],
+            updated_at=row["updated_at"],
+        )
+
+    async def patch_snapshot(
+        self,
+        supabase_client: Client,
+        project_id: str,
+        user_id: str,
+        patch: SnapshotPatchRequest,
+    ) -> SnapshotPatchResponse:
+        """
+        Apply a record-level patch to a project's snapshot.
+
+        The patch is applied only if the snapshot is still at patch.base_version. If it
+        has moved on, the patch is rebased onto the current version as long as none of the
+        versions in between touched the same records. Inline snapshots are patched in the
+        database; offloaded ones are loaded, patched and stored again.
+
+        Args:
+            supabase_client: The Supabase client instance
+            project_id: The ID of the project to patch
+            user_id: The user ID who owns the project (for authorization)
+            patch: The records to put and remove
+
+        Returns:
+            SnapshotPatchResponse with the new snapshot version
+
+        Raises:
+            SnapshotConflictError: If the patch cannot be applied or rebased
+        """
+        changed = frozenset(patch.put) | frozenset(patch.remove)
+        log.info(
+            f"Patching snapshot of project {project_id} from version "
+            f"{patch.base_version}: {len(patch.put)} put, {len(patch.remove)} removed"
+        )
+
+        base_version = patch.base_version
+        current_version = None
+        try:
+            for _ in range(SNAPSHOT_PATCH_MAX_REBASES + 1):
+                row = await self._apply_snapshot_patch(
+                    supabase_client, project_id, user_id, base_version, patch
+                )
+                if row is None:
+                    # Either the version moved on, the snapshot is offloaded or the
+                    # project is not ours
+                    current_version, snapshot_ref = await self._get_snapshot_state(
+                        supabase_client, project_id, user_id
+                    )
+                    if snapshot_ref and current_version == base_version:
+                        row = await self._patch_offloaded_snapshot(
+                            supabase_client,
+                            project_id,
+                            user_id,
+                            base_version,
+                            snapshot_ref,
+                            patch,
+                        )
+
+                if row is not None:
+                    version = row["snapshot_version"]
+                    _record_snapshot_write(project_id, version, changed)
+                    if (row.get("snapshot_size") or 0) >= SNAPSHOT_OFFLOAD_BYTES and (
+                        not row.get("snapshot_ref")
+                    ):
+                        row = (
+                            await self._offload_inline_snapshot(
+                                supabase_client, project_id, user_id, version
+                            )
+                            or row
+                        )
+
+                    rebased = base_version != patch.base_version
+                    _snapshot_counters["patches"] += 1
+                    _snapshot_counters["rebased"] += int(rebased)
+                    _snapshot_counters["records_written"] += len(changed)
+                    return SnapshotPatchResponse(
+                        project_id=project_id,
+                        snapshot_version=row["snapshot_version"],
+                        updated_at=row["updated_at"],
+                        rebased=rebased,
+                    )
+
+                if current_version == base_version:
+                    # Lost a race with another write; look again
+                    continue
+                if not _can_rebase(project_id, base_version, current_version, changed):
+                    break
+                log.info(
+                    f"Rebasing snapshot patch of project {project_id} from version "
+                    f"{base_version} onto {current_version}"
+                )
+                base_version = current_version
+        except RuntimeError:
+            raise
+        except Exception as e:
+            log.error(f"Error patching snapshot of project {project_id}: {e}")
+            raise RuntimeError(f"Failed to patch project snapshot: {e}")
+
+        _snapshot_counters["conflicts"] += 1
+        raise SnapshotConflictError(project_id, current_version)
+
+    async def _snapshot_columns(
+        self, supabase_client: Client, snapshot: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Row columns for writing a snapshot, offloading it to storage when large."""
+        if snapshot is None:
+            return {"snapshot": None, "snapshot_ref": None, "snapshot_size": None}
+        data = await asyncio.to_thread(encode_snapshot, snapshot)
+        if len(data) < SNAPSHOT_OFFLOAD_BYTES:
+            return {
+                "snapshot": snapshot,
+                "snapshot_ref": None,
+                "snapshot_size": len(data),
+            }
+        snapshot_ref = await offload_snapshot(supabase_client, data)
+        return {
+            "snapshot": None,
+            "snapshot_ref": snapshot_ref,
+            "snapshot_size": len(data),
+        }
+
+    async def _write_snapshot_columns(
+        self,
+        supabase_client: Client,
+        project_id: str,
+        user_id: str,
+        base_version: int,
+        columns: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """Write snapshot columns if still at base_version; None if it moved on."""
+        response = (
+            await supabase_client.table("projects")
+            .update(columns)
+            .eq("id", project_id)
+            .eq("user_id", user_id)
+            .eq("snapshot_version", base_version)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    async def _apply_snapshot_patch(
+        self,
+        supabase_client: Client,
+        project_id: str,
+        user_id: str,
+        base_version: int,
+        patch: SnapshotPatchRequest,
+    ) -> Optional[Dict[str, Any]]:
+        """Patch an inline snapshot in the database; None if that was not possible."""
+        response = await supabase_client.rpc(
+            "apply_snapshot_patch",
+            {
+                "p_project_id": project_id,
+                "p_user_id": user_id,
+                "p_base_version": base_version,
+                "p_put": patch.put,
+                "p_remove": patch.remove,
+                "p_schema": patch.document_schema,
+            },
+        ).execute()
+        return response.data[0] if response.data else None
+
+    async def _patch_offloaded_snapshot(
+        self,
+        supabase_client: Client,
+        project_id: str,
+        user_id: str,
+        base_version: int,
+        snapshot_ref: str,
+        patch: SnapshotPatchRequest,
+    ) -> Optional[Dict[str, Any]]:
+        snapshot = await load_snapshot(supabase_client, snapshot_ref)
+        removed = set(patch.remove)
+        store = {
+            record_id: record
+            for record_id, record in (snapshot.get("store") or {}).items()
+            if record_id not in removed
+        }
+        store.update(patch.put)
+        snapshot = {**snapshot, "store": store}
+        if patch.document_schema is not None:
+            snapshot["schema"] = patch.document_schema
+
+        columns = await self._snapshot_columns(supabase_client, snapshot)
+        return await self._write_snapshot_columns(
+            supabase_client, project_id, user_id, base_version, columns
+        )
+
+    async def _offload_inline_snapshot(
+        self, supabase_client: Client, project_id: str, user_id: str, version: int
+    ) -> Optional[Dict[str, Any]]:
+        """Move a snapshot that has grown past the threshold into object storage."""
+        try:
+            response = (
+                await supabase_client.table("projects")
+                .select("snapshot")
+                .eq("id", project_id)
+                .eq("user_id", user_id)
+                .eq("snapshot_version", version)
+                .limit(1)
+                .execute()
+            )
+            if not response.data or response.data[0]["snapshot"] is None:
+                return None
+            columns = await self._snapshot_columns(
+                supabase_client, response.data[0]["snapshot"]
+            )
+            row = await self._write_snapshot_columns(
+                supabase_client, project_id, user_id, version, columns
+            )
+        except Exception as e:
+            # The snapshot simply stays inline until the next attempt
+            log.warning(f"Error offloading snapshot of project {project_id}: {e}")
+            return None
+
+        if row is not None:
+            # Same document, so patches based on the previous version still rebase
+            _record_snapshot_write(project_id, row["snapshot_version"], frozenset())
+            _snapshot_counters["offloaded_after_patch"] += 1
+        return row
+
+    async def _get_snapshot_state(
+        self, supabase_client: Client, project_id: str, user_id: str
+    ) -> Tuple[int, Optional[str]]:
+        response = (
+            await supabase_client.table("projects")
+            .select("snapshot_version,snapshot_ref")
+            .eq("id", project_id)
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        if not response.data:
+            raise RuntimeError(
+                "Failed to patch project snapshot: Project not found or unauthorized"
+            )
+        row = response.data[0]
+        return row["snapshot_version"], row["snapshot_ref"]
+
     async def check_if_first_image_generation(
         self, supabase_client: Client, project_id: str
     ) -> bool:
@@ -91,45 +676,79 @@ class ProjectService:
             log.error(f"Error checking image pairs for project {project_id}: {e}")
             raise RuntimeError(f"Failed to check image pairs: {e}")
 
+    async def get_projects_version(self, supabase_client: Client, user_id: str) -> str:
+        """
+        A version token for a user's projects, for conditional requests.
+
+        Changes whenever a project is added, removed or updated.
+        """
+        try:
+            return await collection_version(
+                supabase_client.table("projects")
+                .select("updated_at", count="exact")
+                .eq("user_id", user_id)
+            )
+        except Exception as e:
+            log.error(f"Error fetching project version for user_id {user_id}: {e}")
+            raise RuntimeError(f"Failed to fetch projects: {e}")
+
     async def get_projects_by_user_id(
-        self, supabase_client: Client, user_id: str
-    ) -> List[Project]:
+        self,
+        supabase_client: Client,
+        user_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> Tuple[List[ProjectSummary], Optional[str]]:
         """
-        Fetch all projects for a given user ID.
+        Fetch one page of projects for a given user ID, most recently updated first.
+
+        Snapshots are never included, so the cost of a page does not depend on how much
+        has been drawn; use get_project_snapshot to load one project's canvas.
 
         Args:
             supabase_client: The Supabase client instance
             user_id: The user ID to fetch projects for
+            limit: Page size; defaults to LIST_PAGE_SIZE
+            cursor: next_cursor from the previous page, or None for the first page
+            fields: Comma-separated fields to return; required fields are always included
 
         Returns:
-            List of Project objects for the user
+            The projects on this page and the cursor for the next page, if any
+
+        Raises:
+            ValueError: If the cursor or a field name is invalid
         """
         log.info(f"Fetching projects for user_id: {user_id}")
 
-        try:
-            # Query the projects table
-            response = (
-                await supabase_client.table("projects")
-                .select("*")
-                .eq("user_id", user_id)
-                .order("updated_at", desc=True)
-                .execute()
-            )
-
-            if not response.data:
-                log.info(f"No projects found for user_id: {user_id}")
-                return []
+        limit = page_size(limit)
 
-            # Convert to Project models
-            projects = [Project(**project_data) for project_data in response.data]
-            log.info(f"Found {len(projects)} projects for user_id: {user_id}")
-
-            return projects
+        # Query the projects table
+        query = keyset_page(
+            supabase_client.table("projects")
+            .select(select_columns(ProjectSummary, fields))
+            .eq("user_id", user_id),
+            "updated_at",
+            cursor,
+            limit,
+        )
 
+        try:
+            response = await query.execute()
         except Exception as e:
             log.error(f"Error fetching projects for user_id {user_id}: {e}")
             raise RuntimeError(f"Failed to fetch projects: {e}")
 
+        rows, next_cursor = split_page(response.data or [], "updated_at", limit)
+
+        # Convert to ProjectSummary models
+        projects = [ProjectSummary(**project_data) for project_data in rows]
+        log.info(f"Found {len(projects)} projects for user_id: {user_id}")
+        for project in projects:
+            ProjectService.remember_icon(project)
+
+        return projects, next_cursor
+
     async def create_project(
         self, supabase_client: Client, project_data: ProjectCreateRequest
     ) -> Project:
@@ -152,7 +771,7 @@ class ProjectService:
                 "user_id": project_data.user_id,
                 "name": project_data.name,
                 "description": project_data.description,
-                "snapshot": project_data.snapshot,
+                **await self._snapshot_columns(supabase_client, project_data.snapshot),
             }
 
             # Insert into projects table
@@ -201,7 +820,9 @@ class ProjectService:
             if project_data.description is not None:
                 update_data["description"] = project_data.description
             if project_data.snapshot is not None:
-                update_data["snapshot"] = project_data.snapshot
+                update_data.update(
+                    await self._snapshot_columns(supabase_client, project_data.snapshot)
+                )
             if project_data.icon_url is not None:
                 update_data["icon_url"] = project_data.icon_url
 
@@ -209,13 +830,34 @@ class ProjectService:
                 raise RuntimeError("No fields to update")
 
             # Update the project (with user_id check for authorization)
-            response = (
-                await supabase_client.table("projects")
+            query = (
+                supabase_client.table("projects")
                 .update(update_data)
                 .eq("id", project_id)
                 .eq("user_id", user_id)
-                .execute()
             )
+            snapshot_ref = update_data.get("snapshot_ref")
+            skip_unchanged = (
+                bool(snapshot_ref) and update_data.keys() == _SNAPSHOT_COLUMNS
+            )
+            if skip_unchanged:
+                # Pointing the row at the object it already points at would only bump
+                # the version, which makes pending patches conflict for nothing
+                query = query.or_(
+                    f'snapshot_ref.is.null,snapshot_ref.neq."{snapshot_ref}"'
+                )
+            response = await query.execute()
+
+            unchanged = False
+            if not response.data and skip_unchanged:
+                response = (
+                    await supabase_client.table("projects")
+                    .select("*")
+                    .eq("id", project_id)
+                    .eq("user_id", user_id)
+                    .execute()
+                )
+                unchanged = bool(response.data)
 
             if not response.data or len(response.data) == 0:
                 raise RuntimeError(
@@ -224,6 +866,14 @@ class ProjectService:
 
             project = Project(**response.data[0])
             log.info(f"Successfully updated project with id: {project.id}")
+            ProjectService.remember_icon(project)
+            if unchanged:
+                log.info(f"Snapshot of project {project_id} unchanged, not rewritten")
+                _snapshot_counters["unchanged_skipped"] += 1
+            elif "snapshot" in update_data and project.snapshot_version is not None:
+                # A full write may touch any record; patches cannot rebase across it
+                _record_snapshot_write(project_id, project.snapshot_version, None)
+                _snapshot_counters["full_writes"] += 1
 
             return project
 
@@ -232,14 +882,21 @@ class ProjectService:
             raise RuntimeError(f"Failed to update project: {e}")
 
     async def generate_3d_icon(
-        self, supabase_client: Client, request: IconGenerationRequest
+        self,
+        supabase_client: Client,
+        request: IconGenerationRequest,
+        timer: Optional[StageTimer] = None,
     ) -> IconGenerationResponse:
         """
         Generate a 3D icon using Fal AI and a topic description, then save both to the database.
 
+        The topic description does not depend on the icon, so it is generated concurrently
+        with the Fal AI stages. Each stage has its own timeout and is recorded on the timer.
+
         Args:
             supabase_client: The Supabase client instance
             request: The icon generation request containing prompt, project_id, user_id, and style
+            timer: Optional timer to record stage durations on
 
         Returns:
             IconGenerationResponse containing the generated icon URL, description, and optional image data
@@ -247,27 +904,34 @@ class ProjectService:
         log.info(
             f"Generating 3D icon and description for project: {request.project_id}"
         )
+        _icon_counters["pipelines_started"] += 1
+        timer = timer or StageTimer()
+
+        # Generate topic description in the background while the icon is being drawn
+        log.info(f"Generating topic description for project: {request.project_id}")
+        description_task = asyncio.create_task(
+            self._generate_timed_description(
+                supabase_client=supabase_client,
+                project_id=request.project_id,
+                timer=timer,
+            )
+        )
 
         try:
             # Construct the full prompt with style modifiers
             full_prompt = f"The following is a text prompt or a conversation about a 2 or 3 word topic: {request.prompt}, Draw a 3D smooth icon png with the following style: {request.style}. Also make sure you don't include text in the image."
 
-            # Define callback to log queue updates
-            def on_queue_update(update):
-                if isinstance(update, fal_client.InProgress):
-                    for log_entry in update.logs:
-                        log.info(f"Fal AI: {log_entry['message']}")
-
             # Call Fal AI to generate the icon using the queue system
             # Using nano-banana for high-quality 3D icon generation with example image
-            result = fal_client.subscribe(
-                "fal-ai/nano-banana/",
-                arguments={
-                    "prompt": full_prompt,
-                },
-                with_logs=True,
-                on_queue_update=on_queue_update,
-            )
+            with timer.stage("generate"):
+                result = await self._run_fal(
+                    "fal-ai/nano-banana/",
+                    arguments={
+                        "prompt": full_prompt,
+                    },
+                    timeout_seconds=self.icon_generate_timeout_seconds,
+                    stage="fal_generate",
+                )
 
             # Validate response
             if not result or "images" not in result or len(result["images"]) == 0:
@@ -280,14 +944,15 @@ class ProjectService:
 
             # Remove background from the generated icon
             log.info("Removing background from generated icon")
-            rembg_result = fal_client.subscribe(
-                "fal-ai/imageutils/rembg",
-                arguments={
-                    "image_url": image_url,
-                },
-                with_logs=True,
-                on_queue_update=on_queue_update,
-            )
+            with timer.stage("remove_background"):
+                rembg_result = await self._run_fal(
+                    "fal-ai/imageutils/rembg",
+                    arguments={
+                        "image_url": image_url,
+                    },
+                    timeout_seconds=self.icon_rembg_timeout_seconds,
+                    stage="fal_remove_background",
+                )
 
             # Validate rembg response
             if not rembg_result or "image" not in rembg_result:
@@ -298,11 +963,7 @@ class ProjectService:
             image_url = rembg_result["image"]["url"]
             log.info(f"Successfully removed background: {image_url}")
 
-            # Generate topic description
-            log.info(f"Generating topic description for project: {request.project_id}")
-            topic_description = await self.generate_topic_description(
-                supabase_client=supabase_client, project_id=request.project_id
-            )
+            topic_description = await description_task
             log.info(f"Successfully generated topic description: {topic_description}")
 
             # Update the project with both icon URL and description
@@ -312,13 +973,14 @@ class ProjectService:
                 "description": topic_description,
             }
 
-            response = (
-                await supabase_client.table("projects")
-                .update(update_data)
-                .eq("id", request.project_id)
-                .eq("user_id", request.user_id)
-                .execute()
-            )
+            with timer.stage("save"):
+                response = (
+                    await supabase_client.table("projects")
+                    .update(update_data)
+                    .eq("id", request.project_id)
+                    .eq("user_id", request.user_id)
+                    .execute()
+                )
 
             if not response.data or len(response.data) == 0:
                 log.error(f"Failed to update project {request.project_id}")
@@ -327,7 +989,7 @@ class ProjectService:
                 )
 
             log.info(
-                f"Successfully updated project {request.project_id} with icon and description"
+                f"Successfully updated project {request.project_id} with icon and description ({timer.summary()})"
             )
 
             return IconGenerationResponse(
@@ -339,6 +1001,9 @@ class ProjectService:
         except Exception as e:
             log.error(f"Error generating 3D icon and description: {e}")
             raise RuntimeError(f"Failed to generate 3D icon and description: {e}")
+        finally:
+            if not description_task.done():
+                description_task.cancel()
 
     async def generate_topic_description(
         self, supabase_client: Client, project_id: str
@@ -359,19 +1024,26 @@ class ProjectService:
         log.info(f"Generating topic description for project: {project_id}")
 
         try:
-            # Fetch the project details
-            project = await self.get_project_by_id(supabase_client, project_id)
-
-            # Fetch image pairs associated with the project to understand context
-            response = (
-                await supabase_client.table("image_pairs")
+            # Fetch the project's name and description (not its snapshot, which can
+            # be megabytes) and the most recent prompts concurrently
+            project_response, response = await asyncio.gather(
+                supabase_client.table("projects")
+                .select(select_columns(ProjectSummary, "name,description,icon_url"))
+                .eq("id", project_id)
+                .limit(1)
+                .execute(),
+                supabase_client.table("image_pairs")
                 .select("prompt_text")
                 .eq("project_id", project_id)
                 .limit(5)
                 .order("created_at", desc=True)
-                .execute()
+                .execute(),
             )
 
+            if not project_response.data:
+                raise RuntimeError(f"Project not found: {project_id}")
+            project = ProjectSummary(**project_response.data[0])
+            ProjectService.remember_icon(project)
             image_pairs = response.data if response.data else []
 
             # Build context for AI analysis
@@ -393,23 +1065,36 @@ class ProjectService:
                 log.warning(f"No context available for project {project_id}")
                 return "Untitled Project"
 
+            context_key = hashlib.sha256(
+                f"{TOPIC_DESCRIPTION_MODEL}\n{context}".encode("utf-8")
+            ).hexdigest()
+            cached_description = _topic_descriptions.get(context_key)
+            if cached_description is not None:
+                log.info(f"Using cached topic description for project {project_id}")
+                return cached_description
+
             # Use OpenAI to generate a concise topic description
-            client = OpenAI()
+            client = get_openai_client()
 
-            response = client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"""Based on the following project information, generate a very concise topic description in 2-5 words that captures the essence of what this project is about.
+            with timed("openai_call"):
+                try:
+                    response = await client.chat.completions.create(
+                        model=TOPIC_DESCRIPTION_MODEL,
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": f"""Based on the following project information, generate a very concise topic description in 2-5 words that captures the essence of what this project is about.
 
 {context}
 
 Respond with ONLY the 3 to 6 words short topic description, nothing else. 
 Your response (3-6 words only):""",
-                    }
-                ],
-            )
+                            }
+                        ],
+                    )
+                except Exception as e:
+                    record_upstream_error("openai", e)
+                    raise
 
             # Extract the topic description from the response
             topic_description = response.choices[0].message.content.strip()
@@ -421,6 +1106,9 @@ Your response (3-6 words only):""",
                 f"Generated topic description for project {project_id}: {topic_description}"
             )
 
+            _topic_descriptions.set(context_key, topic_description)
+            _topic_description_keys.set(project_id, context_key)
+
             return topic_description
 
         except Exception as e:
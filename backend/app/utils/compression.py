@@ -0,0 +1,242 @@
+import asyncio
+import gzip
+import zlib
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import timed
+
+try:
+    import zstandard
+except ImportError:  # Optional; without it only gzip is offered and accepted
+    zstandard = None
+
+ZSTD_AVAILABLE = zstandard is not None
+
+# Bodies larger than this are (de)compressed off the event loop
+_THREAD_THRESHOLD_BYTES = 64 * 1024
+# Already-compressed or streamed content that is not worth compressing again
+_SKIPPED_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/")
+
+
+class DecompressedTooLargeError(ValueError):
+    """Raised when a compressed body expands beyond the allowed size."""
+
+
+def supported_encodings() -> List[str]:
+    return ["zstd", "gzip"] if ZSTD_AVAILABLE else ["gzip"]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress data with the given content coding ("gzip" or "zstd")."""
+    if encoding == "zstd" and ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str, max_size: int) -> bytes:
+    """
+    Decompress data with the given content coding.
+
+    Raises:
+        DecompressedTooLargeError: If the data expands beyond max_size bytes
+        ValueError: If the encoding is unsupported or the data is corrupt
+    """
+    try:
+        if encoding == "zstd" and ZSTD_AVAILABLE:
+            reader = zstandard.ZstdDecompressor().stream_reader(BytesIO(data))
+            result = reader.read(max_size + 1)
+        elif encoding == "gzip":
+            decoder = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            result = decoder.decompress(data, max_size + 1)
+            if not decoder.eof and len(result) <= max_size:
+                raise ValueError("Invalid gzip data: truncated")
+        else:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+    except (zlib.error, EOFError) as e:
+        raise ValueError(f"Invalid {encoding} data: {e}")
+    except Exception as e:
+        if ZSTD_AVAILABLE and isinstance(e, zstandard.ZstdError):
+            raise ValueError(f"Invalid {encoding} data: {e}")
+        raise
+    if len(result) > max_size:
+        raise DecompressedTooLargeError(
+            f"Decompressed body exceeds the limit of {max_size} bytes"
+        )
+    return result
+
+
+def preferred_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best supported coding in an Accept-Encoding header, preferring zstd."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        if params and quality.replace(".", "", 1).isdigit() and float(quality) == 0:
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+async def _run(function, *args):
+    if len(args[0]) > _THREAD_THRESHOLD_BYTES:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+
+class ContentEncodingMiddleware:
+    """
+    Accepts gzip/zstd-encoded request bodies and compresses responses.
+
+    Request bodies are decompressed before they reach the route, up to
+    max_request_bytes. Complete (non-streaming) responses of at least minimum_size bytes
+    are compressed with the client's preferred coding from Accept-Encoding; streamed
+    responses such as Server-Sent Events are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        max_request_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_bytes = max_request_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            decoded = await self._decode_request(scope, receive, send, content_encoding)
+            if decoded is None:
+                return
+            scope, receive = decoded
+
+        encoding = preferred_encoding(headers.get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    async def _decode_request(
+        self, scope: Scope, receive: Receive, send: Send, encoding: str
+    ) -> Optional[Tuple[Scope, Receive]]:
+        """Read and decompress the request body, or send an error response."""
+        if encoding not in supported_encodings():
+            response = PlainTextResponse(
+                f"Unsupported content encoding: {encoding}", status_code=415
+            )
+            await response(scope, receive, send)
+            return None
+
+        chunks = []
+        received = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > self.max_request_bytes:
+                response = PlainTextResponse("Request body too large", status_code=413)
+                await response(scope, receive, send)
+                return None
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        try:
+            with timed("decompress"):
+                body = await _run(
+                    decompress, b"".join(chunks), encoding, self.max_request_bytes
+                )
+        except DecompressedTooLargeError as e:
+            await PlainTextResponse(str(e), status_code=413)(scope, receive, send)
+            return None
+        except ValueError as e:
+            await PlainTextResponse(str(e), status_code=400)(scope, receive, send)
+            return None
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode())]
+
+        body_sent = False
+
+        async def decoded_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return scope, decoded_receive
+
+    def _compressing_send(self, send: Send, encoding: str) -> Send:
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = Headers(raw=start_message["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith(_SKIPPED_CONTENT_TYPES)
+            ):
+                # Streamed, small or already encoded: send everything as it comes
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            with timed("compress"):
+                compressed = await _run(compress, body, encoding)
+            raw_headers = []
+            for name, value in start_message["headers"]:
+                if name == b"etag" and not value.startswith(b"W/"):
+                    # The compressed body is a different representation; a weak ETag
+                    # still lets conditional requests match it (as nginx does)
+                    value = b"W/" + value
+                if name != b"content-length":
+                    raw_headers.append((name, value))
+            raw_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start_message, "headers": raw_headers})
+            await send({**message, "body": compressed})
+
+        return compressing_send
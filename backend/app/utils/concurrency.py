@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from fastapi import Request
+
+from app.utils.cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client goes away before its request has been served."""
+
+
+class SupersededError(Exception):
+    """Raised when a newer request from the same session has replaced this one."""
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    awaitable: Awaitable[T],
+    poll_interval: float = 0.5,
+) -> T:
+    """
+    Await the given awaitable, cancelling it if the client disconnects in the meantime.
+
+    Args:
+        request: The incoming request whose connection should be watched
+        awaitable: The work to run on behalf of the request
+        poll_interval: How often (in seconds) to check whether the client is still connected
+
+    Returns:
+        The result of the awaitable
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                log.info(f"Client disconnected, cancelling {request.url.path}")
+                task.cancel()
+                raise ClientDisconnectedError("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class SingleFlight(Generic[K, T]):
+    """
+    Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key (the leader) starts the work; callers arriving while it
+    is in flight (followers) wait for the same result instead of starting their own.
+    The work runs in its own task, so a cancelled caller does not cancel it for the
+    others. With cancel_abandoned, the work is cancelled once every caller waiting on it
+    has been cancelled; otherwise it runs to completion regardless.
+    """
+
+    def __init__(self, cancel_abandoned: bool = False):
+        self.cancel_abandoned = cancel_abandoned
+        self._in_flight: Dict[K, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._followers_of: Dict[asyncio.Task, int] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.max_followers = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def _finished(self, key: K, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        self.max_followers = max(self.max_followers, self._followers_of.pop(task, 0))
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: K, work: Callable[[], Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None or task.done():
+            self.leaders += 1
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            self._followers_of[task] = 0
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.followers += 1
+            self._followers_of[task] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if self.cancel_abandoned and not task.done():
+                    # Nobody is left to use the result
+                    task.cancel()
+                    self.abandoned += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "followers_per_leader": (
+                round(self.followers / self.leaders, 3) if self.leaders else 0.0
+            ),
+            "max_followers": max([self.max_followers, *self._followers_of.values()]),
+            "in_flight": len(self._in_flight),
+            "abandoned": self.abandoned,
+        }
+
+
+class Supersession:
+    """
+    Keeps only the latest request of each session running.
+
+    Requests carry a session id and a sequence number that grows with every request the
+    session makes. Work started through run() for an older sequence is cancelled as soon
+    as a newer sequence arrives for the same session, and older sequences arriving late
+    are refused outright. Requests without a session id are never superseded.
+
+    State is per process: sessions whose requests are spread across workers are only
+    superseded within each worker.
+    """
+
+    def __init__(self, max_sessions: int):
+        self._latest: LRUCache[str, int] = LRUCache(max_entries=max_sessions)
+        self._running: Dict[str, Dict[asyncio.Task, int]] = {}
+        self.refused = 0
+        self.cancelled = 0
+        self.dropped = 0
+
+    def is_current(self, session_id: Optional[str], sequence: Optional[int]) -> bool:
+        """Whether no newer request than this one has been seen for its session."""
+        if session_id is None or sequence is None:
+            return True
+        latest = self._latest.peek(session_id)
+        return latest is None or sequence >= latest
+
+    def check(self, session_id: Optional[str], sequence: Optional[int]) -> None:
+        """
+        Make sure a request has not been superseded before acting on its result.
+
+        Raises:
+            SupersededError: If a newer request has arrived for the session
+        """
+        if not self.is_current(session_id, sequence):
+            self.dropped += 1
+            raise SupersededError(
+                f"Request {sequence} of session {session_id} was superseded"
+            )
+
+    def _advance(self, session_id: str, sequence: int) -> None:
+        """Record the sequence as the session's latest and cancel older running work."""
+        if not self.is_current(session_id, sequence):
+            self.refused += 1
+            raise SupersededError(
+                f"Request {sequence} of session {session_id} was superseded"
+            )
+        self._latest.set(session_id, sequence)
+        for task, task_sequence in self._running.get(session_id, {}).items():
+            if task_sequence < sequence and not task.done():
+                task.cancel()
+                self.cancelled += 1
+
+    def _finished(self, session_id: str, task: asyncio.Task) -> None:
+        running = self._running.get(session_id)
+        if running is None:
+            return
+        running.pop(task, None)
+        if not running:
+            del self._running[session_id]
+
+    async def run(
+        self,
+        session_id: Optional[str],
+        sequence: Optional[int],
+        work: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        Run work on behalf of a session's request unless a newer one supersedes it.
+
+        Raises:
+            SupersededError: If a newer request for the session arrived before or while
+                the work was running
+        """
+        if session_id is None or sequence is None:
+            return await work()
+
+        self._advance(session_id, sequence)
+        task = asyncio.ensure_future(work())
+        self._running.setdefault(session_id, {})[task] = sequence
+        task.add_done_callback(lambda done: self._finished(session_id, done))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            # Only the work was cancelled, not the caller: a newer request replaced it
+            if task.cancelled() and current is not None and not current.cancelling():
+                raise SupersededError(
+                    f"Request {sequence} of session {session_id} was superseded"
+                )
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._latest),
+            "running": sum(len(running) for running in self._running.values()),
+            "refused_on_arrival": self.refused,
+            "cancelled_in_flight": self.cancelled,
+            "dropped_before_persistence": self.dropped,
+        }
@@ -0,0 +1,36 @@
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def get_env_int(var_name: str, default: int) -> int:
+    """Read an integer environment variable, falling back to the default when unset or invalid."""
+    value = os.environ.get(var_name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        log.warning(f"Invalid integer for '{var_name}': {value!r}, using {default}")
+        return default
+
+
+def get_env_float(var_name: str, default: float) -> float:
+    """Read a float environment variable, falling back to the default when unset or invalid."""
+    value = os.environ.get(var_name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        log.warning(f"Invalid number for '{var_name}': {value!r}, using {default}")
+        return default
+
+
+def get_env_bool(var_name: str, default: bool) -> bool:
+    """Read a boolean environment variable ("true"/"false", case-insensitive)."""
+    value = os.environ.get(var_name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -1,17 +1,27 @@
 import logging
 import os
+import time
 import uuid
+from typing import Dict, Optional
 
+import httpx
 from supabase import AsyncClientOptions
 
 # from supabase import AsyncClientOptions
 from supabase._async.client import AsyncClient as Client
 from supabase._async.client import create_client
 
+from app.utils.cache import LRUCache
+from app.utils.config import get_env_float, get_env_int
+from app.utils.metrics import InstrumentedTransport, timed
+
 # Import config to ensure environment variables are loaded
 
 log = logging.getLogger(__name__)
 
+ADMIN_CACHE_KEY = "__admin__"
+SERVICE_CACHE_KEY = "__service__"
+
 
 def is_valid_uuid(value):
     try:
@@ -31,35 +41,165 @@ def _get_required_env_var(var_name: str) -> str:
     return value
 
 
-async def db_client(
-    token: str,
-) -> Client:
-    try:
-        supabase_url = _get_required_env_var("SUPABASE_URL")
-        supabase_key = _get_required_env_var("SUPABASE_KEY")
-    except ValueError as e:
-        log.error(f"Failed to load required environment variables: {e}")
-        raise
-
+class SupabaseClientManager:
     """
-    Note that if we set ADMIN_ACCESS to true, there won't be an org_id associated with the db request, which might be a cause of problem when the entry requires org_id to be non-null.
+    Process-wide manager for Supabase clients.
+
+    Every client handed out shares one httpx transport, so they all draw from the same
+    connection pool and reuse warm TCP/TLS connections. Binding a user token only builds
+    a thin client around that transport, and the result is kept in a TTL/LRU-bounded
+    cache keyed on the token.
     """
 
-    # Development
-    if os.environ.get("ADMIN_ACCESS") == "true":
-        return await create_client(
+    def __init__(
+        self,
+        max_clients: int,
+        ttl_seconds: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        timeout_seconds: float,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._clients: LRUCache[str, Client] = LRUCache(
+            max_entries=max_clients, ttl_seconds=ttl_seconds
+        )
+        self._create_seconds_total = 0.0
+
+    def _get_transport(self) -> httpx.AsyncBaseTransport:
+        if self._transport is None:
+            # Every database query and storage request passes through here, so this is
+            # where their latency and failures are measured
+            self._transport = InstrumentedTransport(
+                httpx.AsyncHTTPTransport(limits=self.limits, http2=True)
+            )
+        return self._transport
+
+    def _new_http_client(self) -> httpx.AsyncClient:
+        # Each Supabase client gets its own httpx client because storage3 mutates the
+        # base URL and headers of the client it is given. They all wrap the shared
+        # transport, so no new connections are opened. These wrappers must never be
+        # closed individually, as that would close the shared transport.
+        return httpx.AsyncClient(
+            transport=self._get_transport(),
+            timeout=self.timeout_seconds,
+            follow_redirects=True,
+        )
+
+    async def get_client(self, token: str) -> Client:
+        try:
+            supabase_url = _get_required_env_var("SUPABASE_URL")
+            supabase_key = _get_required_env_var("SUPABASE_KEY")
+        except ValueError as e:
+            log.error(f"Failed to load required environment variables: {e}")
+            raise
+
+        """
+        Note that if we set ADMIN_ACCESS to true, there won't be an org_id associated with the db request, which might be a cause of problem when the entry requires org_id to be non-null.
+        """
+        admin_access = os.environ.get("ADMIN_ACCESS") == "true"
+        cache_key = ADMIN_CACHE_KEY if admin_access else token
+
+        client = self._clients.get(cache_key)
+        if client is not None:
+            return client
+
+        start = time.perf_counter()
+
+        # Development
+        if admin_access:
+            options = AsyncClientOptions(httpx_client=self._new_http_client())
+        # Production
+        else:
+            options = AsyncClientOptions(
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "apiKey": supabase_key,
+                },
+                httpx_client=self._new_http_client(),
+            )
+
+        client = await create_client(
             supabase_url=supabase_url,
             supabase_key=supabase_key,
+            options=options,
         )
+        self._create_seconds_total += time.perf_counter() - start
+        self._clients.set(cache_key, client)
+        return client
+
+    async def get_service_client(self) -> Client:
+        """
+        A client authenticated with the service role key, for work done on a user's
+        behalf outside of their request, such as outbox jobs.
+
+        It bypasses row level security, so callers must have checked that the user owns
+        what they touch. With ADMIN_ACCESS the admin client is used instead.
+        """
+        if os.environ.get("ADMIN_ACCESS") == "true":
+            return await self.get_client(token="")
+
+        client = self._clients.get(SERVICE_CACHE_KEY)
+        if client is not None:
+            return client
+
+        try:
+            supabase_url = _get_required_env_var("SUPABASE_URL")
+            service_key = _get_required_env_var("SUPABASE_SERVICE_ROLE_KEY")
+        except ValueError as e:
+            log.error(f"Failed to load required environment variables: {e}")
+            raise
+
+        start = time.perf_counter()
+        client = await create_client(
+            supabase_url=supabase_url,
+            supabase_key=service_key,
+            options=AsyncClientOptions(httpx_client=self._new_http_client()),
+        )
+        self._create_seconds_total += time.perf_counter() - start
+        self._clients.set(SERVICE_CACHE_KEY, client)
+        return client
+
+    async def close(self) -> None:
+        """Drop all cached clients and close the shared connection pool."""
+        self._clients.clear()
+        if self._transport is not None:
+            await self._transport.aclose()
+            self._transport = None
+        log.info("Closed Supabase client pool")
+
+    def stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = self._clients.stats()
+        misses = self._clients.misses
+        avg_create_seconds = self._create_seconds_total / misses if misses else 0.0
+        stats["create_seconds_total"] = round(self._create_seconds_total, 6)
+        # Rough estimate of the client construction time that cache hits avoided
+        stats["estimated_seconds_saved"] = round(
+            self._clients.hits * avg_create_seconds, 6
+        )
+        return stats
+
+
+client_manager = SupabaseClientManager(
+    max_clients=get_env_int("SUPABASE_CLIENT_CACHE_SIZE", 256),
+    ttl_seconds=get_env_float("SUPABASE_CLIENT_TTL_SECONDS", 600),
+    max_connections=get_env_int("SUPABASE_MAX_CONNECTIONS", 100),
+    max_keepalive_connections=get_env_int("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", 20),
+    timeout_seconds=get_env_float("SUPABASE_TIMEOUT_SECONDS", 60),
+)
+
+
+async def db_client(
+    token: str,
+) -> Client:
+    with timed("db_client"):
+        return await client_manager.get_client(token=token)
+
 
-    # Production
-    return await create_client(
-        supabase_url=supabase_url,
-        supabase_key=supabase_key,
-        options=AsyncClientOptions(
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apiKey": supabase_key,
-            }
-        ),
-    )
+async def service_db_client() -> Client:
+    with timed("db_client"):
+        return await client_manager.get_service_client()
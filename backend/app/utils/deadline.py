@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# Where work was dropped because its deadline had passed
+_expired: Dict[str, int] = {}
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passes before its work is done."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def parse_deadline(
+    deadline: Optional[str], max_age: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """
+    Work out a request's deadline from its headers.
+
+    Args:
+        deadline: Absolute deadline as Unix time in seconds (X-Request-Deadline)
+        max_age: Seconds from arrival after which the result is useless (X-Request-Max-Age)
+        now: Arrival time; defaults to the current time
+
+    Returns:
+        The earlier of the two as Unix time in seconds, or None if neither was given
+
+    Raises:
+        ValueError: If a header is not a number
+    """
+    now = time.time() if now is None else now
+    candidates = []
+    try:
+        if deadline:
+            candidates.append(float(deadline))
+        if max_age:
+            candidates.append(now + float(max_age))
+    except ValueError:
+        raise ValueError("Request deadline headers must be numbers of seconds")
+    return min(candidates) if candidates else None
+
+
+def is_expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.time() >= deadline
+
+
+def record_expired(stage: str) -> None:
+    _expired[stage] = _expired.get(stage, 0) + 1
+
+
+def check_deadline(deadline: Optional[float], stage: str) -> None:
+    """
+    Drop work whose deadline has already passed.
+
+    Raises:
+        DeadlineExceededError: If the deadline has passed
+    """
+    if is_expired(deadline):
+        record_expired(stage)
+        raise DeadlineExceededError(stage)
+
+
+@asynccontextmanager
+async def within_deadline(deadline: Optional[float], stage: str) -> AsyncIterator[None]:
+    """
+    Run the block until the deadline, cancelling it if the deadline passes first.
+
+    Raises:
+        DeadlineExceededError: If the deadline passed before or during the block
+    """
+    if deadline is None:
+        yield
+        return
+    check_deadline(deadline, stage)
+    # The deadline is wall-clock time (it may come from another process), the
+    # timeout is measured on the event loop's monotonic clock
+    timeout = asyncio.timeout(deadline - time.time())
+    try:
+        async with timeout:
+            yield
+    except TimeoutError:
+        if not timeout.expired():
+            # A timeout of the work itself, not of the request
+            raise
+        record_expired(stage)
+        raise DeadlineExceededError(stage) from None
+
+
+def deadline_stats() -> Dict[str, int]:
+    return dict(_expired)
@@ -0,0 +1,55 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+_counts: Dict[str, Dict[str, int]] = {}
+
+
+async def collection_version(query: Any) -> str:
+    """
+    A cheap version token for the rows matched by a select query.
+
+    The query should select "updated_at" with count="exact"; only the newest row is
+    fetched. Adding, removing or updating a row changes the token.
+    """
+    response = await query.order("updated_at", desc=True).limit(1).execute()
+    latest = response.data[0]["updated_at"] if response.data else ""
+    return f"{response.count or 0}:{latest}"
+
+
+def make_etag(*parts: Any) -> str:
+    """A strong ETag for a response derived from the given parts."""
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def record_conditional_get(
+    endpoint: str, conditional: bool, not_modified: bool
+) -> None:
+    counts = _counts.setdefault(
+        endpoint, {"requests": 0, "conditional": 0, "not_modified": 0}
+    )
+    counts["requests"] += 1
+    counts["conditional"] += int(conditional)
+    counts["not_modified"] += int(not_modified)
+
+
+def etag_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        endpoint: {
+            **counts,
+            "not_modified_ratio": round(counts["not_modified"] / counts["requests"], 3),
+        }
+        for endpoint, counts in _counts.items()
+    }
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Dict, Optional
+
+from app.models.image import GeneratedImage
+from app.utils.cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+
+def _result_size(result: GeneratedImage) -> int:
+    return len(result.image_bytes) + len(result.text_response or "")
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of image generation results.
+
+    Results are keyed on a digest of everything that determines the model output: the
+    model, the rendered prompt, the request type and the digest of the canvas bytes. A memory tier
+    bounded by total bytes is always used; an on-disk tier is added when a directory is
+    configured, so results survive restarts and are shared between workers.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: Optional[int] = None,
+    ):
+        self._memory: LRUCache[str, GeneratedImage] = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes, size_of=_result_size
+        )
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_writes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(
+        model: str, prompt: str, request_type: str, image_digest: Optional[str]
+    ) -> str:
+        digest = hashlib.sha256()
+        for part in (model, prompt, request_type, image_digest or ""):
+            encoded = part.encode("utf-8")
+            # Length-prefix each field so that adjacent fields cannot run into each other
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _read_disk(self, key: str) -> Optional[GeneratedImage]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                image_bytes = f.read()
+        except FileNotFoundError:
+            return None
+        # Refresh the modification time so that pruning removes least recently used entries
+        os.utime(path)
+        return GeneratedImage(image_bytes=image_bytes, **header)
+
+    def _prune_disk(self) -> None:
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".bin"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def _write_disk(self, key: str, result: GeneratedImage) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        # A single JSON header line followed by the raw image bytes
+        header = json.dumps(
+            {"mime_type": result.mime_type, "text_response": result.text_response}
+        )
+        with open(tmp_path, "wb") as f:
+            f.write(header.encode("utf-8") + b"\n")
+            f.write(result.image_bytes)
+        # Atomic rename so concurrent readers never see a partially written entry
+        os.replace(tmp_path, path)
+
+        self._disk_writes += 1
+        # Scanning the directory is not free, so only check the size limit periodically
+        if self.disk_max_bytes and self._disk_writes % 32 == 0:
+            self._prune_disk()
+
+    def record_bypass(self) -> None:
+        self.bypasses += 1
+
+    async def get(self, key: str) -> Optional[GeneratedImage]:
+        result = self._memory.get(key)
+        if result is not None:
+            self.memory_hits += 1
+            self.bytes_saved += _result_size(result)
+            return result
+
+        if self.disk_dir:
+            try:
+                result = await asyncio.to_thread(self._read_disk, key)
+            except Exception as e:
+                log.error(f"Error reading generation cache entry {key}: {e}")
+                result = None
+            if result is not None:
+                self.disk_hits += 1
+                self.bytes_saved += _result_size(result)
+                self._memory.set(key, result)
+                return result
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: GeneratedImage) -> None:
+        self._memory.set(key, result)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, result)
+            except Exception as e:
+                log.error(f"Error writing generation cache entry {key}: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory.total_bytes,
+            "memory_evictions": self._memory.evictions,
+        }
@@ -0,0 +1,160 @@
+import base64
+import binascii
+import hashlib
+import struct
+from functools import cached_property
+from typing import Optional, Tuple
+
+# (format, width, height); width and height are None when the header does not carry them
+HeaderInfo = Tuple[Optional[str], Optional[int], Optional[int]]
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers, which carry the image dimensions
+_JPEG_SOF_MARKERS = {
+    0xC0,
+    0xC1,
+    0xC2,
+    0xC3,
+    0xC5,
+    0xC6,
+    0xC7,
+    0xC9,
+    0xCA,
+    0xCB,
+    0xCD,
+    0xCE,
+    0xCF,
+}
+
+
+def _parse_png(data: bytes) -> HeaderInfo:
+    # The IHDR chunk always comes first: 8 byte signature, 4 byte length, b"IHDR"
+    if len(data) >= 24 and data[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+    return "png", None, None
+
+
+def _parse_jpeg(data: bytes) -> HeaderInfo:
+    offset = 2
+    length = len(data)
+    while offset + 4 <= length:
+        if data[offset] != 0xFF:
+            break
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            # Markers without a length field
+            offset += 2
+            continue
+        (segment_length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+        if marker in _JPEG_SOF_MARKERS and offset + 9 <= length:
+            height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+            return "jpeg", width, height
+        offset += 2 + segment_length
+    return "jpeg", None, None
+
+
+def _parse_webp(data: bytes) -> HeaderInfo:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return "webp", width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return "webp", width, height
+    return "webp", None, None
+
+
+def _parse_gif(data: bytes) -> HeaderInfo:
+    if len(data) >= 10:
+        width, height = struct.unpack("<HH", data[6:10])
+        return "gif", width, height
+    return "gif", None, None
+
+
+def parse_image_header(data: bytes) -> HeaderInfo:
+    """
+    Identify an image and read its dimensions from the header alone, without decoding pixels.
+
+    Supports PNG, JPEG, WebP and GIF. Returns (None, None, None) for anything else.
+    """
+    if data.startswith(_PNG_SIGNATURE):
+        return _parse_png(data)
+    if data.startswith(b"\xff\xd8"):
+        return _parse_jpeg(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _parse_webp(data)
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return _parse_gif(data)
+    return None, None, None
+
+
+class ImagePayload:
+    """
+    The raw bytes of one image, shared by everything that handles it during a request.
+
+    The bytes are decoded from base64 (or read from the request body) exactly once.
+    The digest, MIME type and dimensions are computed lazily on first access and then
+    reused, so the service, the background tasks and the storage helpers never decode
+    or parse the same image twice.
+    """
+
+    def __init__(self, data: bytes, mime_type: Optional[str] = None):
+        self.data = data
+        # Used when the header is not recognised, e.g. the MIME type reported by the model
+        self._fallback_mime_type = (
+            mime_type.split(";")[0].strip() if mime_type else None
+        )
+
+    @classmethod
+    def from_base64(cls, image_data: str) -> "ImagePayload":
+        try:
+            return cls(base64.b64decode(image_data))
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Invalid image data: {e}")
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @cached_property
+    def digest(self) -> str:
+        """SHA-256 hex digest of the image bytes."""
+        return hashlib.sha256(self.data).hexdigest()
+
+    @cached_property
+    def _header(self) -> HeaderInfo:
+        return parse_image_header(self.data)
+
+    @property
+    def format(self) -> Optional[str]:
+        """Image format ("png", "jpeg", "webp" or "gif"), or None if not recognised."""
+        return self._header[0]
+
+    @property
+    def mime_type(self) -> str:
+        if self.format:
+            return f"image/{self.format}"
+        return self._fallback_mime_type or "image/png"
+
+    @property
+    def extension(self) -> str:
+        return self.mime_type.split("/", 1)[1]
+
+    @property
+    def width(self) -> Optional[int]:
+        return self._header[1]
+
+    @property
+    def height(self) -> Optional[int]:
+        return self._header[2]
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
@@ -0,0 +1,30 @@
+import logging
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+log = logging.getLogger(__name__)
+
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def init_openai_client() -> AsyncOpenAI:
+    """Create the shared AsyncOpenAI client (and its connection pool) if it does not exist yet."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI()
+        log.info("Initialized shared OpenAI client")
+    return _openai_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client, creating it lazily outside the server lifespan."""
+    return _openai_client or init_openai_client()
+
+
+async def close_openai_client() -> None:
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+        log.info("Closed shared OpenAI client")
@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.server_timing import record_stage
+
+log = logging.getLogger(__name__)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Covers everything from a cached lookup to a slow image generation
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        _registry.append(self)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """The exposition lines of every series of this metric."""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down per label combination.
+
+    A gauge may also be backed by a function, read only when the metrics are rendered,
+    so that values already tracked elsewhere cost nothing to expose.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float], *labels: str) -> None:
+        self._functions[labels] = function
+
+    def samples(self) -> Iterator[str]:
+        values = dict(self._values)
+        for labels, function in self._functions.items():
+            values[labels] = function()
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: a count per bucket (plus +Inf), then the sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._series[labels] = series
+        # Buckets are stored non-cumulatively and summed up when rendered
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def samples(self) -> Iterator[str]:
+        label_names = self.label_names + ("le",)
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    label_names, labels + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            series_labels = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{series_labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{series_labels} {cumulative}"
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+async def serve_metrics(
+    host: str, port: int, refresh: Optional[Callable[[], Awaitable[None]]] = None
+) -> asyncio.Server:
+    """
+    Serve the metrics on GET /metrics, for processes without an HTTP app of their own.
+
+    Each scrape is a single HTTP/1.1 request on its own connection; anything other than
+    GET /metrics gets a 404.
+
+    Args:
+        host: The address to listen on
+        port: The port to listen on
+        refresh: Awaited before each scrape, to update gauges that are read on demand
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async with asyncio.timeout(10):
+                request_line = await reader.readline()
+                # Headers are not needed; read up to the blank line that ends them
+                while (await reader.readline()).strip():
+                    pass
+            method, path, *_ = request_line.decode("latin-1").split() + ["", ""]
+            if method == "GET" and path.partition("?")[0] == "/metrics":
+                if refresh is not None:
+                    await refresh()
+                status, content_type = "200 OK", METRICS_CONTENT_TYPE
+                body = render_metrics().encode()
+            else:
+                status, content_type, body = (
+                    "404 Not Found",
+                    "text/plain",
+                    b"Not Found\n",
+                )
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (TimeoutError, ConnectionError) as e:
+            log.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    log.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "drawdash_http_request_duration_seconds",
+    "Time taken to serve HTTP requests, including streamed bodies.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "drawdash_http_requests_in_flight", "HTTP requests currently being served."
+)
+STAGE_SECONDS = Histogram(
+    "drawdash_stage_duration_seconds",
+    "Time taken by internal stages such as image decoding and upstream calls.",
+    ("stage",),
+)
+STAGES_IN_FLIGHT = Gauge(
+    "drawdash_stage_in_flight", "Internal stages currently running.", ("stage",)
+)
+UPSTREAM_ERRORS = Counter(
+    "drawdash_upstream_errors_total",
+    "Failed calls to upstream services.",
+    ("upstream", "reason"),
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Record the duration of a stage and count it as in flight while it runs.
+
+    The duration also goes into the current request's Server-Timing header.
+    """
+    STAGES_IN_FLIGHT.inc(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage)
+        STAGES_IN_FLIGHT.dec(stage)
+        record_stage(stage, seconds)
+
+
+def record_upstream_error(upstream: str, error: BaseException) -> None:
+    """Count a failed upstream call, classified by the kind of failure."""
+    if isinstance(error, TimeoutError):
+        reason = "timeout"
+    else:
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        reason = str(code) if isinstance(code, int) else type(error).__name__
+    UPSTREAM_ERRORS.inc(upstream, reason)
+
+
+def _supabase_stage(path: str) -> str:
+    if path.startswith("/rest/"):
+        return "db_query"
+    if path.startswith("/storage/"):
+        return "storage_request"
+    return "supabase_request"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps an httpx transport to time Supabase requests and count their failures.
+
+    Requests are classified by API (PostgREST queries, storage, anything else) from the
+    URL path. The duration runs until the response headers arrive.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with timed(_supabase_stage(request.url.path)):
+            try:
+                response = await self._transport.handle_async_request(request)
+            except Exception as e:
+                record_upstream_error("supabase", e)
+                raise
+        if response.status_code == 429 or response.status_code >= 500:
+            UPSTREAM_ERRORS.inc("supabase", str(response.status_code))
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class MetricsMiddleware:
+    """Records the duration and in-flight count of every HTTP request by route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+        finished_at: Optional[float] = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status, finished_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                # Background tasks run after this, once the client has the response
+                finished_at = time.perf_counter()
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Label by path template rather than raw path to keep the series bounded
+            HTTP_REQUEST_SECONDS.observe(
+                (finished_at or time.perf_counter()) - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status or 500),
+            )
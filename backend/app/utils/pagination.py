@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.utils.config import get_env_int
+
+DEFAULT_PAGE_SIZE = get_env_int("LIST_PAGE_SIZE", 50)
+MAX_PAGE_SIZE = get_env_int("LIST_MAX_PAGE_SIZE", 200)
+
+_ROW_ID = re.compile(r"^[A-Za-z0-9-]+$")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """The number of rows to return for a requested limit, capped at MAX_PAGE_SIZE."""
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value: str, row_id: str) -> str:
+    """Build an opaque cursor pointing just past the row with this sort value and id."""
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Read the sort value and row id back out of a cursor.
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        # Both values end up in a PostgREST filter, so only accept what we issue
+        datetime.fromisoformat(sort_value)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(row_id, str) or not _ROW_ID.match(row_id):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return sort_value, row_id
+
+
+def select_columns(model: Type[BaseModel], fields: Optional[str]) -> str:
+    """
+    Build the select clause for a comma-separated list of model fields.
+
+    The model's required fields are always selected so that every row still validates;
+    without a field list all of the model's fields are selected.
+
+    Raises:
+        ValueError: If a field is not part of the model
+    """
+    if not fields:
+        return ",".join(model.model_fields)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ",".join(
+        name
+        for name, info in model.model_fields.items()
+        if name in requested or info.is_required()
+    )
+
+
+def keyset_page(query: Any, sort_column: str, cursor: Optional[str], limit: int):
+    """
+    Restrict a select query to one page, newest first, starting after the cursor.
+
+    Rows are ordered by sort_column and then id, so rows sharing a timestamp are neither
+    skipped nor repeated across pages. One extra row is fetched to tell whether another
+    page follows; pass the result to split_page.
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'{sort_column}.lt."{sort_value}",'
+            f'and({sort_column}.eq."{sort_value}",id.lt."{row_id}")'
+        )
+    return query.order(sort_column, desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def split_page(
+    rows: List[Dict[str, Any]], sort_column: str, limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Trim the extra row fetched by keyset_page.
+
+    Returns:
+        The rows of this page and the cursor for the next one, or None on the last page
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][sort_column], rows[-1]["id"])
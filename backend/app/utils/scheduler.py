@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.utils.cache import LRUCache
+from app.utils.metrics import timed
+
+log = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is turned away to protect the shared upstream quota."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """The Retry-After header value: whole seconds, at least one."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Allows bursts of up to burst calls, refilled at rate calls per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until the next one is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FairScheduler:
+    """
+    Admission control and fair queuing for calls to a shared upstream.
+
+    At most max_concurrency calls run at once. Callers that have to wait are queued per
+    client, and free slots are handed out round-robin across clients, so a client with a
+    long queue cannot starve the others. Each client also draws from its own token
+    bucket, and callers are rejected with an estimated retry delay when they are over
+    their rate or the queues are full. Not thread-safe; use it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate_per_minute: float,
+        burst: int,
+        max_queued: int,
+        max_queued_per_client: int,
+        max_clients: int = 10000,
+        initial_service_seconds: float = 10.0,
+        name: str = "scheduler",
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self._buckets: LRUCache[str, TokenBucket] = LRUCache(max_entries=max_clients)
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        # Clients with queued callers, in the order they are next served
+        self._turns: Deque[str] = deque()
+        self.running = 0
+        self.queued = 0
+        # Moving average of how long a call holds its slot, for Retry-After estimates
+        self.service_seconds = initial_service_seconds
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {
+            "rate_limited": 0,
+            "client_queue_full": 0,
+            "queue_full": 0,
+            "upstream_throttled": 0,
+        }
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def retry_after(self) -> float:
+        """Estimated seconds until a newly queued call would start."""
+        return (self.queued + 1) / self.max_concurrency * self.service_seconds
+
+    def _reject(self, reason: str, message: str, retry_after: float) -> None:
+        self.rejected[reason] += 1
+        raise AdmissionRejectedError(message, retry_after)
+
+    def _admit(self, client_id: str) -> None:
+        must_queue = self.running >= self.max_concurrency or self.queued > 0
+        if must_queue and self.queued >= self.max_queued:
+            self._reject("queue_full", "Too many requests queued", self.retry_after())
+        queue = self._queues.get(client_id)
+        if must_queue and queue and len(queue) >= self.max_queued_per_client:
+            self._reject(
+                "client_queue_full",
+                "Too many of your requests are queued",
+                self.retry_after(),
+            )
+
+        if self.rate > 0:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets.set(client_id, bucket)
+            wait = bucket.take()
+            if wait:
+                self._reject("rate_limited", "Request rate limit exceeded", wait)
+        self.admitted += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued callers, one client at a time."""
+        while self.running < self.max_concurrency and self._turns:
+            client_id = self._turns.popleft()
+            queue = self._queues[client_id]
+            future = queue.popleft()
+            if queue:
+                self._turns.append(client_id)
+            else:
+                del self._queues[client_id]
+            self.queued -= 1
+            self.running += 1
+            future.set_result(None)
+
+    def _discard(self, client_id: str, future: asyncio.Future) -> None:
+        """Remove a caller that gave up while still queued."""
+        queue = self._queues.get(client_id)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self._queues[client_id]
+            self._turns.remove(client_id)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    def _record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_upstream_throttled(self) -> float:
+        """Count an upstream rate limit response and return the retry estimate."""
+        self.rejected["upstream_throttled"] += 1
+        return self.retry_after()
+
+    async def _wait_turn(self, loop: asyncio.AbstractEventLoop, client_id: str) -> None:
+        """Queue behind the client's earlier callers until _dispatch grants a slot."""
+        future = loop.create_future()
+        queue = self._queues.setdefault(client_id, deque())
+        queue.append(future)
+        if len(queue) == 1:
+            self._turns.append(client_id)
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller was cancelled
+                self._release()
+            else:
+                self._discard(client_id, future)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, client_id: Optional[str]) -> AsyncIterator[None]:
+        """
+        Wait for a slot on behalf of a client and hold it for the duration of the block.
+
+        Raises:
+            AdmissionRejectedError: If the client is over its rate or the queue is full
+        """
+        client_id = client_id or ""
+        self._admit(client_id)
+
+        loop = asyncio.get_running_loop()
+        queued_at = loop.time()
+        if self.running < self.max_concurrency and not self._turns:
+            self.running += 1
+        else:
+            with timed(f"{self.name}_queue"):
+                await self._wait_turn(loop, client_id)
+
+        started_at = loop.time()
+        self._record_wait(started_at - queued_at)
+        try:
+            yield
+        finally:
+            self.service_seconds += 0.2 * (
+                loop.time() - started_at - self.service_seconds
+            )
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queued": self.queued,
+            "queued_clients": len(self._queues),
+            "occupancy": round(self.running / self.max_concurrency, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "mean_wait_seconds": (
+                round(self.total_wait_seconds / self.waits, 3) if self.waits else 0.0
+            ),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            "mean_service_seconds": round(self.service_seconds, 3),
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
@@ -0,0 +1,100 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ServerTiming:
+    """
+    Stage durations collected while serving one request.
+
+    Stages that run more than once (for example several database queries) are summed,
+    and their count is given as the entry's description.
+    """
+
+    def __init__(self):
+        self._durations: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._durations[stage] = self._durations.get(stage, 0.0) + seconds
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def stages(self) -> Dict[str, Tuple[float, int]]:
+        """Total seconds and number of runs per stage so far."""
+        return {
+            stage: (seconds, self._counts[stage])
+            for stage, seconds in self._durations.items()
+        }
+
+    def header(self, total_seconds: float) -> str:
+        """The Server-Timing header value, with durations in milliseconds."""
+        entries: List[str] = []
+        for stage, seconds in self._durations.items():
+            entry = f"{stage};dur={seconds * 1000:.1f}"
+            if self._counts[stage] > 1:
+                entry += f';desc="x{self._counts[stage]}"'
+            entries.append(entry)
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+
+def current_timing() -> Optional[ServerTiming]:
+    """The stage durations of the request being served, if any."""
+    return _current.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Add a stage duration to the current request's Server-Timing header.
+
+    A no-op outside of a request, e.g. in the outbox worker. Work in tasks started by
+    the request (asyncio.create_task, asyncio.to_thread) is attributed to it as well.
+    """
+    timing = _current.get()
+    if timing is not None:
+        timing.record(stage, seconds)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header to every response.
+
+    The header lists the stages recorded while handling the request and the total time
+    until the response started. For streamed responses it covers only the work done
+    before the first byte was sent. Browsers only expose the timings of cross-origin
+    responses to scripts when Timing-Allow-Origin permits it.
+    """
+
+    def __init__(self, app: ASGIApp, timing_allow_origin: Optional[str] = "*"):
+        self.app = app
+        self.timing_allow_origin = timing_allow_origin
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", timing.header(time.perf_counter() - start)
+                )
+                if self.timing_allow_origin:
+                    headers["Timing-Allow-Origin"] = self.timing_allow_origin
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from supabase._async.client import AsyncClient as Client
+
+from app.utils.cache import LRUCache
+from app.utils.compression import ZSTD_AVAILABLE, compress, decompress
+from app.utils.config import get_env_int
+from app.utils.storage import is_stored, store_if_missing
+
+log = logging.getLogger(__name__)
+
+# Snapshots whose JSON is at least this large are kept in object storage, not the row
+SNAPSHOT_OFFLOAD_BYTES = get_env_int("SNAPSHOT_OFFLOAD_BYTES", 256 * 1024)
+SNAPSHOT_BUCKET = os.environ.get("SNAPSHOT_STORAGE_BUCKET", "whisprdraw")
+SNAPSHOT_FOLDER = "snapshots"
+# Upper bound on a decompressed snapshot, so that a corrupt object cannot exhaust memory
+MAX_SNAPSHOT_BYTES = get_env_int("MAX_SNAPSHOT_BYTES", 256 * 1024 * 1024)
+
+_EXTENSIONS = {"zstd": "zst", "gzip": "gz"}
+_ENCODINGS = {extension: encoding for encoding, extension in _EXTENSIONS.items()}
+
+# Decompressed snapshot JSON by object path. Paths are content-addressed, so entries
+# never go stale and only need evicting for memory.
+_snapshot_json: LRUCache[str, bytes] = LRUCache(
+    max_entries=get_env_int("SNAPSHOT_CACHE_MAX_ENTRIES", 256),
+    max_bytes=get_env_int("SNAPSHOT_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    size_of=len,
+)
+_counters = {
+    "offloaded": 0,
+    "offload_skipped_known": 0,
+    "loaded": 0,
+    "json_bytes_stored": 0,
+    "compressed_bytes_stored": 0,
+}
+
+
+def encode_snapshot(snapshot: Dict[str, Any]) -> bytes:
+    """
+    Serialise a snapshot to compact JSON.
+
+    Keys are sorted so that equal snapshots always produce the same bytes, and so the
+    same object path.
+    """
+    return json.dumps(snapshot, separators=(",", ":"), sort_keys=True).encode()
+
+
+def snapshot_path(data: bytes) -> str:
+    """Content-addressed object path for encoded snapshot JSON."""
+    encoding = "zstd" if ZSTD_AVAILABLE else "gzip"
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{SNAPSHOT_FOLDER}/{digest}.json.{_EXTENSIONS[encoding]}"
+
+
+async def offload_snapshot(supabase_client: Client, data: bytes) -> str:
+    """
+    Store encoded snapshot JSON compressed in object storage.
+
+    Args:
+        supabase_client: The Supabase client instance
+        data: The snapshot as returned by encode_snapshot
+
+    Returns:
+        The object path, to be kept in the project row as snapshot_ref
+    """
+    path = snapshot_path(data)
+    _snapshot_json.set(path, data)
+    if is_stored(SNAPSHOT_BUCKET, path):
+        # Unchanged snapshot: skip compressing it again as well as the upload
+        _counters["offload_skipped_known"] += 1
+        return path
+
+    encoding = _ENCODINGS[path.rsplit(".", 1)[1]]
+    compressed = await asyncio.to_thread(compress, data, encoding)
+    await store_if_missing(
+        supabase_client=supabase_client,
+        bucket_name=SNAPSHOT_BUCKET,
+        path=path,
+        data=compressed,
+        content_type="application/octet-stream",
+    )
+    _counters["offloaded"] += 1
+    _counters["json_bytes_stored"] += len(data)
+    _counters["compressed_bytes_stored"] += len(compressed)
+    log.info(
+        f"Stored snapshot {path}: {len(data)} bytes of JSON as {len(compressed)} bytes"
+    )
+    return path
+
+
+async def load_snapshot(supabase_client: Client, path: str) -> Dict[str, Any]:
+    """Read a snapshot stored by offload_snapshot."""
+    data = _snapshot_json.get(path)
+    if data is None:
+        compressed = await supabase_client.storage.from_(SNAPSHOT_BUCKET).download(path)
+        encoding = _ENCODINGS.get(path.rsplit(".", 1)[-1])
+        if encoding is None:
+            raise ValueError(f"Unknown snapshot encoding: {path}")
+        data = await asyncio.to_thread(
+            decompress, compressed, encoding, MAX_SNAPSHOT_BYTES
+        )
+        _snapshot_json.set(path, data)
+        _counters["loaded"] += 1
+    return json.loads(data)
+
+
+def snapshot_storage_stats() -> dict:
+    json_bytes = _counters["json_bytes_stored"]
+    return {
+        **_counters,
+        "compression_ratio": (
+            round(json_bytes / _counters["compressed_bytes_stored"], 2)
+            if _counters["compressed_bytes_stored"]
+            else None
+        ),
+        "cache": _snapshot_json.stats(),
+    }
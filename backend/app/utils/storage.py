@@ -1,61 +1,127 @@
-import base64
 import logging
-import uuid
-from io import BytesIO
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 import httpx
-from PIL import Image
+from storage3.exceptions import StorageApiError
 from supabase._async.client import AsyncClient as Client
 
+from app.utils.cache import LRUCache
+from app.utils.config import get_env_int
+from app.utils.image_payload import ImagePayload
+from app.utils.metrics import timed
+
 log = logging.getLogger(__name__)
 
+# Object paths known to exist in storage. Paths are content-addressed, so an object at a
+# known path already holds exactly these bytes and never needs to be uploaded again.
+_known_objects: LRUCache[str, bool] = LRUCache(
+    max_entries=get_env_int("STORAGE_KNOWN_OBJECTS_CACHE_SIZE", 10000)
+)
+_upload_counts = {"uploaded": 0, "skipped_known": 0, "skipped_existing": 0}
+
+
+def content_addressed_path(folder: str, image: ImagePayload) -> str:
+    """Object path derived from the SHA-256 of the image bytes."""
+    return f"{folder}/{image.digest}.{image.extension}"
+
+
+def _is_duplicate_error(error: Exception) -> bool:
+    return isinstance(error, StorageApiError) and (
+        str(error.status) == "409" or error.code == "Duplicate"
+    )
+
+
+async def store_if_missing(
+    supabase_client: Client,
+    bucket_name: str,
+    path: str,
+    data: bytes,
+    content_type: str,
+) -> None:
+    """Upload bytes to a content-addressed path unless they are already there."""
+    bucket = supabase_client.storage.from_(bucket_name)
+    key = f"{bucket_name}/{path}"
+    if key in _known_objects:
+        _known_objects.get(key)  # Refresh recency
+        _upload_counts["skipped_known"] += 1
+        log.info(f"Skipping upload of {path}, already in storage")
+        return
+
+    try:
+        with timed("storage_upload"):
+            await bucket.upload(
+                path=path,
+                file=data,
+                file_options={"content-type": content_type},
+            )
+        _upload_counts["uploaded"] += 1
+    except Exception as e:
+        # Another request (or an earlier attempt of this job) stored the same bytes
+        if not _is_duplicate_error(e):
+            raise
+        _upload_counts["skipped_existing"] += 1
+        log.info(f"Object {path} already exists in storage")
+    _known_objects.set(key, True)
+
+
+def is_stored(bucket_name: str, path: str) -> bool:
+    """Whether a content-addressed object is known to be in storage already."""
+    return f"{bucket_name}/{path}" in _known_objects
+
+
+async def _upload_if_missing(
+    supabase_client: Client, bucket_name: str, path: str, image: ImagePayload
+) -> str:
+    """
+    Upload an image to a content-addressed path unless it is already there.
+
+    Returns:
+        The public URL of the object
+    """
+    await store_if_missing(
+        supabase_client=supabase_client,
+        bucket_name=bucket_name,
+        path=path,
+        data=image.data,
+        content_type=image.mime_type,
+    )
+    return await supabase_client.storage.from_(bucket_name).get_public_url(path)
+
+
+def storage_stats() -> Dict[str, int]:
+    return {**_upload_counts, "known_objects": len(_known_objects)}
+
 
 async def upload_image_to_storage(
     supabase_client: Client,
-    image_data: str,
+    image: ImagePayload,
     bucket_name: str = "whisprdraw",
     folder: str = "image_pairs",
-) -> Tuple[str, str, int, int]:
+) -> Tuple[str, str, Optional[int], Optional[int]]:
     """
-    Upload a base64 encoded image to Supabase storage.
+    Upload an image to Supabase storage.
 
     Args:
         supabase_client: The Supabase client instance
-        image_data: Base64 encoded image data
+        image: The image payload; its format and size are read from the header only
         bucket_name: The name of the storage bucket
-        folder: The folder path within the bucket
+        folder: The folder path within the bucket; the object is named by the SHA-256 of
+            the image bytes
 
     Returns:
         Tuple of (public_url, mime_type, width, height)
     """
     try:
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(BytesIO(image_bytes))
-
-        # Get image properties
-        width, height = image.size
-        mime_type = f"image/{image.format.lower()}" if image.format else "image/png"
-
-        # Generate unique filename
-        file_extension = image.format.lower() if image.format else "png"
-        filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
-
-        # Upload to Supabase storage
-        await supabase_client.storage.from_(bucket_name).upload(
-            path=filename,
-            file=image_bytes,
-            file_options={"content-type": mime_type},
+        # Identical images map to the same object, so they are only stored once
+        public_url_response = await _upload_if_missing(
+            supabase_client=supabase_client,
+            bucket_name=bucket_name,
+            path=content_addressed_path(folder, image),
+            image=image,
         )
 
-        # Get public URL
-        public_url_response = await supabase_client.storage.from_(
-            bucket_name
-        ).get_public_url(filename)
-
         log.info(f"Successfully uploaded image to {public_url_response}")
-        return public_url_response, mime_type, width, height
+        return public_url_response, image.mime_type, image.width, image.height
 
     except Exception as e:
         log.error(f"Error uploading image to storage: {e}")
@@ -141,30 +207,17 @@ async def download_and_upload_image_from_url(
         async with httpx.AsyncClient() as client:
             response = await client.get(image_url)
             response.raise_for_status()
-            image_bytes = response.content
-
-        # Open the image to get its properties
-        image = Image.open(BytesIO(image_bytes))
-
-        # Get image properties
-        mime_type = f"image/{image.format.lower()}" if image.format else "image/png"
-        file_extension = image.format.lower() if image.format else "png"
-
-        # Generate unique filename
-        filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
-
-        # Upload to Supabase storage
-        await supabase_client.storage.from_(bucket_name).upload(
-            path=filename,
-            file=image_bytes,
-            file_options={"content-type": mime_type},
+            image = ImagePayload(
+                response.content, mime_type=response.headers.get("content-type")
+            )
+
+        public_url_response = await _upload_if_missing(
+            supabase_client=supabase_client,
+            bucket_name=bucket_name,
+            path=content_addressed_path(folder, image),
+            image=image,
         )
 
-        # Get public URL
-        public_url_response = await supabase_client.storage.from_(
-            bucket_name
-        ).get_public_url(filename)
-
         log.info(f"Successfully uploaded image from URL to {public_url_response}")
         return public_url_response
 
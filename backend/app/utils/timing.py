@@ -0,0 +1,23 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimer:
+    """Records the wall-clock duration of each named stage of a multi-step pipeline."""
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = time.perf_counter() - start
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}={duration:.2f}s" for name, duration in self.durations.items()
+        )
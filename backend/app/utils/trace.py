@@ -0,0 +1,228 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, TextIO
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.config import get_env_float
+from app.utils.server_timing import current_timing
+
+log = logging.getLogger(__name__)
+
+# Fields added by route handlers to the trace entry of the request being served
+_annotations: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "trace_annotations", default=None
+)
+
+
+class TraceRecorder:
+    """
+    Appends the shape and timing of sampled requests to a JSON Lines file.
+
+    Entries never contain prompts, images, tokens or IDs: those are replaced by keyed
+    hashes, so a replay can still tell repeated values apart. Without a hash key a
+    random one is used, and hashes only match within one process's trace.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        sample_rate: float = 1.0,
+        hash_key: Optional[str] = None,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._key = hash_key.encode() if hash_key else os.urandom(32)
+        self._file: Optional[TextIO] = None
+        self.recorded = 0
+        self.sampled_out = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> "TraceRecorder":
+        return cls(
+            path=os.environ.get("TRACE_FILE") or None,
+            sample_rate=get_env_float("TRACE_SAMPLE_RATE", 1.0),
+            hash_key=os.environ.get("TRACE_HASH_KEY") or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def hash(self, value: Any) -> str:
+        """A short keyed hash that stands in for a sensitive value."""
+        data = value if isinstance(value, bytes) else str(value).encode()
+        return hmac.new(self._key, data, hashlib.sha256).hexdigest()[:16]
+
+    def sample(self) -> bool:
+        if random.random() < self.sample_rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """
+        Append one entry.
+
+        Lines go to a buffered file, so most writes do not touch the disk; a failure
+        is logged and never fails the request.
+        """
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=64 * 1024)
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.recorded += 1
+        except OSError as e:
+            self.failed += 1
+            log.error(f"Failed to write request trace to {self.path}: {e}")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            log.info(f"Closed request trace {self.path} ({self.recorded} requests)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "recorded": self.recorded,
+            "sampled_out": self.sampled_out,
+            "failed": self.failed,
+        }
+
+
+trace_recorder = TraceRecorder.from_env()
+
+
+def is_tracing() -> bool:
+    """Whether the request being served is being traced."""
+    return _annotations.get() is not None
+
+
+def annotate_trace(**fields: Any) -> None:
+    """Add fields to the current request's trace entry; a no-op when not tracing."""
+    annotations = _annotations.get()
+    if annotations is not None:
+        annotations.update(fields)
+
+
+def trace_hash(value: Optional[Any]) -> Optional[str]:
+    return None if value is None else trace_recorder.hash(value)
+
+
+def _query_shape(query_string: bytes) -> Dict[str, Any]:
+    """The query parameters that shape a response, without cursors or other values."""
+    shape: Dict[str, Any] = {}
+    for name, value in parse_qsl(query_string.decode()):
+        if name in ("limit", "fields"):
+            shape[name] = value
+        elif name == "cursor":
+            shape[name] = True
+    return shape
+
+
+class TraceMiddleware:
+    """
+    Records one trace entry per sampled HTTP request.
+
+    An entry holds the arrival time, route template, hashed path parameters and client,
+    body sizes, status, time to first byte, total duration (including streamed bodies)
+    and the stage durations collected for the Server-Timing header, so it must run
+    inside ServerTimingMiddleware. Route handlers may add fields with annotate_trace.
+    """
+
+    def __init__(self, app: ASGIApp, recorder: TraceRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.recorder.sample():
+            await self.app(scope, receive, send)
+            return
+
+        arrived_at = time.time()
+        start = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status: Optional[int] = None
+        first_byte_seconds: Optional[float] = None
+        response_type: Optional[str] = None
+        finished_at: Optional[float] = None
+
+        async def counting_receive() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message) -> None:
+            nonlocal response_bytes, status, first_byte_seconds, response_type
+            nonlocal finished_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                first_byte_seconds = time.perf_counter() - start
+                response_type = Headers(raw=message["headers"]).get("content-type")
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Background tasks run after this, once the client has the response
+                    finished_at = time.perf_counter()
+            await send(message)
+
+        annotations: Dict[str, Any] = {}
+        token = _annotations.set(annotations)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            _annotations.reset(token)
+            duration = (finished_at or time.perf_counter()) - start
+            headers = Headers(scope=scope)
+            route = scope.get("route")
+            timing = current_timing()
+            authorization = headers.get("authorization")
+            self.recorder.write(
+                {
+                    "ts": round(arrived_at, 6),
+                    "method": scope["method"],
+                    "route": getattr(route, "path", None),
+                    "params": {
+                        name: self.recorder.hash(value)
+                        for name, value in scope.get("path_params", {}).items()
+                    },
+                    "query": _query_shape(scope.get("query_string", b"")),
+                    "client": (
+                        self.recorder.hash(authorization) if authorization else None
+                    ),
+                    "accept": headers.get("accept"),
+                    "content_type": headers.get("content-type"),
+                    "max_age": headers.get("x-request-max-age"),
+                    "request_bytes": request_bytes,
+                    "status": status or 500,
+                    "response_type": response_type,
+                    "response_bytes": response_bytes,
+                    "first_byte_seconds": (
+                        None
+                        if first_byte_seconds is None
+                        else round(first_byte_seconds, 6)
+                    ),
+                    "duration_seconds": round(duration, 6),
+                    "stages": {
+                        stage: [round(seconds, 6), count]
+                        for stage, (seconds, count) in (
+                            timing.stages().items() if timing else ()
+                        )
+                    },
+                    **annotations,
+                }
+            )
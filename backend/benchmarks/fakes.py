@@ -0,0 +1,766 @@
+"""
+In-process stand-ins for the upstream services the backend calls.
+
+Each fake waits for a latency drawn from a log-normal distribution (given by its median
+and 99th percentile) and fails a configurable fraction of calls with an upstream-style
+error, so the backend's own code paths, limits and error handling run unchanged:
+
+- Gemini: replaces the genai.Client of the shared ImageService
+- Fal: replaces fal_client.subscribe_async and fal_client.cancel_async; the image URLs
+  it returns are served by a local HTTP server, as the icon job downloads them
+- OpenAI: replaces the shared AsyncOpenAI client
+- Supabase: an httpx transport under the shared Supabase connection pool, serving the
+  PostgREST and storage requests the backend makes from in-memory tables and objects
+
+Used by benchmarks.load; nothing here is imported by the app itself.
+"""
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fal_client
+import httpx
+import openai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+from openai.types.chat import ChatCompletion
+
+FAKE_SUPABASE_URL = "http://supabase.fake"
+
+# Standard normal quantile of the 99th percentile
+_Z99 = 2.326
+
+
+class LatencyProfile:
+    """
+    Latency distribution and failure rate of a fake upstream.
+
+    Latencies are log-normal with the given median and 99th percentile, in seconds; a
+    99th percentile at or below the median gives a constant latency.
+    """
+
+    def __init__(
+        self,
+        median: float,
+        p99: float,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+    ):
+        self.median = median
+        self.p99 = p99
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.sigma = math.log(p99 / median) / _Z99 if 0 < median < p99 else 0.0
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "LatencyProfile":
+        """
+        Build a profile from "MEDIAN,P99[,ERROR_RATE[,ERROR_STATUS]]" (seconds).
+
+        Raises:
+            ValueError: If the spec is malformed
+        """
+        parts = [part.strip() for part in spec.split(",")]
+        if not 2 <= len(parts) <= 4:
+            raise ValueError(
+                f"Expected MEDIAN,P99[,ERROR_RATE[,ERROR_STATUS]], got {spec!r}"
+            )
+        return cls(
+            median=float(parts[0]),
+            p99=float(parts[1]),
+            error_rate=float(parts[2]) if len(parts) > 2 else 0.0,
+            error_status=int(parts[3]) if len(parts) > 3 else 503,
+            seed=seed,
+        )
+
+    def latency(self) -> float:
+        if self.sigma == 0:
+            return max(0.0, self.median)
+        return self.median * math.exp(self.sigma * self._random.gauss(0, 1))
+
+    def sample(self) -> Tuple[float, bool]:
+        """
+        Draw one call's outcome and count it.
+
+        Returns:
+            Tuple of (latency in seconds, whether the call fails)
+        """
+        failed = self._random.random() < self.error_rate
+        self.calls += 1
+        self.failures += failed
+        return self.latency(), failed
+
+    async def simulate(self) -> bool:
+        """
+        Wait for one call's latency.
+
+        Returns:
+            Whether the call should fail
+        """
+        latency, failed = self.sample()
+        await asyncio.sleep(latency)
+        return failed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "median_seconds": self.median,
+            "p99_seconds": self.p99,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+class EmpiricalProfile(LatencyProfile):
+    """Draws latencies from recorded samples, such as the stage timings of a trace."""
+
+    def __init__(
+        self,
+        samples: List[float],
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+    ):
+        self.samples = sorted(samples)
+        super().__init__(
+            median=self.samples[len(self.samples) // 2],
+            p99=self.samples[min(len(self.samples) - 1, int(len(self.samples) * 0.99))],
+            error_rate=error_rate,
+            error_status=error_status,
+            seed=seed,
+        )
+
+    def latency(self) -> float:
+        return self._random.choice(self.samples)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "recorded_samples": len(self.samples)}
+
+
+def default_profiles(seed: int = 0) -> Dict[str, LatencyProfile]:
+    """Rough latencies of the real services, without errors."""
+    return {
+        "gemini": LatencyProfile(4.0, 12.0, seed=seed),
+        "fal": LatencyProfile(6.0, 20.0, seed=seed + 1),
+        "openai": LatencyProfile(0.8, 3.0, seed=seed + 2),
+        "supabase": LatencyProfile(0.015, 0.08, seed=seed + 3),
+    }
+
+
+### Gemini
+
+
+class FakeGenaiModels:
+    """The client.aio.models API used by ImageService."""
+
+    def __init__(self, profile: LatencyProfile, image: bytes, mime_type: str):
+        self.profile = profile
+        self.image = image
+        self.mime_type = mime_type
+
+    def _error(self) -> genai_errors.APIError:
+        status = self.profile.error_status
+        return genai_errors.APIError(
+            status,
+            {
+                "error": {
+                    "code": status,
+                    "message": "Fake upstream error",
+                    "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE",
+                }
+            },
+        )
+
+    def _response(
+        self, *parts: genai_types.Part
+    ) -> genai_types.GenerateContentResponse:
+        return genai_types.GenerateContentResponse(
+            candidates=[
+                genai_types.Candidate(
+                    content=genai_types.Content(role="model", parts=list(parts))
+                )
+            ]
+        )
+
+    def _image_part(self) -> genai_types.Part:
+        return genai_types.Part(
+            inline_data=genai_types.Blob(data=self.image, mime_type=self.mime_type)
+        )
+
+    async def generate_content(
+        self, model: str, contents: Any, config: Any = None
+    ) -> genai_types.GenerateContentResponse:
+        if await self.profile.simulate():
+            raise self._error()
+        return self._response(
+            genai_types.Part(text="Here is your drawing."), self._image_part()
+        )
+
+    async def generate_content_stream(
+        self, model: str, contents: Any, config: Any = None
+    ):
+        # The text arrives halfway through the call and the image at the end
+        latency, failed = self.profile.sample()
+        await asyncio.sleep(latency / 2)
+        if failed:
+            raise self._error()
+
+        async def chunks():
+            yield self._response(genai_types.Part(text="Here is your drawing."))
+            await asyncio.sleep(latency / 2)
+            yield self._response(self._image_part())
+
+        return chunks()
+
+
+class FakeGenaiAio:
+    def __init__(self, models: FakeGenaiModels):
+        self.models = models
+
+
+class FakeGenaiClient:
+    """Stand-in for genai.Client; only the async API is used."""
+
+    def __init__(self, profile: LatencyProfile, image: bytes, mime_type: str):
+        self.aio = FakeGenaiAio(FakeGenaiModels(profile, image, mime_type))
+
+
+### Fal
+
+
+class FakeFal:
+    """Stand-in for fal_client.subscribe_async and fal_client.cancel_async."""
+
+    def __init__(self, profile: LatencyProfile, image_url: str):
+        self.profile = profile
+        self.image_url = image_url
+        self.cancelled = 0
+
+    async def subscribe_async(
+        self,
+        application: str,
+        arguments: Any,
+        *,
+        with_logs: bool = False,
+        on_enqueue: Optional[Callable[[str], None]] = None,
+        on_queue_update: Optional[Callable[[Any], None]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        if on_enqueue is not None:
+            on_enqueue(uuid.uuid4().hex)
+        if await self.profile.simulate():
+            request = httpx.Request("POST", f"https://queue.fal.run/{application}")
+            response = httpx.Response(self.profile.error_status, request=request)
+            raise httpx.HTTPStatusError(
+                "Fake upstream error", request=request, response=response
+            )
+        image = {"url": self.image_url, "content_type": "image/png"}
+        if "rembg" in application:
+            return {"image": image}
+        return {"images": [image]}
+
+    async def cancel_async(self, application: str, request_id: str) -> None:
+        self.cancelled += 1
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        data, content_type = self.server.file
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeFileHost:
+    """Serves one file over HTTP on a local port, standing in for Fal's CDN."""
+
+    def __init__(self, data: bytes, content_type: str):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FileHandler)
+        self.server.file = (data, content_type)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/generated.png"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+### OpenAI
+
+
+class FakeChatCompletions:
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    async def create(self, model: str, messages: List[Dict[str, Any]], **kwargs: Any):
+        if await self.profile.simulate():
+            request = httpx.Request(
+                "POST", "https://api.openai.com/v1/chat/completions"
+            )
+            raise openai.APIStatusError(
+                "Fake upstream error",
+                response=httpx.Response(self.profile.error_status, request=request),
+                body=None,
+            )
+        return ChatCompletion(
+            id=f"chatcmpl-{uuid.uuid4().hex}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Fake Topic"},
+                }
+            ],
+        )
+
+
+class FakeChat:
+    def __init__(self, profile: LatencyProfile):
+        self.completions = FakeChatCompletions(profile)
+
+
+class FakeOpenAI:
+    """Stand-in for the shared AsyncOpenAI client."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.chat = FakeChat(profile)
+
+    async def close(self) -> None:
+        pass
+
+
+### Supabase
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_terms(expression: str) -> List[str]:
+    """Split a PostgREST logical expression on top-level commas."""
+    terms, depth, quoted, start = [], 0, False, 0
+    for index, char in enumerate(expression):
+        if char == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            terms.append(expression[start:index])
+            start = index + 1
+    terms.append(expression[start:])
+    return terms
+
+
+def _coerce(stored: Any, value: str, column: str) -> Tuple[Any, Any]:
+    """Make a filter value comparable with the stored column value."""
+    if isinstance(stored, bool):
+        return stored, value.lower() == "true"
+    if isinstance(stored, (int, float)):
+        return stored, float(value)
+    if isinstance(stored, str) and column.endswith("_at"):
+        return datetime.fromisoformat(stored), datetime.fromisoformat(value)
+    return stored, value
+
+
+def _compare(row: Dict[str, Any], column: str, operator: str, value: str) -> bool:
+    value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+    stored = row.get(column)
+    if operator == "is":
+        return stored is {"null": None, "true": True, "false": False}[value.lower()]
+    if operator == "in":
+        return str(stored) in {item.strip('"') for item in value.strip("()").split(",")}
+    if stored is None:
+        return operator == "neq"
+    stored, value = _coerce(stored, value, column)
+    return {
+        "eq": stored == value,
+        "neq": stored != value,
+        "lt": stored < value,
+        "lte": stored <= value,
+        "gt": stored > value,
+        "gte": stored >= value,
+    }[operator]
+
+
+def _matches_logical(row: Dict[str, Any], expression: str, combine) -> bool:
+    results = []
+    for term in _split_terms(expression.strip()[1:-1]):
+        if term.startswith(("and(", "or(")):
+            name, _, rest = term.partition("(")
+            results.append(
+                _matches_logical(row, "(" + rest, all if name == "and" else any)
+            )
+        else:
+            column, operator, value = term.split(".", 2)
+            results.append(_compare(row, column, operator, value))
+    return combine(results)
+
+
+def _matches(row: Dict[str, Any], key: str, expression: str) -> bool:
+    if key in ("or", "and"):
+        return _matches_logical(row, expression, any if key == "or" else all)
+    operator, _, value = expression.partition(".")
+    return _compare(row, key, operator, value)
+
+
+class FakeSupabaseTransport(httpx.AsyncBaseTransport):
+    """
+    Serves the Supabase REST and storage requests the backend makes, in memory.
+
+    Supports the PostgREST subset the services use: column selection, eq/neq/lt/lte/
+    gt/gte/is/in filters with or/and groups, ordering, limit/offset, exact counts,
+    single-object responses, and insert/update/delete returning rows. RPCs are
+    answered as missing functions. Storage supports uploads (with duplicate detection),
+    downloads and public URLs.
+    """
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+        # Rows by value per (table, column), built on first use like a database index
+        # so that the fake itself does not dominate the measurement
+        self._indexes: Dict[Tuple[str, str], Dict[Any, List[Dict[str, Any]]]] = {}
+
+    def _candidates(
+        self, name: str, filters: List[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """The rows that can match the filters, narrowed by the first eq filter."""
+        for column, expression in filters:
+            if expression.startswith("eq.") and column not in ("or", "and"):
+                index = self._indexes.get((name, column))
+                if index is None:
+                    index = {}
+                    for row in self.tables[name]:
+                        index.setdefault(str(row.get(column)), []).append(row)
+                    self._indexes[(name, column)] = index
+                return index.get(expression.removeprefix("eq.").strip('"'), [])
+        return self.tables[name]
+
+    def _invalidate(self, name: str, columns: Optional[Any] = None) -> None:
+        """Drop the table's indexes, or only those on the given columns."""
+        for key in list(self._indexes):
+            if key[0] == name and (columns is None or key[1] in columns):
+                del self._indexes[key]
+
+    def seed(
+        self,
+        users: int,
+        projects_per_user: int,
+        pairs_per_project: int,
+        image_url: str,
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Fill the projects and image_pairs tables with generated rows.
+
+        Returns:
+            The seeded user IDs and project IDs
+        """
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        self._indexes.clear()
+        projects = self.tables.setdefault("projects", [])
+        pairs = self.tables.setdefault("image_pairs", [])
+        user_ids, project_ids = [], []
+        for user_index in range(users):
+            user_id = str(uuid.uuid4())
+            user_ids.append(user_id)
+            for project_index in range(projects_per_user):
+                project_id = str(uuid.uuid4())
+                project_ids.append(project_id)
+                created_at = start + timedelta(minutes=project_index)
+                projects.append(
+                    {
+                        "id": project_id,
+                        "user_id": user_id,
+                        "name": f"Project {user_index}-{project_index}",
+                        "description": None,
+                        "icon_url": None,
+                        "snapshot": None,
+                        "snapshot_version": 0,
+                        "snapshot_ref": None,
+                        "created_at": created_at.isoformat(),
+                        "updated_at": created_at.isoformat(),
+                    }
+                )
+                for pair_index in range(pairs_per_project):
+                    pair_at = created_at + timedelta(seconds=pair_index)
+                    pairs.append(
+                        {
+                            "id": str(uuid.uuid4()),
+                            "project_id": project_id,
+                            "input_url": image_url,
+                            "input_mime_type": "image/png",
+                            "input_width": 1024,
+                            "input_height": 768,
+                            "output_url": image_url,
+                            "output_mime_type": "image/png",
+                            "output_width": 1024,
+                            "output_height": 768,
+                            "prompt_text": f"Drawing {pair_index}",
+                            "metadata": None,
+                            "created_at": pair_at.isoformat(),
+                            "updated_at": pair_at.isoformat(),
+                        }
+                    )
+        return user_ids, project_ids
+
+    def put_object(self, key: str, data: bytes, content_type: str) -> str:
+        """Store an object and return its public URL."""
+        self.objects[key] = (data, content_type)
+        return f"{FAKE_SUPABASE_URL}/storage/v1/object/public/{key}"
+
+    def _json(
+        self,
+        request: httpx.Request,
+        status_code: int,
+        body: Any,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        return httpx.Response(
+            status_code,
+            content=json.dumps(body).encode(),
+            headers={"content-type": "application/json", **(headers or {})},
+            request=request,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        if await self.profile.simulate():
+            return self._json(
+                request,
+                self.profile.error_status,
+                {"message": "Fake upstream error", "code": "FAKE"},
+            )
+        path = request.url.path
+        if path.startswith("/rest/v1/"):
+            return self._rest(request, path.removeprefix("/rest/v1/"), body)
+        if path.startswith("/storage/v1/object/"):
+            return self._storage(
+                request, path.removeprefix("/storage/v1/object/"), body
+            )
+        return self._json(request, 404, {"message": f"No fake for {path}"})
+
+    def _rest(self, request: httpx.Request, name: str, body: bytes) -> httpx.Response:
+        if name.startswith("rpc/"):
+            return self._json(
+                request,
+                404,
+                {"code": "PGRST202", "message": f"Could not find the function {name}"},
+            )
+        rows = self.tables.setdefault(name, [])
+        params = request.url.params
+        reserved = ("select", "order", "limit", "offset", "columns", "on_conflict")
+        filters = [
+            (key, value) for key, value in params.multi_items() if key not in reserved
+        ]
+        matching = [
+            row
+            for row in self._candidates(name, filters)
+            if all(_matches(row, *f) for f in filters)
+        ]
+        prefer = request.headers.get("prefer", "")
+
+        if request.method == "POST":
+            data = json.loads(body)
+            now = _now()
+            inserted = [
+                {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **item}
+                for item in (data if isinstance(data, list) else [data])
+            ]
+            rows.extend(inserted)
+            for (table, column), index in self._indexes.items():
+                if table == name:
+                    for row in inserted:
+                        index.setdefault(str(row.get(column)), []).append(row)
+            return self._json(
+                request, 201, inserted if "return=representation" in prefer else []
+            )
+        if request.method == "PATCH":
+            update = {**json.loads(body), "updated_at": _now()}
+            for row in matching:
+                row.update(update)
+            self._invalidate(name, update.keys())
+            return self._json(
+                request, 200, matching if "return=representation" in prefer else []
+            )
+        if request.method == "DELETE":
+            self.tables[name] = [row for row in rows if row not in matching]
+            self._invalidate(name)
+            return self._json(
+                request, 200, matching if "return=representation" in prefer else []
+            )
+
+        for spec in reversed(params.get("order", "").split(",")):
+            if spec:
+                column, _, direction = spec.partition(".")
+                matching.sort(
+                    key=lambda row: (row.get(column) is None, row.get(column)),
+                    reverse=direction.startswith("desc"),
+                )
+        total = len(matching)
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        page = matching[offset : offset + int(limit) if limit else None]
+        select = params.get("select", "*")
+        if select != "*":
+            columns = select.split(",")
+            page = [{column: row.get(column) for column in columns} for row in page]
+
+        headers = {}
+        if "count=exact" in prefer:
+            end = offset + len(page) - 1
+            headers["content-range"] = (
+                f"{offset}-{end}/{total}" if page else f"*/{total}"
+            )
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(page) != 1:
+                return self._json(
+                    request,
+                    406,
+                    {
+                        "code": "PGRST116",
+                        "message": "JSON object requested, multiple (or no) rows returned",
+                        "details": f"The result contains {len(page)} rows",
+                        "hint": None,
+                    },
+                )
+            return self._json(request, 200, page[0], headers)
+        return self._json(request, 200, page, headers)
+
+    def _storage(
+        self, request: httpx.Request, path: str, body: bytes
+    ) -> httpx.Response:
+        key = path.removeprefix("public/").removeprefix("authenticated/")
+        if request.method in ("POST", "PUT"):
+            exists = key in self.objects
+            if (
+                exists
+                and request.method == "POST"
+                and request.headers.get("x-upsert") != "true"
+            ):
+                return self._json(
+                    request,
+                    400,
+                    {
+                        "statusCode": "409",
+                        "error": "Duplicate",
+                        "message": "The resource already exists",
+                    },
+                )
+            content_type = request.headers.get("content-type", "")
+            data, file_type = body, content_type
+            if content_type.startswith("multipart/form-data"):
+                message = BytesParser(policy=default_policy).parsebytes(
+                    f"Content-Type: {content_type}\r\n\r\n".encode() + body
+                )
+                for part in message.iter_parts():
+                    if part.get_filename():
+                        data = part.get_payload(decode=True)
+                        file_type = part.get_content_type()
+            self.objects[key] = (data, file_type)
+            return self._json(request, 200, {"Key": key, "Id": str(uuid.uuid4())})
+
+        if key not in self.objects:
+            return self._json(
+                request,
+                400,
+                {
+                    "statusCode": "404",
+                    "error": "not_found",
+                    "message": "Object not found",
+                },
+            )
+        data, content_type = self.objects[key]
+        return httpx.Response(
+            200,
+            content=b"" if request.method == "HEAD" else data,
+            headers={"content-type": content_type},
+            request=request,
+        )
+
+
+### Installation
+
+
+class FakeUpstreams:
+    """
+    All fakes for one benchmark run.
+
+    Call install() after the app has been imported and before it serves requests, and
+    close() once it has stopped.
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, LatencyProfile],
+        image: bytes,
+        mime_type: str = "image/png",
+    ):
+        self.profiles = profiles
+        self.supabase = FakeSupabaseTransport(profiles["supabase"])
+        self.image_url = self.supabase.put_object(
+            "fake/generated.png", image, mime_type
+        )
+        self.genai = FakeGenaiClient(profiles["gemini"], image, mime_type)
+        self.file_host = FakeFileHost(image, mime_type)
+        self.fal = FakeFal(profiles["fal"], self.file_host.url)
+        self.openai = FakeOpenAI(profiles["openai"])
+
+    def install(self) -> None:
+        import app.utils.llm as llm
+        from app.api.routes import image_service
+        from app.utils.database import client_manager
+        from app.utils.metrics import InstrumentedTransport
+
+        self.file_host.start()
+        image_service.client = self.genai
+        fal_client.subscribe_async = self.fal.subscribe_async
+        fal_client.cancel_async = self.fal.cancel_async
+        llm._openai_client = self.openai
+        # Every Supabase client wraps the manager's shared transport, so replacing it
+        # before the first client is created routes all queries and uploads here
+        client_manager._clients.clear()
+        client_manager._transport = InstrumentedTransport(self.supabase)
+
+    def close(self) -> None:
+        self.file_host.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{name: profile.stats() for name, profile in self.profiles.items()},
+            "supabase_rows": {
+                name: len(rows) for name, rows in self.supabase.tables.items()
+            },
+            "supabase_objects": len(self.supabase.objects),
+            "fal_cancelled": self.fal.cancelled,
+        }
@@ -0,0 +1,569 @@
+"""
+Load test of the API against in-process fakes of Gemini, Fal, OpenAI and Supabase.
+
+Serves the app with uvicorn on a background thread, with every upstream replaced by a
+fake from benchmarks.fakes, and drives POST /api/generate-image, GET /api/projects and
+GET /api/image-pairs over HTTP at a fixed concurrency. Reports throughput, latency
+percentiles per endpoint and the server's event loop lag, and writes them as JSON so
+runs can be compared between commits.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.load --concurrency 64 --duration 30
+    poetry run python -m benchmarks.load --baseline benchmarks/results/<earlier run>.json
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import (
+    FAKE_SUPABASE_URL,
+    FakeUpstreams,
+    LatencyProfile,
+    default_profiles,
+)
+from benchmarks.image_payload import make_canvas
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Only set when not already configured, so every limit can still be tuned per run
+FAKES_ENV = {
+    "SUPABASE_URL": FAKE_SUPABASE_URL,
+    "SUPABASE_KEY": "benchmark",
+    "SUPABASE_SERVICE_ROLE_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "OPENAI_API_KEY": "benchmark",
+    # Persist image pairs in-process, against the fake Supabase
+    "OUTBOX_EMBEDDED_WORKER": "true",
+    "OUTBOX_SHUTDOWN_GRACE_SECONDS": "5",
+}
+LOAD_ENV = {
+    **FAKES_ENV,
+    # Measure throughput rather than the per-client rate limit
+    "GENERATION_RATE_PER_MINUTE": "0",
+}
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires on the event loop it runs on."""
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self.interval_seconds = interval_seconds
+        self.recording = False
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            if self.recording:
+                self.samples.append(
+                    max(0.0, loop.time() - start - self.interval_seconds)
+                )
+
+
+class ServerThread(threading.Thread):
+    """Runs the app with uvicorn on its own thread and event loop."""
+
+    def __init__(self, app: Any, lag: LoopLagMonitor):
+        super().__init__(daemon=True)
+        import uvicorn
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.lag = lag
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on")
+        )
+
+    def run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        monitor = asyncio.create_task(self.lag.run())
+        try:
+            await self.server.serve(sockets=[self.socket])
+        finally:
+            monitor.cancel()
+
+    def wait_started(self, timeout_seconds: float = 30) -> None:
+        deadline = time.monotonic() + timeout_seconds
+        while not self.server.started:
+            if not self.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.join()
+
+
+class BenchmarkServer:
+    """The app served on a local port, with every upstream replaced by a fake."""
+
+    def __init__(
+        self,
+        profiles: Dict[str, LatencyProfile],
+        env: Dict[str, str],
+        log_level: str = "warning",
+    ):
+        self._outbox_dir = tempfile.TemporaryDirectory(prefix="drawdash-bench-outbox-")
+        os.environ.setdefault("OUTBOX_DIR", self._outbox_dir.name)
+        for name, value in env.items():
+            os.environ.setdefault(name, value)
+
+        # The app reads its configuration on import
+        from app.api.main import create_app
+
+        # Per-request INFO logging would otherwise dominate the measurement
+        logging.getLogger().setLevel(log_level.upper())
+
+        self.fakes = FakeUpstreams(profiles, make_canvas(1024, 768, 400))
+        self.fakes.install()
+        self.lag = LoopLagMonitor()
+        self.server = ServerThread(create_app(), self.lag)
+        self.base_url = f"http://127.0.0.1:{self.server.port}"
+
+    def seed(
+        self, users: int, projects_per_user: int, pairs_per_project: int
+    ) -> Tuple[List[str], List[str]]:
+        """Seed the fake Supabase; returns the user IDs and project IDs."""
+        return self.fakes.supabase.seed(
+            users, projects_per_user, pairs_per_project, self.fakes.image_url
+        )
+
+    def start(self) -> None:
+        self.server.start()
+        self.server.wait_started()
+
+    def stats(self) -> Dict[str, Any]:
+        """The app's /stats, with the fakes' call counts."""
+        return {
+            "server": httpx.get(f"{self.base_url}/stats", timeout=30).json(),
+            "upstreams": self.fakes.stats(),
+        }
+
+    def stop(self) -> None:
+        self.server.stop()
+        self.fakes.close()
+        self._outbox_dir.cleanup()
+
+
+def parse_profiles(specs: List[str], seed: int) -> Dict[str, LatencyProfile]:
+    """
+    The default upstream profiles, overridden by "UPSTREAM=MEDIAN,P99[,...]" specs.
+
+    Raises:
+        ValueError: If an upstream name or profile is invalid
+    """
+    profiles = default_profiles(seed)
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in profiles:
+            raise ValueError(
+                f"Unknown upstream {name!r}; expected one of {list(profiles)}"
+            )
+        profiles[name] = LatencyProfile.parse(values, seed=seed)
+    return profiles
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], duration_seconds: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (in milliseconds) of a set of requests."""
+    values = sorted(latencies)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(values),
+        "throughput_rps": round(len(values) / duration_seconds, 2),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 0.50)),
+        "p95_ms": ms(percentile(values, 0.95)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse endpoint weights such as "generate=1,projects=4,image-pairs=4"."""
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(
+                f"Unknown endpoint {name!r}; expected one of {list(ENDPOINTS)}"
+            )
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """Builds the requests sent to each endpoint from the seeded data."""
+
+    def __init__(
+        self,
+        user_ids: List[str],
+        project_ids: List[str],
+        canvases: List[str],
+        clients: int,
+        distinct_prompts: int,
+        page_size: int,
+    ):
+        self.user_ids = user_ids
+        self.project_ids = project_ids
+        self.canvases = canvases
+        self.clients = clients
+        self.distinct_prompts = distinct_prompts
+        self.page_size = page_size
+
+    def _headers(self, rng: random.Random) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer benchmark-client-{rng.randrange(self.clients)}"
+        }
+
+    def generate(self, rng: random.Random, index: int) -> RequestSpec:
+        # Unique prompts miss the generation cache; a small pool exercises the cache
+        # and the coalescing of identical in-flight generations instead
+        prompt_index = index % self.distinct_prompts if self.distinct_prompts else index
+        body = {
+            "prompt": f"A cat riding a bicycle, variation {prompt_index}",
+            "project_id": rng.choice(self.project_ids),
+            "type": "generate",
+            "image_data": self.canvases[prompt_index % len(self.canvases)],
+        }
+        return (
+            "POST",
+            "/api/generate-image",
+            {"json": body, "headers": self._headers(rng)},
+        )
+
+    def projects(self, rng: random.Random, index: int) -> RequestSpec:
+        user_id = rng.choice(self.user_ids)
+        return (
+            "GET",
+            f"/api/projects/{user_id}",
+            {"params": {"limit": self.page_size}, "headers": self._headers(rng)},
+        )
+
+    def image_pairs(self, rng: random.Random, index: int) -> RequestSpec:
+        project_id = rng.choice(self.project_ids)
+        return (
+            "GET",
+            f"/api/image-pairs/{project_id}",
+            {"params": {"limit": self.page_size}, "headers": self._headers(rng)},
+        )
+
+
+ENDPOINTS: Dict[str, Callable[[Workload, random.Random, int], RequestSpec]] = {
+    "generate": Workload.generate,
+    "projects": Workload.projects,
+    "image-pairs": Workload.image_pairs,
+}
+
+
+async def drive(
+    base_url: str,
+    workload: Workload,
+    mix: Dict[str, float],
+    concurrency: int,
+    warmup_seconds: float,
+    duration_seconds: float,
+    timeout_seconds: float,
+    lag: LoopLagMonitor,
+    seed: int,
+) -> Tuple[Dict[str, List[float]], Dict[str, Dict[str, int]]]:
+    """
+    Keep concurrency requests in flight until the warm-up and the measured window end.
+
+    Only requests that start inside the measured window are recorded.
+
+    Returns:
+        Latencies of successful requests and status counts, both per endpoint
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    counter = itertools.count()
+
+    start = time.perf_counter()
+    measure_from = start + warmup_seconds
+    end = measure_from + duration_seconds
+
+    async def worker(client: httpx.AsyncClient, worker_index: int) -> None:
+        rng = random.Random(seed * 100003 + worker_index)
+        while (started := time.perf_counter()) < end:
+            name = rng.choices(names, weights)[0]
+            method, path, options = ENDPOINTS[name](workload, rng, next(counter))
+            try:
+                response = await client.request(method, path, **options)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if started < measure_from:
+                continue
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+            if status.startswith("2") or status == "304":
+                latencies[name].append(elapsed)
+
+    async def record_lag() -> None:
+        await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+        lag.recording = True
+        await asyncio.sleep(max(0.0, end - time.perf_counter()))
+        lag.recording = False
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout_seconds
+    ) as client:
+        await asyncio.gather(
+            record_lag(), *(worker(client, index) for index in range(concurrency))
+        )
+    return latencies, statuses
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_info(args: argparse.Namespace, profiles: Dict[str, LatencyProfile]) -> dict:
+    """The commit, environment and configuration a result was measured with."""
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            **{key: value for key, value in vars(args).items() if key != "profile"},
+            "profiles": {
+                name: {
+                    key: value
+                    for key, value in profile.stats().items()
+                    if key not in ("calls", "failures")
+                }
+                for name, profile in profiles.items()
+            },
+        },
+    }
+
+
+def lag_summary(samples: List[float]) -> Dict[str, Any]:
+    values = sorted(samples)
+    return {
+        "samples": len(values),
+        "p50": round((percentile(values, 0.50) or 0) * 1000, 2),
+        "p99": round((percentile(values, 0.99) or 0) * 1000, 2),
+        "max": round((values[-1] if values else 0) * 1000, 2),
+    }
+
+
+def print_lag(lag_ms: Dict[str, Any]) -> None:
+    print(
+        f"  event loop: lag p50 {lag_ms['p50']} ms, p99 {lag_ms['p99']} ms, "
+        f"max {lag_ms['max']} ms"
+    )
+
+
+def write_results(results: Dict[str, Any], prefix: str, output: Optional[str]) -> Path:
+    """Write a result file, by default under benchmarks/results/, and return its path."""
+    if output:
+        path = Path(output)
+    else:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = RESULTS_DIR / f"{prefix}-{results['commit'] or 'unknown'}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, default=str))
+    print(f"Results written to {path}")
+    return path
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change in throughput and tail latency against an earlier run."""
+    print(
+        f"\nAgainst {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):"
+    )
+    for name, current in {
+        **results["endpoints"],
+        "overall": results["overall"],
+    }.items():
+        before = (
+            baseline["endpoints"].get(name)
+            if name != "overall"
+            else baseline["overall"]
+        )
+        if not before:
+            continue
+        changes = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if current.get(key) and before.get(key):
+                change = (current[key] / before[key] - 1) * 100
+                changes.append(
+                    f"{key} {before[key]} -> {current[key]} ({change:+.1f}%)"
+                )
+        print(f"{name:>12}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument(
+        "--warmup", type=float, default=3, help="Unmeasured seconds first"
+    )
+    parser.add_argument(
+        "--mix",
+        default="generate=1,projects=4,image-pairs=4",
+        help="Relative weights of the endpoints",
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=MEDIAN,P99[,ERROR_RATE[,STATUS]]",
+        help="Latency (seconds) and errors of gemini, fal, openai or supabase; repeatable",
+    )
+    parser.add_argument("--clients", type=int, default=100, help="Distinct auth tokens")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--projects-per-user", type=int, default=25)
+    parser.add_argument("--pairs-per-project", type=int, default=40)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument(
+        "--distinct-prompts",
+        type=int,
+        default=0,
+        help="Reuse this many prompts (0: every generation is unique)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=180, help="Per-request timeout"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="warning", help="App log level")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        profiles = parse_profiles(args.profile, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    backend = BenchmarkServer(profiles, LOAD_ENV, args.log_level)
+    user_ids, project_ids = backend.seed(
+        args.users, args.projects_per_user, args.pairs_per_project
+    )
+    canvases = [
+        base64.b64encode(make_canvas(1024, 768, 100 + variant)).decode("utf-8")
+        for variant in range(8)
+    ]
+    workload = Workload(
+        user_ids,
+        project_ids,
+        canvases,
+        clients=args.clients,
+        distinct_prompts=args.distinct_prompts,
+        page_size=args.page_size,
+    )
+
+    backend.start()
+    print(
+        f"Driving {backend.base_url} at concurrency {args.concurrency} for "
+        f"{args.warmup:g}s warm-up + {args.duration:g}s ({args.mix})"
+    )
+    try:
+        latencies, statuses = asyncio.run(
+            drive(
+                backend.base_url,
+                workload,
+                mix,
+                concurrency=args.concurrency,
+                warmup_seconds=args.warmup,
+                duration_seconds=args.duration,
+                timeout_seconds=args.timeout,
+                lag=backend.lag,
+                seed=args.seed,
+            )
+        )
+        stats = backend.stats()
+    finally:
+        backend.stop()
+
+    results = {
+        **run_info(args, profiles),
+        "duration_seconds": args.duration,
+        "endpoints": {
+            name: {
+                **summarize(latencies[name], args.duration),
+                "statuses": statuses[name],
+            }
+            for name in mix
+        },
+        "overall": summarize(
+            [value for values in latencies.values() for value in values], args.duration
+        ),
+        "event_loop_lag_ms": lag_summary(backend.lag.samples),
+        "upstreams": stats["upstreams"],
+        "server_stats": stats["server"],
+    }
+
+    for name, summary in {
+        **results["endpoints"],
+        "overall": results["overall"],
+    }.items():
+        print(
+            f"{name:>12}: {summary['requests']} ok, {summary['throughput_rps']} req/s, "
+            f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+            f"p99 {summary['p99_ms']} ms"
+            + (f", statuses {summary['statuses']}" if "statuses" in summary else "")
+        )
+    print_lag(results["event_loop_lag_ms"])
+    write_results(results, "load", args.output)
+    if args.baseline:
+        compare(results, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+Replay a recorded request trace against the app with faked upstreams.
+
+Reads a trace written with TRACE_FILE, starts the app exactly like benchmarks.load (all
+upstreams faked, served by uvicorn on a background thread) and re-sends every request at
+its recorded arrival time: bursts, silences and generate/edit chains keep their shape.
+Requests are synthesised from the recorded shapes, so identical hashed prompts, canvases,
+sessions and clients stay identical and the cache, coalescing, supersession and fair
+queuing see the same pattern. Upstream latencies are drawn from the stage timings in the
+trace. The app runs with the current environment, so setting e.g. GEMINI_MAX_CONCURRENCY
+shows how latency and queueing would change under that configuration.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.replay traces/classroom.jsonl
+    GEMINI_MAX_CONCURRENCY=8 poetry run python -m benchmarks.replay traces/classroom.jsonl \\
+        --baseline benchmarks/results/<earlier replay>.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import EmpiricalProfile, LatencyProfile
+from benchmarks.image_payload import make_canvas
+from benchmarks.load import (
+    FAKES_ENV,
+    BenchmarkServer,
+    RequestSpec,
+    compare,
+    lag_summary,
+    parse_profiles,
+    percentile,
+    print_lag,
+    run_info,
+    summarize,
+    write_results,
+)
+
+GENERATION_ROUTES = (
+    "/api/generate-image",
+    "/api/generate-image/binary",
+    "/api/generate-image/stream",
+)
+
+# Stages whose recorded durations are upstream latencies, per faked upstream
+UPSTREAM_STAGES = {
+    "gemini": ("model_call",),
+    "fal": ("fal_generate", "fal_remove_background"),
+    "openai": ("openai_call",),
+    "supabase": ("db_query", "storage_request"),
+}
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Read a trace file, ordered by arrival time."""
+    with open(path) as trace:
+        entries = [json.loads(line) for line in trace if line.strip()]
+    return sorted(entries, key=lambda entry: entry["ts"])
+
+
+def recorded_profiles(
+    entries: List[Dict[str, Any]], seed: int
+) -> Dict[str, LatencyProfile]:
+    """
+    Profiles for the upstreams seen in the trace, drawing from their recorded latencies.
+
+    A stage that ran several times in one request contributes its mean duration once
+    per run. Upstreams only called outside requests (e.g. by the outbox worker) have
+    no samples and are left out.
+    """
+    profiles: Dict[str, LatencyProfile] = {}
+    for upstream, stages in UPSTREAM_STAGES.items():
+        samples = []
+        for entry in entries:
+            for stage in stages:
+                seconds, count = entry.get("stages", {}).get(stage, (0, 0))
+                if count:
+                    samples += [seconds / count] * count
+        if samples:
+            profiles[upstream] = EmpiricalProfile(samples, seed=seed)
+    return profiles
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Stage durations in milliseconds from a Server-Timing header."""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, *params = entry.strip().split(";")
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+class ReplayPlan:
+    """
+    Turns trace entries back into requests against the seeded fakes.
+
+    Hashed values map to stand-ins that are equal exactly when the originals were:
+    users and projects to seeded rows, prompts to text of the recorded length,
+    canvases to generated images of the recorded size.
+    """
+
+    def __init__(
+        self,
+        user_ids: List[str],
+        project_ids: List[str],
+        max_canvases: int,
+    ):
+        self.user_ids = user_ids
+        self.project_ids = project_ids
+        self.max_canvases = max_canvases
+        self._users: Dict[str, str] = {}
+        self._projects: Dict[str, str] = {}
+        self._canvases: Dict[str, bytes] = {}
+
+    def _assign(self, mapping: Dict[str, str], pool: List[str], key: str) -> str:
+        if key not in mapping:
+            mapping[key] = pool[len(mapping) % len(pool)]
+        return mapping[key]
+
+    def user(self, key: str) -> str:
+        return self._assign(self._users, self.user_ids, key)
+
+    def project(self, key: Optional[str]) -> str:
+        return self._assign(self._projects, self.project_ids, key or "")
+
+    def prompt(self, key: Optional[str], length: int) -> str:
+        text = f"Replayed prompt {key} "
+        return (text * (length // len(text) + 1))[: max(length, len(text))]
+
+    def canvas(self, generation: Dict[str, Any]) -> bytes:
+        """The stand-in for a recorded canvas; distinct canvases are capped and reused."""
+        key = generation["image"]
+        if key not in self._canvases:
+            if len(self._canvases) >= self.max_canvases:
+                reused = list(self._canvases.values())
+                return reused[len(key) % len(reused)]
+            self._canvases[key] = make_canvas(
+                generation.get("image_width") or 1024,
+                generation.get("image_height") or 768,
+                strokes=100 + len(self._canvases),
+            )
+        return self._canvases[key]
+
+    def request(self, entry: Dict[str, Any]) -> Optional[RequestSpec]:
+        """The request to send for a trace entry, or None if it cannot be replayed."""
+        route = entry.get("route")
+        params = entry.get("params", {})
+        query = {
+            name: value
+            for name, value in entry.get("query", {}).items()
+            if name in ("limit", "fields")
+        }
+        headers = {}
+        if entry.get("client"):
+            headers["Authorization"] = f"Bearer replay-{entry['client']}"
+        if entry.get("accept"):
+            headers["Accept"] = entry["accept"]
+        if entry.get("max_age"):
+            headers["X-Request-Max-Age"] = entry["max_age"]
+
+        if route in GENERATION_ROUTES:
+            generation = entry.get("generation")
+            if generation is None:
+                # Rejected before the body was read, e.g. a malformed request
+                return None
+            fields = {
+                "prompt": self.prompt(
+                    generation["prompt"], generation.get("prompt_length", 0)
+                ),
+                "project_id": self.project(generation.get("project")),
+                "type": generation.get("type", "generate"),
+                "use_cache": generation.get("use_cache", True),
+            }
+            if generation.get("session"):
+                fields["session_id"] = f"replay-{generation['session']}"
+                fields["sequence"] = generation.get("sequence")
+            canvas = self.canvas(generation) if generation.get("image") else None
+            if route.endswith("/binary"):
+                fields = {
+                    name: value for name, value in fields.items() if value is not None
+                }
+                headers["Content-Type"] = "image/png"
+                return (
+                    "POST",
+                    route,
+                    {"params": fields, "content": canvas or b"", "headers": headers},
+                )
+            if canvas:
+                fields["image_data"] = base64.b64encode(canvas).decode("utf-8")
+            return "POST", route, {"json": fields, "headers": headers}
+
+        if route == "/api/projects/{user_id}":
+            path = f"/api/projects/{self.user(params['user_id'])}"
+            return "GET", path, {"params": query, "headers": headers}
+        if route == "/api/image-pairs/{project_id}":
+            path = f"/api/image-pairs/{self.project(params['project_id'])}"
+            return "GET", path, {"params": query, "headers": headers}
+        if route and entry["method"] == "GET" and "{" not in route:
+            return "GET", route, {"params": query, "headers": headers}
+        return None
+
+
+def schedule(
+    entries: List[Dict[str, Any]], speed: float, max_gap: Optional[float]
+) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yield (seconds from start, entry), sped up and with long silences shortened."""
+    offset = 0.0
+    previous = entries[0]["ts"] if entries else 0.0
+    for entry in entries:
+        gap = entry["ts"] - previous
+        previous = entry["ts"]
+        if max_gap is not None:
+            gap = min(gap, max_gap)
+        offset += gap / speed
+        yield offset, entry
+
+
+async def replay(
+    base_url: str,
+    planned: List[Tuple[float, Dict[str, Any], RequestSpec]],
+    timeout_seconds: float,
+) -> List[Dict[str, Any]]:
+    """
+    Send every request at its scheduled time, without waiting for earlier responses.
+
+    Returns:
+        Per request: the route, status, latency in seconds and Server-Timing stages
+    """
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout_seconds
+    ) as client:
+
+        async def send(entry: Dict[str, Any], spec: RequestSpec) -> Dict[str, Any]:
+            method, path, options = spec
+            start = time.perf_counter()
+            stages: Dict[str, float] = {}
+            try:
+                response = await client.request(method, path, **options)
+                status = str(response.status_code)
+                stages = parse_server_timing(response.headers.get("server-timing"))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            return {
+                "route": entry["route"],
+                "status": status,
+                "seconds": time.perf_counter() - start,
+                "stages": stages,
+            }
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = []
+        for offset, entry, spec in planned:
+            await asyncio.sleep(max(0.0, start + offset - loop.time()))
+            tasks.append(asyncio.create_task(send(entry, spec)))
+        return await asyncio.gather(*tasks)
+
+
+def route_summary(
+    latencies: List[float],
+    statuses: List[str],
+    queue_waits: List[float],
+    duration_seconds: float,
+) -> Dict[str, Any]:
+    """Latency of successful requests, status counts and Gemini queue wait."""
+    counts: Dict[str, int] = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    waits = sorted(queue_waits)
+    return {
+        **summarize(latencies, duration_seconds),
+        "statuses": counts,
+        "queue_wait_ms": (
+            {
+                "p50": percentile(waits, 0.50),
+                "p95": percentile(waits, 0.95),
+                "p99": percentile(waits, 0.99),
+            }
+            if waits
+            else None
+        ),
+    }
+
+
+def summarize_routes(
+    rows: List[Tuple[str, str, float, Optional[float]]], duration_seconds: float
+) -> Dict[str, Dict[str, Any]]:
+    """Summaries per route of (route, status, seconds, queue wait in ms) rows."""
+    by_route: Dict[str, List[Tuple[str, float, Optional[float]]]] = {}
+    for route, status, seconds, queue_wait in rows:
+        by_route.setdefault(route, []).append((status, seconds, queue_wait))
+    return {
+        route: route_summary(
+            [
+                seconds
+                for status, seconds, _ in items
+                if status[0] == "2" or status == "304"
+            ],
+            [status for status, _, _ in items],
+            [wait for _, _, wait in items if wait is not None],
+            duration_seconds,
+        )
+        for route, items in by_route.items()
+    }
+
+
+def queue_wait(route: str, stages: Dict[str, float]) -> Optional[float]:
+    """Milliseconds a generation waited for a Gemini slot; None if not measurable."""
+    # Streams send their headers before queueing, so the wait is not in Server-Timing
+    if route not in GENERATION_ROUTES or route.endswith("/stream"):
+        return None
+    return stages.get("model_queue", 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace", help="Trace file recorded with TRACE_FILE")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Replay this many times faster"
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        default=None,
+        help="Shorten silences between requests to at most this many seconds",
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=MEDIAN,P99[,ERROR_RATE[,STATUS]]",
+        help="Override an upstream instead of using the recorded latencies",
+    )
+    parser.add_argument("--projects-per-user", type=int, default=25)
+    parser.add_argument("--pairs-per-project", type=int, default=40)
+    parser.add_argument(
+        "--max-canvases",
+        type=int,
+        default=64,
+        help="Distinct canvases to generate; further ones are reused",
+    )
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="warning", help="App log level")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier replay result to compare against")
+    args = parser.parse_args()
+
+    entries = load_trace(args.trace)
+    if not entries:
+        parser.error(f"No requests in {args.trace}")
+    try:
+        profiles = parse_profiles(args.profile, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    # Explicit --profile overrides win over the recorded latencies
+    overridden = {spec.partition("=")[0] for spec in args.profile}
+    profiles.update(
+        {
+            name: profile
+            for name, profile in recorded_profiles(entries, args.seed).items()
+            if name not in overridden
+        }
+    )
+
+    backend = BenchmarkServer(profiles, FAKES_ENV, args.log_level)
+    users = {
+        entry["params"]["user_id"]
+        for entry in entries
+        if "user_id" in entry.get("params", {})
+    }
+    user_ids, project_ids = backend.seed(
+        max(1, len(users)), args.projects_per_user, args.pairs_per_project
+    )
+    plan = ReplayPlan(user_ids, project_ids, args.max_canvases)
+
+    # Build every request up front, so canvases are not rendered during the replay
+    planned = []
+    skipped: Dict[str, int] = {}
+    for offset, entry in schedule(entries, args.speed, args.max_gap):
+        spec = plan.request(entry)
+        if spec is None:
+            key = f"{entry['method']} {entry.get('route')}"
+            skipped[key] = skipped.get(key, 0) + 1
+        else:
+            planned.append((offset, entry, spec))
+    if not planned:
+        parser.error("None of the recorded requests can be replayed")
+    recorded_span = (entries[-1]["ts"] - entries[0]["ts"]) or 1.0
+    replay_span = planned[-1][0] or 1.0
+
+    backend.start()
+    print(
+        f"Replaying {len(planned)} requests over {replay_span:.1f}s against "
+        f"{backend.base_url} ({len(entries)} recorded over {recorded_span:.1f}s)"
+    )
+    backend.lag.recording = True
+    try:
+        started = time.perf_counter()
+        responses = asyncio.run(replay(backend.base_url, planned, args.timeout))
+        elapsed = time.perf_counter() - started
+        backend.lag.recording = False
+        stats = backend.stats()
+    finally:
+        backend.stop()
+
+    replayed_entries = [entry for _, entry, _ in planned]
+    recorded = summarize_routes(
+        [
+            (
+                entry["route"],
+                str(entry["status"]),
+                entry["duration_seconds"],
+                queue_wait(
+                    entry["route"],
+                    {
+                        stage: seconds * 1000
+                        for stage, (seconds, _) in entry.get("stages", {}).items()
+                    },
+                ),
+            )
+            for entry in replayed_entries
+        ],
+        recorded_span / args.speed,
+    )
+    replayed = summarize_routes(
+        [
+            (
+                response["route"],
+                response["status"],
+                response["seconds"],
+                queue_wait(response["route"], response["stages"]),
+            )
+            for response in responses
+        ],
+        elapsed,
+    )
+    results = {
+        **run_info(args, profiles),
+        "trace": {
+            "path": args.trace,
+            "requests": len(entries),
+            "replayed": len(planned),
+            "skipped": skipped,
+            "recorded_seconds": round(recorded_span, 3),
+        },
+        "duration_seconds": round(elapsed, 3),
+        "endpoints": replayed,
+        "recorded": recorded,
+        "overall": summarize(
+            [
+                response["seconds"]
+                for response in responses
+                if response["status"][0] == "2" or response["status"] == "304"
+            ],
+            elapsed,
+        ),
+        "event_loop_lag_ms": lag_summary(backend.lag.samples),
+        "upstreams": stats["upstreams"],
+        "server_stats": stats["server"],
+    }
+
+    def percentiles(summary: Optional[Dict[str, Any]], unit: str = "_ms") -> str:
+        if not summary:
+            return "-"
+        return "/".join(str(summary.get(f"p{p}{unit}")) for p in (50, 95, 99))
+
+    print("p50/p95/p99 ms, recorded -> replayed:")
+    for route, summary in replayed.items():
+        before = recorded.get(route, {})
+        line = f"{route}: latency {percentiles(before)} -> {percentiles(summary)}"
+        if summary["queue_wait_ms"] is not None:
+            line += (
+                f", queue wait {percentiles(before.get('queue_wait_ms'), '')}"
+                f" -> {percentiles(summary['queue_wait_ms'], '')}"
+            )
+        print(f"  {line}, statuses {before.get('statuses')} -> {summary['statuses']}")
+    if skipped:
+        print(f"  not replayable: {skipped}")
+    print_lag(results["event_loop_lag_ms"])
+    write_results(results, "replay", args.output)
+    if args.baseline:
+        compare(results, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
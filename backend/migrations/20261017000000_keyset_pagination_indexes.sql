@@ -0,0 +1,8 @@
+-- Indexes matching the keyset pagination order of the list endpoints, so that each
+-- page is a range scan from the cursor instead of a sort of every row.
+
+create index if not exists image_pairs_project_id_created_at_id_idx
+    on public.image_pairs (project_id, created_at desc, id desc);
+
+create index if not exists projects_user_id_updated_at_id_idx
+    on public.projects (user_id, updated_at desc, id desc);
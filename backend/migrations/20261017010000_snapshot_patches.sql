@@ -0,0 +1,51 @@
+-- Versioned snapshots, so that canvas autosave can send only the records that changed
+-- since the version it last saw (PATCH /api/projects/{project_id}/snapshot).
+
+alter table public.projects
+    add column if not exists snapshot_version integer not null default 0;
+
+-- Every write to the snapshot bumps its version, whether it is a patch or a full PUT
+create or replace function public.bump_snapshot_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.snapshot_version := old.snapshot_version + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists projects_bump_snapshot_version on public.projects;
+create trigger projects_bump_snapshot_version
+    before update of snapshot on public.projects
+    for each row execute function public.bump_snapshot_version();
+
+-- Apply a record-level patch to a tldraw document snapshot ({"store": {...}, "schema": {...}})
+-- if it is still at p_base_version. Returns no row when the version has moved on or the
+-- project does not exist, so the caller can tell a conflict from success without a race.
+create or replace function public.apply_snapshot_patch(
+    p_project_id uuid,
+    p_user_id uuid,
+    p_base_version integer,
+    p_put jsonb,
+    p_remove text[],
+    p_schema jsonb default null
+)
+returns table (snapshot_version integer, updated_at timestamptz)
+language sql
+as $$
+    update public.projects as p
+    set snapshot = coalesce(p.snapshot, '{}'::jsonb)
+            || jsonb_build_object(
+                'store', (coalesce(p.snapshot -> 'store', '{}'::jsonb) - p_remove) || p_put
+            )
+            || case
+                when p_schema is null then '{}'::jsonb
+                else jsonb_build_object('schema', p_schema)
+            end,
+        updated_at = now()
+    where p.id = p_project_id
+        and p.user_id = p_user_id
+        and p.snapshot_version = p_base_version
+    returning p.snapshot_version, p.updated_at;
+$$;
@@ -0,0 +1,40 @@
+-- Large snapshots are kept compressed in object storage under a content hash. The row
+-- then holds a pointer instead of the document, so reading it stays cheap.
+
+alter table public.projects
+    add column if not exists snapshot_ref text,
+    add column if not exists snapshot_size integer;
+
+-- Offloaded snapshots are patched by the API, which loads, patches and stores them again;
+-- merging records into the row would mix an inline store with the offloaded document.
+-- The function also reports the patched snapshot's size, so the API can offload
+-- snapshots once they grow past its threshold.
+drop function if exists public.apply_snapshot_patch(uuid, uuid, integer, jsonb, text[], jsonb);
+
+create function public.apply_snapshot_patch(
+    p_project_id uuid,
+    p_user_id uuid,
+    p_base_version integer,
+    p_put jsonb,
+    p_remove text[],
+    p_schema jsonb default null
+)
+returns table (snapshot_version integer, updated_at timestamptz, snapshot_size integer)
+language sql
+as $$
+    update public.projects as p
+    set snapshot = coalesce(p.snapshot, '{}'::jsonb)
+            || jsonb_build_object(
+                'store', (coalesce(p.snapshot -> 'store', '{}'::jsonb) - p_remove) || p_put
+            )
+            || case
+                when p_schema is null then '{}'::jsonb
+                else jsonb_build_object('schema', p_schema)
+            end,
+        updated_at = now()
+    where p.id = p_project_id
+        and p.user_id = p_user_id
+        and p.snapshot_version = p_base_version
+        and p.snapshot_ref is null
+    returning p.snapshot_version, p.updated_at, octet_length(p.snapshot::text);
+$$;
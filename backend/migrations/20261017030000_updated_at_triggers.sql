@@ -0,0 +1,24 @@
+-- Keep updated_at current on every write, not just the ones that set it explicitly.
+-- The listing ETags (row count plus newest updated_at) and the keyset order of the
+-- project listing both rely on it, so a rename, description edit or new icon must
+-- move it too.
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists projects_set_updated_at on public.projects;
+create trigger projects_set_updated_at
+    before update on public.projects
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists image_pairs_set_updated_at on public.image_pairs;
+create trigger image_pairs_set_updated_at
+    before update on public.image_pairs
+    for each row execute function public.set_updated_at();
@@ -1,5 +1,7 @@
 'use client';
 
+import { ListOptions, listQuery } from '@/actions/projects';
+
 export interface ImagePair {
   id: string;
   project_id: string;
@@ -19,11 +21,15 @@ export interface ImagePair {
 
 export interface ImagePairsResponse {
   image_pairs: ImagePair[];
+  next_cursor?: string | null;
 }
 
-export async function fetchImagePairs(projectId: string): Promise<ImagePairsResponse> {
+export async function fetchImagePairs(
+  projectId: string,
+  options: ListOptions = {},
+): Promise<ImagePairsResponse> {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
-  const response = await fetch(`${apiUrl}/api/image-pairs/${projectId}`, {
+  const response = await fetch(`${apiUrl}/api/image-pairs/${projectId}${listQuery(options)}`, {
     method: 'GET',
     headers: {
       'Content-Type': 'application/json',
@@ -5,6 +5,9 @@ export interface GenerateImageRequest {
   image_data?: string | null;
   project_id: string;
   type: 'generate' | 'edit';
+  use_cache?: boolean;
+  session_id?: string;
+  sequence?: number;
 }
 
 export interface GenerateImageResponse {
@@ -12,16 +15,44 @@ export interface GenerateImageResponse {
   text_response?: string;
 }
 
-export async function generateImage(request: GenerateImageRequest): Promise<GenerateImageResponse> {
+export interface GenerateImageOptions {
+  // Seconds after which the result is no longer wanted; the backend drops it after that
+  maxAgeSeconds?: number;
+}
+
+// Thrown when a newer request from the same session replaced this one (HTTP 409)
+export class GenerationSupersededError extends Error {}
+
+// Thrown when the request's max age passed before the image was ready (HTTP 503)
+export class GenerationExpiredError extends Error {}
+
+export async function generateImage(
+  request: GenerateImageRequest,
+  options: GenerateImageOptions = {},
+): Promise<GenerateImageResponse> {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
+  const headers: Record<string, string> = {
+    'Content-Type': 'application/json',
+  };
+  if (options.maxAgeSeconds !== undefined) {
+    headers['X-Request-Max-Age'] = String(options.maxAgeSeconds);
+  }
   const response = await fetch(`${apiUrl}/api/generate-image`, {
     method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
+    headers,
     body: JSON.stringify(request),
   });
 
+  if (response.status === 409) {
+    const errorData = await response.json();
+    throw new GenerationSupersededError(errorData.detail);
+  }
+
+  if (response.status === 503 && response.headers.has('X-Deadline-Exceeded')) {
+    const errorData = await response.json();
+    throw new GenerationExpiredError(errorData.detail);
+  }
+
   if (!response.ok) {
     const errorData = await response.json();
     throw new Error(errorData.detail || 'Failed to generate image');
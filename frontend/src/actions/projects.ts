@@ -1,20 +1,63 @@
 'use client';
 
+import { jsonRequestBody } from '@/lib/compression';
+
 export const DEFAULT_USER_ID = '1824ad37-303d-4505-b210-d294295d1f95';
 
-export interface Project {
+export interface ProjectSummary {
   id: string;
   user_id: string;
   name: string;
   description?: string;
   icon_url?: string;
-  snapshot?: Record<string, unknown>;
   created_at: string;
   updated_at: string;
 }
 
+export interface Project extends ProjectSummary {
+  snapshot?: Record<string, unknown>;
+  snapshot_version?: number | null;
+}
+
+export interface ProjectSnapshot {
+  project_id: string;
+  snapshot?: Record<string, unknown> | null;
+  snapshot_version: number;
+  updated_at: string;
+}
+
+export interface SnapshotPatch {
+  base_version: number;
+  put: Record<string, unknown>;
+  remove: string[];
+  schema?: unknown;
+}
+
+export interface SnapshotPatchResponse {
+  project_id: string;
+  snapshot_version: number;
+  updated_at: string;
+  rebased: boolean;
+}
+
 export interface ProjectsResponse {
-  projects: Project[];
+  projects: ProjectSummary[];
+  next_cursor?: string | null;
+}
+
+export interface ListOptions {
+  cursor?: string | null;
+  limit?: number;
+  fields?: string[];
+}
+
+export function listQuery({ cursor, limit, fields }: ListOptions = {}): string {
+  const params = new URLSearchParams();
+  if (cursor) params.set('cursor', cursor);
+  if (limit) params.set('limit', String(limit));
+  if (fields?.length) params.set('fields', fields.join(','));
+  const query = params.toString();
+  return query ? `?${query}` : '';
 }
 
 export interface CreateProjectRequest {
@@ -30,9 +73,12 @@ export interface UpdateProjectRequest {
   snapshot?: Record<string, unknown>;
 }
 
-export async function fetchProjects(userId: string): Promise<ProjectsResponse> {
+export async function fetchProjects(
+  userId: string,
+  options: ListOptions = {},
+): Promise<ProjectsResponse> {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
-  const response = await fetch(`${apiUrl}/api/projects/${userId}`, {
+  const response = await fetch(`${apiUrl}/api/projects/${userId}${listQuery(options)}`, {
     method: 'GET',
     headers: {
       'Content-Type': 'application/json',
@@ -47,6 +93,23 @@ export async function fetchProjects(userId: string): Promise<ProjectsResponse> {
   return response.json();
 }
 
+export async function fetchProjectSnapshot(projectId: string): Promise<ProjectSnapshot> {
+  const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
+  const response = await fetch(`${apiUrl}/api/projects/${projectId}/snapshot`, {
+    method: 'GET',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || 'Failed to fetch project snapshot');
+  }
+
+  return response.json();
+}
+
 export async function createProject(projectData: CreateProjectRequest): Promise<Project> {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
   const response = await fetch(`${apiUrl}/api/projects`, {
@@ -71,12 +134,12 @@ export async function updateProject(
   projectData: UpdateProjectRequest,
 ): Promise<Project> {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
+  // Snapshots can be large, so send them compressed
+  const { body, headers } = await jsonRequestBody(projectData);
   const response = await fetch(`${apiUrl}/api/projects/${projectId}?user_id=${userId}`, {
     method: 'PUT',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify(projectData),
+    headers,
+    body,
   });
 
   if (!response.ok) {
@@ -86,3 +149,26 @@ export async function updateProject(
 
   return response.json();
 }
+
+export async function patchProjectSnapshot(
+  projectId: string,
+  userId: string,
+  patch: SnapshotPatch,
+): Promise<SnapshotPatchResponse> {
+  const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
+  const { body, headers } = await jsonRequestBody(patch);
+  const response = await fetch(`${apiUrl}/api/projects/${projectId}/snapshot?user_id=${userId}`, {
+    method: 'PATCH',
+    headers,
+    body,
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(
+      errorData.detail?.message || errorData.detail || 'Failed to patch project snapshot',
+    );
+  }
+
+  return response.json();
+}
@@ -8,6 +8,7 @@ import { useImagePairs } from '@/hooks/useImagePairs';
 import { useProject } from '@/hooks/useProject';
 
 import { ImagePairCard } from '@/components/projects/image-pair-card';
+import { Button } from '@/components/ui/button';
 
 export default function ProjectDetailPage() {
   const params = useParams();
@@ -23,7 +24,11 @@ export default function ProjectDetailPage() {
     data: imagePairsData,
     isLoading: isLoadingImagePairs,
     error: imagePairsError,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
   } = useImagePairs(projectId);
+  const imagePairs = imagePairsData?.pages.flatMap((page) => page.image_pairs);
 
   const isLoading = isLoadingProject || isLoadingImagePairs;
   const error = projectError || imagePairsError;
@@ -96,21 +101,34 @@ export default function ProjectDetailPage() {
       {error && <p className="text-red-600">Error: {error.message}</p>}
 
       {/* Generations Section */}
-      {imagePairsData && (
+      {imagePairs && (
         <div>
           <h2 className="mb-4 text-xl font-semibold text-gray-800">
-            Generations ({imagePairsData.image_pairs.length})
+            Generations ({imagePairs.length}
+            {hasNextPage && '+'})
           </h2>
 
-          {imagePairsData.image_pairs.length === 0 ? (
+          {imagePairs.length === 0 ? (
             <p className="text-gray-600">No generations found for this project.</p>
           ) : (
             <div className="grid grid-cols-1 gap-4 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4">
-              {imagePairsData.image_pairs.map((imagePair) => (
+              {imagePairs.map((imagePair) => (
                 <ImagePairCard key={imagePair.id} imagePair={imagePair} />
               ))}
             </div>
           )}
+
+          {hasNextPage && (
+            <div className="mt-6 flex justify-center">
+              <Button
+                variant="outline"
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+              >
+                {isFetchingNextPage ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>
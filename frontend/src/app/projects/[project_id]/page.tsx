@@ -4,9 +4,14 @@ import { useParams } from 'next/navigation';
 
 import { useCallback, useEffect, useRef, useState } from 'react';
 
-import { generateImage } from '@/actions/image';
-import { DEFAULT_USER_ID, updateProject } from '@/actions/projects';
+import {
+  GenerationExpiredError,
+  GenerationSupersededError,
+  generateImage,
+} from '@/actions/image';
+import { DEFAULT_USER_ID, patchProjectSnapshot, updateProject } from '@/actions/projects';
 import { useProject } from '@/hooks/useProject';
+import { useProjectSnapshot } from '@/hooks/useProjectSnapshot';
 import { useQueryClient } from '@tanstack/react-query';
 import { Tldraw, createShapeId, getSnapshot, loadSnapshot } from 'tldraw';
 import 'tldraw/tldraw.css';
@@ -14,6 +19,11 @@ import 'tldraw/tldraw.css';
 import { BeforeAfterSlider } from '@/components/canvas/before-after-slider';
 import { ImageSidebar } from '@/components/canvas/image-sidebar';
 
+import { SnapshotDocument, diffSnapshot } from '@/lib/snapshot-diff';
+
+// Agent Mode suggestions follow the conversation; one older than this is dropped
+const AGENT_SUGGESTION_MAX_AGE_SECONDS = 20;
+
 // Extend Window interface for Speech Recognition API
 interface WindowWithSpeechRecognition extends Window {
   // eslint-disable-next-line @typescript-eslint/no-explicit-any
@@ -27,8 +37,9 @@ export default function ProjectCanvasPage() {
   const projectId = params.project_id as string;
   const queryClient = useQueryClient();
 
-  // Fetch project data
+  // Fetch project data; the canvas snapshot is fetched separately as it can be large
   const { data: project } = useProject(projectId, DEFAULT_USER_ID);
+  const { data: projectSnapshot } = useProjectSnapshot(projectId);
 
   const [generatedImage, setGeneratedImage] = useState<string | null>(null);
   const [isGenerating, setIsGenerating] = useState(false);
@@ -55,6 +66,9 @@ export default function ProjectCanvasPage() {
   const autoGenerateTimerRef = useRef<NodeJS.Timeout | null>(null);
   const agentTranscriptRef = useRef<string>('');
   const handleGenerateRef = useRef<(() => Promise<void>) | null>(null);
+  // Identifies this canvas to the backend, which only keeps its latest generation running
+  const generationSessionRef = useRef<string>('');
+  const generationSequenceRef = useRef(0);
   const isListeningRef = useRef<boolean>(false);
   const [isEditingName, setIsEditingName] = useState(false);
   const [editedName, setEditedName] = useState('');
@@ -62,6 +76,11 @@ export default function ProjectCanvasPage() {
   const [isSaving, setIsSaving] = useState(false);
   const saveDebounceTimerRef = useRef<NodeJS.Timeout | null>(null);
   const hasLoadedSnapshotRef = useRef(false);
+  // The document and version the server has, which autosave sends patches against
+  const savedDocumentRef = useRef<SnapshotDocument | null>(null);
+  const snapshotVersionRef = useRef<number | null>(null);
+  // Saves run one after another so each patch is based on the previous one
+  const saveQueueRef = useRef<Promise<void>>(Promise.resolve());
 
   // Keep agent transcript ref in sync with agent transcript state
   useEffect(() => {
@@ -601,6 +620,12 @@ export default function ProjectCanvasPage() {
       return;
     }
 
+    if (!generationSessionRef.current) {
+      generationSessionRef.current = crypto.randomUUID();
+    }
+    const sequence = ++generationSequenceRef.current;
+    const isLatest = () => sequence === generationSequenceRef.current;
+
     setIsGenerating(true);
     setError(null);
 
@@ -619,12 +644,22 @@ export default function ProjectCanvasPage() {
       const requestType = hasContent ? 'edit' : 'generate';
       console.log('Request type:', requestType, '(mode:', mode, ', hasContent:', hasContent, ')');
 
-      const data = await generateImage({
-        prompt: prompt,
-        image_data: canvasImageData,
-        project_id: projectId,
-        type: requestType,
-      });
+      const data = await generateImage(
+        {
+          prompt: prompt,
+          image_data: canvasImageData,
+          project_id: projectId,
+          type: requestType,
+          session_id: generationSessionRef.current,
+          sequence,
+        },
+        mode === 'agent' ? { maxAgeSeconds: AGENT_SUGGESTION_MAX_AGE_SECONDS } : {},
+      );
+
+      // A newer generation has started since; its result is the one to show
+      if (!isLatest()) {
+        return;
+      }
 
       setGeneratedImage(data.image_data);
       setImageUsed(false); // Reset when new image is generated
@@ -633,10 +668,20 @@ export default function ProjectCanvasPage() {
         console.log('Model response:', data.text_response);
       }
     } catch (err) {
+      if (err instanceof GenerationSupersededError || !isLatest()) {
+        console.log('Generation superseded by a newer request');
+        return;
+      }
+      if (err instanceof GenerationExpiredError) {
+        console.log('Suggestion dropped as it was no longer fresh');
+        return;
+      }
       console.error('Error generating image:', err);
       setError(err instanceof Error ? err.message : 'Failed to generate image');
     } finally {
-      setIsGenerating(false);
+      if (isLatest()) {
+        setIsGenerating(false);
+      }
     }
   }, [mode, agentTranscript, askPrompt, exportCanvasImage, projectId, frameId]);
 
@@ -707,46 +752,81 @@ export default function ProjectCanvasPage() {
     [saveProjectName, cancelEditingName],
   );
 
-  // Save canvas state to database
-  const saveCanvas = useCallback(async () => {
+  // Save canvas state to database, sending only the records changed since the last save
+  const persistCanvas = useCallback(async () => {
     if (!editorRef.current) {
       return;
     }
 
-    setIsSaving(true);
-
-    try {
-      const editor = editorRef.current;
-      const snapshot = getSnapshot(editor.store);
+    const editor = editorRef.current;
+    const canvasDocument = getSnapshot(editor.store).document as unknown as SnapshotDocument;
+    const savedDocument = savedDocumentRef.current;
+    const snapshotVersion = snapshotVersionRef.current;
 
-      await updateProject(projectId, DEFAULT_USER_ID, {
-        snapshot: snapshot.document as unknown as Record<string, unknown>,
-      });
+    if (savedDocument && snapshotVersion !== null) {
+      const patch = diffSnapshot(savedDocument, canvasDocument, snapshotVersion);
+      if (!patch) {
+        return;
+      }
 
-      console.log('Canvas saved successfully');
-    } catch (err) {
-      console.error('Error saving canvas:', err);
-      setError(err instanceof Error ? err.message : 'Failed to save canvas');
-    } finally {
-      setIsSaving(false);
+      try {
+        const response = await patchProjectSnapshot(projectId, DEFAULT_USER_ID, patch);
+        snapshotVersionRef.current = response.snapshot_version;
+        savedDocumentRef.current = canvasDocument;
+        console.log(
+          `Canvas patched (${Object.keys(patch.put).length} changed, ${patch.remove.length} removed)`,
+        );
+        return;
+      } catch (err) {
+        // Conflicting or failed patch: fall back to saving the whole document
+        console.warn('Error patching canvas, saving full snapshot:', err);
+      }
     }
+
+    const project = await updateProject(projectId, DEFAULT_USER_ID, {
+      snapshot: canvasDocument as unknown as Record<string, unknown>,
+    });
+    snapshotVersionRef.current = project.snapshot_version ?? null;
+    savedDocumentRef.current = canvasDocument;
+
+    console.log('Canvas saved successfully');
   }, [projectId]);
 
-  // Load canvas state from database when project loads
+  const saveCanvas = useCallback(() => {
+    saveQueueRef.current = saveQueueRef.current.then(async () => {
+      setIsSaving(true);
+      try {
+        await persistCanvas();
+      } catch (err) {
+        console.error('Error saving canvas:', err);
+        setError(err instanceof Error ? err.message : 'Failed to save canvas');
+      } finally {
+        setIsSaving(false);
+      }
+    });
+    return saveQueueRef.current;
+  }, [persistCanvas]);
+
+  // Load canvas state from database when the snapshot loads
   useEffect(() => {
-    if (!editorRef.current || !project || hasLoadedSnapshotRef.current) return;
+    if (!editorRef.current || !projectSnapshot || hasLoadedSnapshotRef.current) return;
 
     try {
       const editor = editorRef.current;
 
+      snapshotVersionRef.current = projectSnapshot.snapshot_version;
+
       // If project has a snapshot, load it
-      if (project.snapshot) {
+      if (projectSnapshot.snapshot) {
         console.log('Loading canvas snapshot from database...');
         // Load the snapshot into the store as a remote change to avoid triggering auto-save
         editor.store.mergeRemoteChanges(() => {
           // eslint-disable-next-line @typescript-eslint/no-explicit-any
-          loadSnapshot(editor.store, { document: project.snapshot as any });
+          loadSnapshot(editor.store, { document: projectSnapshot.snapshot as any });
         });
+        // Diff later saves against the editor's own copy of what the server has
+        const loadedDocument = getSnapshot(editor.store).document;
+        savedDocumentRef.current = loadedDocument as unknown as SnapshotDocument;
 
         // After loading snapshot, find the frame and update frameId state
         const existingShapes = Array.from(editor.getCurrentPageShapeIds());
@@ -776,7 +856,7 @@ export default function ProjectCanvasPage() {
       console.error('Error loading canvas:', err);
       setError(err instanceof Error ? err.message : 'Failed to load canvas');
     }
-  }, [project]);
+  }, [projectSnapshot]);
 
   // Auto-save with debounce - listen for canvas changes
   useEffect(() => {
@@ -868,7 +948,7 @@ export default function ProjectCanvasPage() {
 
               // If project has a snapshot, wait for it to load (don't create a frame)
               // The snapshot loading effect will handle setting the frameId
-              if (project?.snapshot) {
+              if (projectSnapshot?.snapshot) {
                 console.log('Project has snapshot, waiting for load...');
                 return;
               }
@@ -10,7 +10,9 @@ import { ProjectCard } from '@/components/projects/project-card';
 import { Button } from '@/components/ui/button';
 
 export default function ProjectsPage() {
-  const { data, isLoading, error } = useProjects(DEFAULT_USER_ID);
+  const { data, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } =
+    useProjects(DEFAULT_USER_ID);
+  const projects = data?.pages.flatMap((page) => page.projects);
   const [isDialogOpen, setIsDialogOpen] = useState(false);
 
   return (
@@ -24,18 +26,26 @@ export default function ProjectsPage() {
 
       {error && <p className="text-red-600">Error loading projects: {error.message}</p>}
 
-      {data && data.projects.length === 0 && (
+      {projects && projects.length === 0 && (
         <p className="text-gray-600">No projects found. Create your first drawing project!</p>
       )}
 
-      {data && data.projects.length > 0 && (
+      {projects && projects.length > 0 && (
         <div className="grid grid-cols-1 gap-8 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-3">
-          {data.projects.map((project) => (
+          {projects.map((project) => (
             <ProjectCard key={project.id} project={project} />
           ))}
         </div>
       )}
 
+      {hasNextPage && (
+        <div className="mt-8 flex justify-center">
+          <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+            {isFetchingNextPage ? 'Loading...' : 'Load more'}
+          </Button>
+        </div>
+      )}
+
       <CreateProjectDialog open={isDialogOpen} onOpenChange={setIsDialogOpen} showOverlay={true} />
     </div>
   );
@@ -3,10 +3,10 @@
 import Image from 'next/image';
 import Link from 'next/link';
 
-import { Project } from '@/actions/projects';
+import { ProjectSummary } from '@/actions/projects';
 
 interface ProjectCardProps {
-  project: Project;
+  project: ProjectSummary;
 }
 
 export function ProjectCard({ project }: ProjectCardProps) {
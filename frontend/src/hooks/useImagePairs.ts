@@ -1,12 +1,17 @@
 'use client';
 
 import { fetchImagePairs } from '@/actions/image-pairs';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
+
+const IMAGE_PAIR_CARD_FIELDS = ['output_url'];
 
 export function useImagePairs(projectId: string) {
-  return useQuery({
+  return useInfiniteQuery({
     queryKey: ['image-pairs', projectId],
-    queryFn: () => fetchImagePairs(projectId),
+    queryFn: ({ pageParam }) =>
+      fetchImagePairs(projectId, { cursor: pageParam, fields: IMAGE_PAIR_CARD_FIELDS }),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? null,
     enabled: !!projectId,
   });
 }
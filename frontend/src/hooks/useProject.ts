@@ -7,12 +7,16 @@ export function useProject(projectId: string, userId: string = DEFAULT_USER_ID)
   return useQuery({
     queryKey: ['project', projectId],
     queryFn: async () => {
-      const response = await fetchProjects(userId);
-      const project = response.projects.find((p) => p.id === projectId);
-      if (!project) {
-        throw new Error('Project not found');
-      }
-      return project;
+      let cursor: string | null | undefined = null;
+      do {
+        const response = await fetchProjects(userId, { cursor });
+        const project = response.projects.find((p) => p.id === projectId);
+        if (project) {
+          return project;
+        }
+        cursor = response.next_cursor;
+      } while (cursor);
+      throw new Error('Project not found');
     },
     enabled: !!projectId,
   });
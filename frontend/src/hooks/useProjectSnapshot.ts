@@ -0,0 +1,15 @@
+'use client';
+
+import { fetchProjectSnapshot } from '@/actions/projects';
+import { useQuery } from '@tanstack/react-query';
+
+export function useProjectSnapshot(projectId: string) {
+  return useQuery({
+    queryKey: ['project-snapshot', projectId],
+    queryFn: () => fetchProjectSnapshot(projectId),
+    enabled: !!projectId,
+    // The canvas is loaded once; after that the editor holds newer state than the server
+    staleTime: Infinity,
+    refetchOnWindowFocus: false,
+  });
+}
@@ -1,11 +1,17 @@
 'use client';
 
 import { DEFAULT_USER_ID, fetchProjects } from '@/actions/projects';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
+
+// Only the fields the project cards render
+const PROJECT_CARD_FIELDS = ['name', 'description', 'icon_url'];
 
 export function useProjects(userId: string = DEFAULT_USER_ID) {
-  return useQuery({
+  return useInfiniteQuery({
     queryKey: ['projects', userId],
-    queryFn: () => fetchProjects(userId),
+    queryFn: ({ pageParam }) =>
+      fetchProjects(userId, { cursor: pageParam, fields: PROJECT_CARD_FIELDS }),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? null,
   });
 }
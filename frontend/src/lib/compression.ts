@@ -0,0 +1,22 @@
+// Smaller bodies are not worth the extra CPU
+const COMPRESS_MIN_BYTES = 16 * 1024;
+
+/**
+ * A JSON request body, gzip-compressed when it is large and the browser supports
+ * CompressionStream. The API decompresses bodies sent with Content-Encoding: gzip.
+ */
+export async function jsonRequestBody(
+  value: unknown,
+): Promise<{ body: BodyInit; headers: Record<string, string> }> {
+  const json = JSON.stringify(value);
+  if (json.length < COMPRESS_MIN_BYTES || typeof CompressionStream === 'undefined') {
+    return { body: json, headers: { 'Content-Type': 'application/json' } };
+  }
+
+  const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+  const body = await new Response(stream).arrayBuffer();
+  return {
+    body,
+    headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+  };
+}
@@ -0,0 +1,44 @@
+import { SnapshotPatch } from '@/actions/projects';
+
+export interface SnapshotDocument {
+  store: Record<string, unknown>;
+  schema: unknown;
+}
+
+/**
+ * Records added, changed or removed between two tldraw document snapshots, or null if
+ * nothing changed. tldraw never mutates records in place, so unchanged records are the
+ * same objects in both snapshots and most of the comparison is a reference check.
+ */
+export function diffSnapshot(
+  previous: SnapshotDocument,
+  next: SnapshotDocument,
+  baseVersion: number,
+): SnapshotPatch | null {
+  const put: Record<string, unknown> = {};
+  const remove: string[] = [];
+
+  for (const [id, record] of Object.entries(next.store)) {
+    const previousRecord = previous.store[id];
+    if (previousRecord !== record && JSON.stringify(previousRecord) !== JSON.stringify(record)) {
+      put[id] = record;
+    }
+  }
+  for (const id of Object.keys(previous.store)) {
+    if (!(id in next.store)) {
+      remove.push(id);
+    }
+  }
+
+  const schemaChanged = JSON.stringify(previous.schema) !== JSON.stringify(next.schema);
+  if (Object.keys(put).length === 0 && remove.length === 0 && !schemaChanged) {
+    return null;
+  }
+
+  return {
+    base_version: baseVersion,
+    put,
+    remove,
+    ...(schemaChanged ? { schema: next.schema } : {}),
+  };
+}